@@ -12,6 +12,44 @@ class Settings(BaseSettings):
     openai_temperature: float = 0.7
     max_tokens: int = 1000
     
+    # Per-stage time limits for a chat turn (extraction runs alongside retrieval + reply)
+    retrieval_timeout_seconds: float = 5.0
+    reply_timeout_seconds: float = 30.0
+    extraction_timeout_seconds: float = 20.0
+    
+    embedding_model: str = "text-embedding-3-small"
+    
+    # KB ingestion: batched embedding requests
+    embedding_batch_size: int = 256  # inputs per request (API maximum is 2048)
+    embedding_concurrency: int = 4  # requests in flight per document
+    embedding_max_retries: int = 5
+    embedding_retry_base_delay: float = 1.0  # seconds, doubled on each retry
+    kb_insert_batch_size: int = 500  # chunks embedded and inserted per insert_many
+    
+    # Chunking: "structured" (token-sized, paragraph/heading/sentence aware) or "fixed" (1000 chars)
+    chunking_strategy: str = "structured"
+    chunk_target_tokens: int = 300
+    chunk_overlap_tokens: int = 30  # whole trailing sentences repeated in the next chunk
+    chunk_tokenizer: str = "cl100k_base"  # tiktoken encoding; word-count estimate if not installed
+    chunk_embedding_cache_enabled: bool = True  # reuse embeddings of identical chunk text
+    
+    # Background ingestion jobs
+    ingestion_queue_size: int = 100  # queued uploads per worker before 503s
+    ingestion_workers: int = 2  # documents ingested concurrently per worker
+    ingestion_job_stale_seconds: int = 600  # running jobs without a heartbeat are re-run
+    
+    # File uploads are spooled to disk and read back in blocks
+    upload_spool_dir: str = "data/uploads"
+    upload_block_size: int = 1024 * 1024
+    max_upload_size_mb: int = 200
+    
+    # Bulk (archive) ingestion: text extraction runs in a process pool
+    extraction_workers: int = 0  # 0 = one per CPU
+    bulk_extraction_backlog: int = 8  # extracted files waiting for embedding before extraction pauses
+    bulk_ingest_concurrency: int = 2  # files embedded and inserted concurrently
+    bulk_max_file_size_mb: int = 50  # larger archive members are skipped
+    max_archive_size_mb: int = 1024
+    
     # Email
     gmail_address: str = ""
     app_password: str = ""
@@ -34,10 +72,67 @@ class Settings(BaseSettings):
     max_requests_per_minute: int = 60
     max_chat_messages_per_session: int = 100
     
+    # Lead extraction: a local regex pass skips the LLM call when it is not needed
+    lead_heuristics_enabled: bool = True
+    # One completion for reply + extraction (tool attached to the reply call); falls
+    # back to a separate extraction call when the model does not use the tool
+    single_call_extraction: bool = False
+    
+    # Conversation history sent with each prompt, filled newest-first up to a token budget
+    history_token_budget: int = 1500  # reply prompt (summary + messages)
+    extraction_history_token_budget: int = 800
+    
+    # Rolling conversation summary: prompts send the summary plus recent messages
+    summary_enabled: bool = True
+    summary_recent_messages: int = 4  # never summarized
+    summary_interval_messages: int = 4  # older messages folded into the summary in batches of this size
+    summary_max_words: int = 100
+    summary_model: str = ""  # defaults to openai_model; a smaller model is usually enough
+    
     # Lead Scoring
     hot_lead_threshold: int = 70
     warm_lead_threshold: int = 40
     
+    # Query embedding cache: in-process LRU + optional MongoDB tier that survives restarts
+    query_embedding_cache_size: int = 2048
+    query_embedding_cache_ttl_seconds: int = 24 * 60 * 60
+    query_embedding_cache_persistent: bool = True
+    embedding_cache_persistent_ttl_seconds: int = 30 * 24 * 60 * 60
+    
+    # Retrieval result cache, keyed on the tenant's KB version
+    retrieval_cache_size: int = 4096
+    retrieval_cache_ttl_seconds: int = 60 * 60
+    
+    # Semantic answer cache: replies to repeated FAQ-style questions, per tenant and KB version
+    answer_cache_enabled: bool = False  # tenants can override in their settings
+    answer_cache_similarity_threshold: float = 0.92  # cosine between question embeddings
+    answer_cache_max_entries_per_tenant: int = 200
+    answer_cache_max_tenants: int = 1000
+    answer_cache_ttl_seconds: int = 24 * 60 * 60
+    answer_cache_max_question_words: int = 25
+    
+    # Hybrid retrieval: BM25 + vector hits fused with reciprocal rank fusion
+    hybrid_search_enabled: bool = True
+    hybrid_candidates: int = 20  # hits taken from each retriever before fusion
+    rrf_k: int = 60
+    
+    # Vector Index (tenants can override in their settings)
+    vector_index_type: str = "flat"  # "flat" (exact), "ivf", "int8" or "pq" (approximate)
+    vector_index_compact_ratio: float = 0.2  # compact once this share of rows is deleted
+    ivf_nlist: int = 0  # 0 = sqrt(chunk count)
+    ivf_nprobe: int = 8
+    ivf_min_train_size: int = 5000
+    ivf_kmeans_iterations: int = 10
+    quantization_rerank_factor: int = 4  # int8/pq: exact re-rank of k * factor candidates
+    pq_subvectors: int = 48
+    
+    # Embeddings are stored in kb_chunks as packed BSON Binary: "float32" or "float16"
+    embedding_storage_dtype: str = "float32"
+    
+    # Memory-mapped embedding store (per-tenant files shared by all workers)
+    embedding_store_enabled: bool = True
+    embedding_store_dir: str = "data/embeddings"
+    
     model_config = SettingsConfigDict(
         env_file=".env",
         case_sensitive=False
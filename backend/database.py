@@ -16,6 +16,10 @@ leads_collection = None
 conversations_collection = None
 kb_chunks_collection = None
 events_collection = None
+embedding_cache_collection = None
+chunk_embeddings_collection = None
+kb_jobs_collection = None
+kb_documents_collection = None
 
 
 async def connect_to_mongo():
@@ -23,6 +27,7 @@ async def connect_to_mongo():
     global client, db
     global tenants_collection, users_collection, leads_collection
     global conversations_collection, kb_chunks_collection, events_collection
+    global embedding_cache_collection, chunk_embeddings_collection, kb_jobs_collection, kb_documents_collection
     
     try:
         # Connect to MongoDB
@@ -58,6 +63,10 @@ async def connect_to_mongo():
         conversations_collection = db.conversations
         kb_chunks_collection = db.kb_chunks
         events_collection = db.events
+        embedding_cache_collection = db.embedding_cache
+        chunk_embeddings_collection = db.chunk_embeddings
+        kb_jobs_collection = db.kb_jobs
+        kb_documents_collection = db.kb_documents
         
         # Verify collections are initialized
         if tenants_collection is None:
@@ -82,6 +91,10 @@ async def connect_to_mongo():
         conversations_collection = None
         kb_chunks_collection = None
         events_collection = None
+        embedding_cache_collection = None
+        chunk_embeddings_collection = None
+        kb_jobs_collection = None
+        kb_documents_collection = None
         logger.error("Please ensure MongoDB Atlas is accessible and the URI is correct")
         logger.error("The application will start but API endpoints will return 503 errors")
         # Don't raise - allow app to start
@@ -125,11 +138,34 @@ async def create_indexes():
         await kb_chunks_collection.create_index([("tenant_id", ASCENDING)])
         await kb_chunks_collection.create_index([("document_id", ASCENDING)])
         
+        # KB documents indexes (listing is keyset-paginated newest first)
+        await kb_documents_collection.create_index(
+            [("tenant_id", ASCENDING), ("document_id", ASCENDING)],
+            unique=True
+        )
+        await kb_documents_collection.create_index([
+            ("tenant_id", ASCENDING),
+            ("created_at", DESCENDING),
+            ("document_id", DESCENDING)
+        ])
+        
         # Events indexes
         await events_collection.create_index([("tenant_id", ASCENDING)])
         await events_collection.create_index([("lead_id", ASCENDING)])
         await events_collection.create_index([("created_at", DESCENDING)])
         
+        # KB ingestion jobs indexes
+        await kb_jobs_collection.create_index([("job_id", ASCENDING)], unique=True)
+        await kb_jobs_collection.create_index([("status", ASCENDING)])
+        await kb_jobs_collection.create_index([("tenant_id", ASCENDING), ("created_at", DESCENDING)])
+        
+        # Query embedding cache entries expire on their own; chunk embeddings
+        # (chunk_embeddings, keyed by content hash) are kept indefinitely
+        await embedding_cache_collection.create_index(
+            [("created_at", ASCENDING)],
+            expireAfterSeconds=settings.embedding_cache_persistent_ttl_seconds
+        )
+        
         logger.info("Successfully created database indexes")
     except Exception as e:
         logger.error(f"Failed to create indexes: {e}")
@@ -160,6 +196,23 @@ def get_events_collection():
     """Get events collection (for routes to use)"""
     return events_collection
 
+def get_kb_jobs_collection():
+    """Get kb_jobs collection (for routes to use)"""
+    return kb_jobs_collection
+
+def get_kb_documents_collection():
+    """Get kb_documents collection (for routes to use)"""
+    return kb_documents_collection
+
+def get_embedding_cache_collection():
+    """Get embedding_cache collection (for services to use)"""
+    return embedding_cache_collection
+
+
+def get_chunk_embeddings_collection():
+    """Get chunk_embeddings collection (for services to use)"""
+    return chunk_embeddings_collection
+
 
 async def init_default_tenant():
     """Initialize default tenant if not exists"""
@@ -7,6 +7,9 @@ import os
 from pathlib import Path
 
 from backend.database import connect_to_mongo, close_mongo_connection, init_default_tenant
+from backend.services.ingestion_queue import ingestion_queue
+from backend.services.bulk_ingestion import shutdown_process_pool
+from backend.services.conversation_summary import conversation_summarizer
 from backend.routes import chat, widget, auth, leads, knowledge_base
 from backend.config import settings
 from backend.utils.logger import get_logger
@@ -21,6 +24,9 @@ async def lifespan(app: FastAPI):
     await connect_to_mongo()
     await init_default_tenant()
     
+    # Start background knowledge-base ingestion (resumes interrupted jobs)
+    await ingestion_queue.start()
+    
     # Create logs directory
     os.makedirs("logs", exist_ok=True)
     
@@ -31,6 +37,9 @@ async def lifespan(app: FastAPI):
     yield
     
     # Shutdown
+    await ingestion_queue.stop()
+    await conversation_summarizer.stop()
+    shutdown_process_pool()
     await close_mongo_connection()
     print("👋 LeadPilot AI shutting down")
 
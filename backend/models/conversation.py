@@ -18,8 +18,12 @@ class Conversation(BaseModel):
     # Messages
     messages: List[Message] = []
     
-    # Summary for context management
+    # Summary for context management: covers messages[:summarized_until]
     summary: Optional[str] = None
+    summarized_until: int = 0
+    
+    # Lead extraction has mined messages[:extracted_until]
+    extracted_until: int = 0
     
     # Metadata
     language: str = "en"
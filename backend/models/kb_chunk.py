@@ -12,8 +12,9 @@ class KBChunk(BaseModel):
     text: str
     chunk_index: int
     
-    # Embeddings (stored as list of floats)
+    # Embeddings (persisted as packed BSON Binary, see backend.utils.vector_codec)
     embedding: Optional[List[float]] = None
+    content_hash: Optional[str] = None  # embedding cache key (normalized text + model)
     
     # Metadata
     metadata: Dict[str, Any] = {}
@@ -38,4 +39,12 @@ class DocumentResponse(BaseModel):
     document_id: str
     name: str
     chunks_count: int
+    token_count: int = 0
+    status: str = "ready"
     created_at: datetime
+
+
+class DocumentUpdateResponse(DocumentResponse):
+    unchanged: int
+    added: int
+    removed: int
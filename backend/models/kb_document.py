@@ -0,0 +1,33 @@
+from pydantic import BaseModel, Field, ConfigDict
+from typing import Optional, List, Dict, Any
+from datetime import datetime
+from backend.models.kb_chunk import DocumentResponse
+
+
+class KBDocument(BaseModel):
+    """One knowledge-base document, kept in sync with its chunks by KBProcessor"""
+    tenant_id: str
+    document_id: str
+    name: str
+    
+    # "processing" while chunks are being written, then "ready"
+    status: str = "processing"
+    
+    chunk_count: int = 0
+    token_count: int = 0
+    metadata: Dict[str, Any] = {}
+    
+    # Timestamps
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class KBDocumentInDB(KBDocument):
+    id: Optional[str] = Field(None, alias="_id")
+    
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class DocumentListResponse(BaseModel):
+    documents: List[DocumentResponse]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page
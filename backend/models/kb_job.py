@@ -0,0 +1,62 @@
+from pydantic import BaseModel, Field, ConfigDict
+from typing import Optional, Dict, Any, List
+from datetime import datetime
+
+
+class KBJob(BaseModel):
+    job_id: str
+    tenant_id: str
+    document_id: str
+    document_name: str
+    
+    # "document", or "archive" for a bulk upload (document_id is then the import id)
+    kind: str = "document"
+    
+    # "queued", "running", "completed" or "failed"
+    status: str = "queued"
+    
+    # Progress
+    chunks_processed: int = 0
+    attempts: int = 0
+    error: Optional[str] = None
+    
+    # Set on every claim; writes from an earlier, superseded run no longer match
+    lease_id: Optional[str] = None
+    
+    # Archive jobs: files finished so far, and the per-file report once completed
+    files_processed: int = 0
+    report: Optional[List[Dict[str, Any]]] = None
+    
+    # Document payload, kept until the job finishes so it can be resumed:
+    # inline text, or the path of a spooled file upload
+    content: Optional[str] = None
+    source_path: Optional[str] = None
+    metadata: Dict[str, Any] = {}
+    
+    # Timestamps
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class KBJobInDB(KBJob):
+    id: Optional[str] = Field(None, alias="_id")
+    
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class KBJobResponse(BaseModel):
+    job_id: str
+    document_id: str
+    name: str
+    kind: str = "document"
+    status: str
+    chunks_processed: int
+    chunks_per_second: Optional[float] = None
+    error: Optional[str] = None
+    files_processed: int = 0
+    summary: Optional[Dict[str, int]] = None
+    report: Optional[List[Dict[str, Any]]] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -11,6 +11,14 @@ class TenantSettings(BaseModel):
     notification_emails: List[str] = []
     brand_color: str = "#6366f1"
     language: str = "en"
+    
+    # Retrieval index ("flat", "ivf", "int8" or "pq"), None uses the server default
+    vector_index: Optional[str] = None
+    ivf_nlist: Optional[int] = None
+    ivf_nprobe: Optional[int] = None
+    
+    # Semantic answer cache for FAQ-style questions, None uses the server default
+    answer_cache: Optional[bool] = None
 
 
 class Tenant(BaseModel):
@@ -20,6 +28,12 @@ class Tenant(BaseModel):
     email: str
     settings: TenantSettings
     active: bool = True
+    kb_version: int = 0  # bumped on every knowledge-base change
+    
+    # Knowledge-base totals over ready documents, maintained with $inc
+    kb_document_count: int = 0
+    kb_chunk_count: int = 0
+    kb_token_count: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -1,10 +1,14 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from backend.models.conversation import ChatRequest, ChatResponse, Conversation
 from backend.models.lead import Lead
+from backend.models.tenant import Tenant
 from backend.services.ai_agent import ai_agent
 from backend.database import get_tenants_collection, get_conversations_collection, get_leads_collection
 from backend.utils.rate_limiter import rate_limiter
 from backend.config import settings
+from typing import Optional, Tuple
+import json
 import uuid
 from datetime import datetime
 
@@ -29,55 +33,7 @@ async def chat_message(request: ChatRequest, http_request: Request):
     ```
     """
     try:
-        # Get collections
-        tenants_collection = get_tenants_collection()
-        conversations_collection = get_conversations_collection()
-        leads_collection = get_leads_collection()
-        
-        # Check if MongoDB collections are initialized
-        if tenants_collection is None:
-            raise HTTPException(status_code=503, detail="Database not initialized. Please check MongoDB connection.")
-        
-        # Rate limiting
-        client_ip = http_request.client.host
-        rate_key = f"chat:{request.tenant_key}:{client_ip}"
-        
-        if not await rate_limiter.is_allowed(rate_key, settings.max_requests_per_minute):
-            raise HTTPException(status_code=429, detail="Too many requests. Please try again later.")
-        
-        # Get tenant
-        tenant_doc = await tenants_collection.find_one({"tenant_key": request.tenant_key})
-        if not tenant_doc:
-            raise HTTPException(status_code=404, detail="Invalid tenant key")
-        
-        from backend.models.tenant import Tenant
-        if "_id" in tenant_doc:
-            tenant_doc["id"] = str(tenant_doc.pop("_id"))
-        tenant = Tenant(**tenant_doc)
-        
-        if not tenant.active:
-            raise HTTPException(status_code=403, detail="Tenant is not active")
-        
-        # Get or create session
-        session_id = request.session_id or str(uuid.uuid4())
-        
-        # Get existing conversation
-        conversation_doc = await conversations_collection.find_one({"session_id": session_id})
-        if conversation_doc:
-            if "_id" in conversation_doc:
-                conversation_doc["id"] = str(conversation_doc.pop("_id"))
-            conversation = Conversation(**conversation_doc)
-        else:
-            conversation = None
-        
-        # Get existing lead
-        lead_doc = await leads_collection.find_one({"session_id": session_id})
-        if lead_doc:
-            if "_id" in lead_doc:
-                lead_doc["id"] = str(lead_doc.pop("_id"))
-            lead = Lead(**lead_doc)
-        else:
-            lead = None
+        tenant, session_id, conversation, lead = await load_chat_session(request, http_request)
         
         # Process message with AI agent
         response_message, updated_conversation, updated_lead, lead_became_hot = await ai_agent.process_message(
@@ -88,31 +44,7 @@ async def chat_message(request: ChatRequest, http_request: Request):
             lead
         )
         
-        # Save conversation
-        conversation_data = updated_conversation.model_dump(exclude={"id"})
-        if conversation_doc:
-            await conversations_collection.update_one(
-                {"session_id": session_id},
-                {"$set": conversation_data}
-            )
-        else:
-            await conversations_collection.insert_one(conversation_data)
-        
-        # Save lead
-        if updated_lead:
-            lead_data = updated_lead.model_dump(exclude={"id"})
-            if lead_doc:
-                await leads_collection.update_one(
-                    {"session_id": session_id},
-                    {"$set": lead_data}
-                )
-            else:
-                result = await leads_collection.insert_one(lead_data)
-                # Update conversation with lead_id
-                await conversations_collection.update_one(
-                    {"session_id": session_id},
-                    {"$set": {"lead_id": str(result.inserted_id)}}
-                )
+        await save_chat_turn(session_id, updated_conversation, updated_lead, conversation is not None, lead is not None)
         
         # Prepare response
         return ChatResponse(
@@ -127,3 +59,161 @@ async def chat_message(request: ChatRequest, http_request: Request):
     except Exception as e:
         print(f"Error in chat endpoint: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.post("/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    """
+    Public chat endpoint that streams the reply as server-sent events
+    
+    Same request body as `POST /v1/chat/message`. The reply arrives as
+    `token` events while the model generates it; lead extraction, scoring
+    and persistence complete after the last token, and a final `done` event
+    carries the session and lead state.
+    
+    **Example Response:**
+    ```
+    event: token
+    data: {"text": "Hi! "}
+    
+    event: token
+    data: {"text": "Our plans start at..."}
+    
+    event: done
+    data: {"session_id": "5b0c...", "lead_captured": true, "lead_grade": "WARM"}
+    ```
+    """
+    # Validation, rate limiting and lookups fail with a normal HTTP error
+    tenant, session_id, conversation, lead = await load_chat_session(request, http_request)
+    turn = ai_agent.start_stream(request.message, session_id, tenant, conversation, lead)
+    
+    async def events():
+        try:
+            async for token in turn.tokens():
+                yield sse_event("token", {"text": token})
+            
+            response_message, updated_conversation, updated_lead, lead_became_hot = await turn.finish()
+            await save_chat_turn(session_id, updated_conversation, updated_lead, conversation is not None, lead is not None)
+            
+            yield sse_event("done", ChatResponse(
+                message=response_message,
+                session_id=session_id,
+                lead_captured=updated_lead is not None,
+                lead_grade=updated_lead.grade.value if updated_lead else None
+            ).model_dump(exclude={"message"}))
+            
+        except Exception as e:
+            print(f"Error in chat stream: {e}")
+            yield sse_event("error", {"detail": "Internal server error"})
+        finally:
+            turn.cancel()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def sse_event(event: str, data: dict) -> str:
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def load_chat_session(
+    request: ChatRequest,
+    http_request: Request
+) -> Tuple[Tenant, str, Optional[Conversation], Optional[Lead]]:
+    """
+    Rate-limit the caller and load tenant, conversation and lead for a chat turn
+    
+    Raises:
+        HTTPException: 503/429/404/403 as for POST /v1/chat/message
+    """
+    # Get collections
+    tenants_collection = get_tenants_collection()
+    conversations_collection = get_conversations_collection()
+    leads_collection = get_leads_collection()
+    
+    # Check if MongoDB collections are initialized
+    if tenants_collection is None:
+        raise HTTPException(status_code=503, detail="Database not initialized. Please check MongoDB connection.")
+    
+    # Rate limiting
+    client_ip = http_request.client.host
+    rate_key = f"chat:{request.tenant_key}:{client_ip}"
+    
+    if not await rate_limiter.is_allowed(rate_key, settings.max_requests_per_minute):
+        raise HTTPException(status_code=429, detail="Too many requests. Please try again later.")
+    
+    # Get tenant
+    tenant_doc = await tenants_collection.find_one({"tenant_key": request.tenant_key})
+    if not tenant_doc:
+        raise HTTPException(status_code=404, detail="Invalid tenant key")
+    
+    if "_id" in tenant_doc:
+        tenant_doc["id"] = str(tenant_doc.pop("_id"))
+    tenant = Tenant(**tenant_doc)
+    
+    if not tenant.active:
+        raise HTTPException(status_code=403, detail="Tenant is not active")
+    
+    # Get or create session
+    session_id = request.session_id or str(uuid.uuid4())
+    
+    # Get existing conversation
+    conversation_doc = await conversations_collection.find_one({"session_id": session_id})
+    if conversation_doc:
+        if "_id" in conversation_doc:
+            conversation_doc["id"] = str(conversation_doc.pop("_id"))
+        conversation = Conversation(**conversation_doc)
+    else:
+        conversation = None
+    
+    # Get existing lead
+    lead_doc = await leads_collection.find_one({"session_id": session_id})
+    if lead_doc:
+        if "_id" in lead_doc:
+            lead_doc["id"] = str(lead_doc.pop("_id"))
+        lead = Lead(**lead_doc)
+    else:
+        lead = None
+    
+    return tenant, session_id, conversation, lead
+
+
+async def save_chat_turn(
+    session_id: str,
+    conversation: Conversation,
+    lead: Optional[Lead],
+    conversation_exists: bool,
+    lead_exists: bool
+):
+    """Persist the conversation and lead after a chat turn"""
+    conversations_collection = get_conversations_collection()
+    leads_collection = get_leads_collection()
+    
+    # Save conversation (the summary fields are written by the background summarizer)
+    if conversation_exists:
+        await conversations_collection.update_one(
+            {"session_id": session_id},
+            {"$set": conversation.model_dump(exclude={"id", "summary", "summarized_until"})}
+        )
+    else:
+        await conversations_collection.insert_one(conversation.model_dump(exclude={"id"}))
+    
+    # Save lead
+    if lead:
+        lead_data = lead.model_dump(exclude={"id"})
+        if lead_exists:
+            await leads_collection.update_one(
+                {"session_id": session_id},
+                {"$set": lead_data}
+            )
+        else:
+            result = await leads_collection.insert_one(lead_data)
+            # Update conversation with lead_id
+            await conversations_collection.update_one(
+                {"session_id": session_id},
+                {"$set": {"lead_id": str(result.inserted_id)}}
+            )
@@ -1,18 +1,30 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
-from backend.models.kb_chunk import DocumentUpload, DocumentResponse
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Query
+from backend.models.kb_chunk import DocumentUpload, DocumentResponse, DocumentUpdateResponse
+from backend.models.kb_document import DocumentListResponse
+from backend.models.kb_job import KBJob, KBJobResponse
 from backend.models.user import TokenData
-from backend.database import get_kb_chunks_collection
-from backend.services.kb_processor import KBProcessor
+from backend.database import get_kb_jobs_collection, get_kb_chunks_collection
+from backend.services.kb_processor import KBProcessor, DocumentProcessing
+from backend.services import kb_documents
+from backend.services.ingestion_queue import ingestion_queue, IngestionQueueFull
+from backend.services.bulk_ingestion import summarize_report
+from backend.services.rag_service import retrieval_cache
+from backend.services.embedding_cache import query_embedding_cache
+from backend.services.answer_cache import answer_cache
 from backend.utils.auth import get_current_user
+from backend.utils.uploads import spool_upload, remove_spooled, UploadTooLarge
+from backend.config import settings
 from datetime import datetime
-from typing import List
+from typing import List, Optional
+import tarfile
+import zipfile
 
 router = APIRouter(prefix="/v1/knowledge-base", tags=["Knowledge Base"])
 
 kb_processor = KBProcessor()
 
 
-@router.post("/upload", response_model=DocumentResponse)
+@router.post("/upload", response_model=KBJobResponse, status_code=202)
 async def upload_document(
     document: DocumentUpload,
     current_user: TokenData = Depends(get_current_user)
@@ -20,6 +32,9 @@ async def upload_document(
     """
     Upload a text document to knowledge base
     
+    The document is chunked and embedded in the background; poll
+    `GET /v1/knowledge-base/jobs/{job_id}` for progress.
+    
     **Example Request:**
     ```json
     {
@@ -30,10 +45,10 @@ async def upload_document(
     """
     try:
         # Get collection
-        kb_chunks_collection = get_kb_chunks_collection()
+        kb_jobs_collection = get_kb_jobs_collection()
         
         # Check if MongoDB collections are initialized
-        if kb_chunks_collection is None:
+        if kb_jobs_collection is None:
             raise HTTPException(status_code=503, detail="Database not initialized. Please check MongoDB connection.")
         
         # Add metadata
@@ -41,75 +56,271 @@ async def upload_document(
             document.metadata = {}
         document.metadata["uploaded_by"] = current_user.email
         
-        # Process document
-        document_id = await kb_processor.process_document(
-            document,
-            current_user.tenant_id
-        )
+        # Queue document for ingestion
+        job = await ingestion_queue.submit(document, current_user.tenant_id)
         
-        # Count chunks
-        chunks_count = await kb_chunks_collection.count_documents({
-            "document_id": document_id,
-            "tenant_id": current_user.tenant_id
-        })
+        return job_response(job)
         
-        return DocumentResponse(
-            document_id=document_id,
-            name=document.name,
-            chunks_count=chunks_count,
-            created_at=datetime.utcnow()
+    except IngestionQueueFull:
+        raise HTTPException(status_code=503, detail="Ingestion queue is full, please retry shortly")
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error uploading document: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.post("/upload-file", response_model=KBJobResponse, status_code=202)
+async def upload_file(
+    file: UploadFile = File(...),
+    name: Optional[str] = Form(None),
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Upload a UTF-8 text file (e.g. .txt, .md) to knowledge base
+    
+    The file is streamed to disk in blocks and ingested in the background,
+    so its size is bounded only by settings.max_upload_size_mb.
+    
+    **Example Request:**
+    ```
+    curl -F "file=@faq.md" -F "name=Product FAQ" .../v1/knowledge-base/upload-file
+    ```
+    """
+    kb_jobs_collection = get_kb_jobs_collection()
+    if kb_jobs_collection is None:
+        raise HTTPException(status_code=503, detail="Database not initialized. Please check MongoDB connection.")
+    if ingestion_queue.queue is not None and ingestion_queue.queue.full():
+        raise HTTPException(status_code=503, detail="Ingestion queue is full, please retry shortly")
+    
+    try:
+        path = await spool_upload(
+            file,
+            settings.upload_spool_dir,
+            settings.upload_block_size,
+            settings.max_upload_size_mb * 1024 * 1024
+        )
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail=f"File exceeds {settings.max_upload_size_mb} MB")
+    
+    try:
+        job = await ingestion_queue.submit_file(
+            path,
+            name or file.filename or "Untitled",
+            current_user.tenant_id,
+            metadata={"uploaded_by": current_user.email, "filename": file.filename}
         )
+        return job_response(job)
         
+    except IngestionQueueFull:
+        remove_spooled(path)
+        raise HTTPException(status_code=503, detail="Ingestion queue is full, please retry shortly")
     except Exception as e:
-        print(f"Error uploading document: {e}")
+        remove_spooled(path)
+        print(f"Error uploading file: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
-@router.get("/documents")
-async def get_documents(current_user: TokenData = Depends(get_current_user)):
+@router.post("/bulk-upload", response_model=KBJobResponse, status_code=202)
+async def bulk_upload(
+    file: UploadFile = File(...),
+    current_user: TokenData = Depends(get_current_user)
+):
     """
-    Get all documents in knowledge base
+    Upload a .zip or .tar(.gz) archive of PDF, HTML, Markdown and text files
+    
+    Each supported file becomes its own document. Text extraction runs in a
+    process pool and ingestion in the background; poll
+    `GET /v1/knowledge-base/jobs/{job_id}` for progress and, once completed,
+    the per-file report (chunk counts and timings).
     
     **Example Request:**
     ```
-    GET /v1/knowledge-base/documents
+    curl -F "file=@handbook.zip" .../v1/knowledge-base/bulk-upload
     ```
     """
+    kb_jobs_collection = get_kb_jobs_collection()
+    if kb_jobs_collection is None:
+        raise HTTPException(status_code=503, detail="Database not initialized. Please check MongoDB connection.")
+    if ingestion_queue.queue is not None and ingestion_queue.queue.full():
+        raise HTTPException(status_code=503, detail="Ingestion queue is full, please retry shortly")
+    
     try:
-        # Get collection
-        kb_chunks_collection = get_kb_chunks_collection()
+        path = await spool_upload(
+            file,
+            settings.upload_spool_dir,
+            settings.upload_block_size,
+            settings.max_archive_size_mb * 1024 * 1024
+        )
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail=f"Archive exceeds {settings.max_archive_size_mb} MB")
+    
+    if not (zipfile.is_zipfile(path) or tarfile.is_tarfile(path)):
+        remove_spooled(path)
+        raise HTTPException(status_code=400, detail="File must be a .zip or .tar archive")
+    
+    try:
+        job = await ingestion_queue.submit_archive(
+            path,
+            file.filename or "Archive",
+            current_user.tenant_id,
+            metadata={"uploaded_by": current_user.email, "archive": file.filename}
+        )
+        return job_response(job)
         
-        # Check if MongoDB collections are initialized
-        if kb_chunks_collection is None:
-            raise HTTPException(status_code=503, detail="Database not initialized. Please check MongoDB connection.")
+    except IngestionQueueFull:
+        remove_spooled(path)
+        raise HTTPException(status_code=503, detail="Ingestion queue is full, please retry shortly")
+    except Exception as e:
+        remove_spooled(path)
+        print(f"Error uploading archive: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.get("/jobs/{job_id}", response_model=KBJobResponse)
+async def get_job(
+    job_id: str,
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Get the status of a document ingestion job
+    
+    **Example Response:**
+    ```json
+    {
+        "job_id": "3f0c...",
+        "document_id": "9b1e...",
+        "name": "Product Information",
+        "status": "running",
+        "chunks_processed": 1500,
+        "chunks_per_second": 120.5,
+        "error": null
+    }
+    ```
+    """
+    kb_jobs_collection = get_kb_jobs_collection()
+    if kb_jobs_collection is None:
+        raise HTTPException(status_code=503, detail="Database not initialized. Please check MongoDB connection.")
+    
+    job_doc = await kb_jobs_collection.find_one(
+        {"job_id": job_id, "tenant_id": current_user.tenant_id},
+        {"content": 0}
+    )
+    if not job_doc:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job_response(KBJob(**job_doc))
+
+
+def job_response(job: KBJob) -> KBJobResponse:
+    """API view of a job, with throughput derived from its timestamps"""
+    chunks_per_second = None
+    if job.started_at and job.chunks_processed:
+        elapsed = ((job.finished_at or datetime.utcnow()) - job.started_at).total_seconds()
+        if elapsed > 0:
+            chunks_per_second = round(job.chunks_processed / elapsed, 2)
+    
+    return KBJobResponse(
+        job_id=job.job_id,
+        document_id=job.document_id,
+        name=job.document_name,
+        kind=job.kind,
+        status=job.status,
+        chunks_processed=job.chunks_processed,
+        chunks_per_second=chunks_per_second,
+        error=job.error,
+        files_processed=job.files_processed,
+        summary=summarize_report(job.report) if job.report is not None else None,
+        report=job.report,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at
+    )
+
+
+@router.get("/documents", response_model=DocumentListResponse)
+async def get_documents(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Get documents in knowledge base, newest first
+    
+    Pages are keyset-paginated: pass the returned `next_cursor` as `cursor`
+    to get the next page; it is null on the last page.
+    
+    **Example Request:**
+    ```
+    GET /v1/knowledge-base/documents?limit=50&cursor=MjAyNS0w...
+    ```
+    """
+    try:
+        documents, next_cursor = await kb_documents.list_documents(current_user.tenant_id, limit, cursor)
+        
+        return DocumentListResponse(
+            documents=[
+                DocumentResponse(
+                    document_id=doc.document_id,
+                    name=doc.name,
+                    chunks_count=doc.chunk_count,
+                    token_count=doc.token_count,
+                    status=doc.status,
+                    created_at=doc.created_at
+                )
+                for doc in documents
+            ],
+            next_cursor=next_cursor
+        )
         
-        # Aggregate to get unique documents
-        pipeline = [
-            {"$match": {"tenant_id": current_user.tenant_id}},
-            {
-                "$group": {
-                    "_id": "$document_id",
-                    "name": {"$first": "$document_name"},
-                    "chunks_count": {"$sum": 1},
-                    "created_at": {"$first": "$created_at"}
-                }
-            },
-            {"$sort": {"created_at": -1}}
-        ]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    except Exception as e:
+        print(f"Error getting documents: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.put("/documents/{document_id}", response_model=DocumentUpdateResponse)
+async def update_document(
+    document_id: str,
+    document: DocumentUpload,
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Replace a document's content, re-embedding only the chunks that changed
+    
+    **Example Request:**
+    ```json
+    {
+        "name": "Pricing 2025",
+        "content": "Updated pricing sheet..."
+    }
+    ```
+    """
+    if get_kb_chunks_collection() is None:
+        raise HTTPException(status_code=503, detail="Database not initialized. Please check MongoDB connection.")
+    
+    try:
+        if not document.metadata:
+            document.metadata = {}
+        document.metadata["uploaded_by"] = current_user.email
         
-        documents = []
-        async for doc in kb_chunks_collection.aggregate(pipeline):
-            documents.append({
-                "document_id": doc["_id"],
-                "name": doc["name"],
-                "chunks_count": doc["chunks_count"],
-                "created_at": doc["created_at"]
-            })
+        result = await kb_processor.update_document(document_id, document, current_user.tenant_id)
+        if result is None:
+            raise HTTPException(status_code=404, detail="Document not found")
         
-        return documents
+        return DocumentUpdateResponse(
+            document_id=document_id,
+            name=document.name,
+            **result
+        )
         
+    except DocumentProcessing:
+        raise HTTPException(status_code=409, detail="Document is still being ingested, please retry once it is ready")
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error getting documents: {e}")
+        print(f"Error updating document: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
@@ -149,37 +360,38 @@ async def get_kb_stats(current_user: TokenData = Depends(get_current_user)):
     ```json
     {
         "total_documents": 5,
-        "total_chunks": 120
+        "total_chunks": 120,
+        "total_tokens": 36000
     }
     ```
     """
     try:
-        # Get collection
-        kb_chunks_collection = get_kb_chunks_collection()
-        
-        # Check if MongoDB collections are initialized
-        if kb_chunks_collection is None:
-            raise HTTPException(status_code=503, detail="Database not initialized. Please check MongoDB connection.")
-        
-        total_chunks = await kb_chunks_collection.count_documents({
-            "tenant_id": current_user.tenant_id
-        })
-        
-        # Count unique documents
-        pipeline = [
-            {"$match": {"tenant_id": current_user.tenant_id}},
-            {"$group": {"_id": "$document_id"}},
-            {"$count": "total"}
-        ]
-        
-        result = await kb_chunks_collection.aggregate(pipeline).to_list(1)
-        total_documents = result[0]["total"] if result else 0
-        
-        return {
-            "total_documents": total_documents,
-            "total_chunks": total_chunks
-        }
+        return await kb_documents.get_totals(current_user.tenant_id)
         
     except Exception as e:
         print(f"Error getting KB stats: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.get("/cache-stats")
+async def get_cache_stats(current_user: TokenData = Depends(get_current_user)):
+    """
+    Get retrieval, query-embedding and answer cache statistics for this worker
+    
+    Counters cover the current user's tenant only; the caches themselves are
+    shared by every tenant on the worker.
+    
+    **Example Response:**
+    ```json
+    {
+        "retrieval": {"size": 40, "maxsize": 4096, "hits": 300, "misses": 100, "hit_rate": 0.75},
+        "query_embeddings": {"hits": 310, "misses": 90, "hit_rate": 0.775, "persistent_hits": 12, "api_calls": 78},
+        "answers": {"size": 20, "hits": 400, "misses": 180, "hit_rate": 0.6897}
+    }
+    ```
+    """
+    return {
+        "retrieval": retrieval_cache.group_stats(current_user.tenant_id),
+        "query_embeddings": query_embedding_cache.tenant_stats(current_user.tenant_id),
+        "answers": answer_cache.tenant_stats(current_user.tenant_id)
+    }
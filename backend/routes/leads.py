@@ -4,6 +4,7 @@ from backend.models.lead import LeadResponse, LeadUpdate, Lead, LeadStatus, Lead
 from backend.models.user import TokenData
 from backend.database import get_leads_collection, get_conversations_collection
 from backend.utils.auth import get_current_user
+from backend.services.ai_agent import ai_agent
 from datetime import datetime
 from bson import ObjectId
 
@@ -241,3 +242,25 @@ async def get_lead_stats(current_user: TokenData = Depends(get_current_user)):
     except Exception as e:
         print(f"Error getting lead stats: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.get("/stats/extraction")
+async def get_extraction_stats(current_user: TokenData = Depends(get_current_user)):
+    """
+    Get this worker's lead-extraction call counters for the current user's tenant
+    
+    Shows how many LLM extraction calls the local pre-extractor avoided, and
+    how many rode along with the reply when single-call extraction is enabled.
+    
+    **Example Response:**
+    ```json
+    {
+        "llm_calls_executed": 420,
+        "llm_calls_combined": 0,
+        "llm_calls_skipped": 580,
+        "skip_rate": 0.58,
+        "heuristic_fields_filled": 310
+    }
+    ```
+    """
+    return ai_agent.lead_extractor.stats(current_user.tenant_id)
@@ -1,4 +1,4 @@
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 from openai import AsyncOpenAI
 from backend.config import settings
 from backend.models.conversation import Message, Conversation
@@ -7,13 +7,25 @@ from backend.models.tenant import Tenant
 from backend.services.rag_service import RAGService
 from backend.services.lead_extraction import LeadExtractionService
 from backend.services.lead_scoring import LeadScoringEngine
+from backend.services.conversation_summary import conversation_summarizer
+from backend.services.answer_cache import answer_cache
 from backend.services.email_service import email_service
 from backend.database import get_conversations_collection, get_leads_collection
 from datetime import datetime
+import asyncio
 import uuid
 
 client = AsyncOpenAI(api_key=settings.openai_api_key)
 
+FALLBACK_REPLY = "I apologize, but I'm having trouble processing your request right now. Please try again."
+
+# Appended to the system prompt when the reply call also carries the extraction tool
+SINGLE_CALL_INSTRUCTIONS = """
+
+Always answer the customer in plain text. When the customer's latest message shares
+contact or qualification details (name, email, phone, service, budget, timeline,
+location, company), also call update_lead_information with only what they stated."""
+
 
 class AIAgent:
     """Core AI agent for lead qualification conversations"""
@@ -22,6 +34,8 @@ class AIAgent:
         self.rag_service = RAGService()
         self.lead_extractor = LeadExtractionService()
         self.scoring_engine = LeadScoringEngine()
+        self.summarizer = conversation_summarizer
+        self.answer_cache = answer_cache
     
     async def process_message(
         self,
@@ -44,6 +58,55 @@ class AIAgent:
         Returns:
             Tuple of (response_message, updated_conversation, updated_lead, lead_became_hot)
         """
+        conversation = self._start_turn(user_message, session_id, tenant, conversation)
+        
+        # Extraction only needs the user's side of the conversation, so it runs
+        # alongside retrieval + reply instead of after them; each stage has its
+        # own time limit, and cancelling the turn cancels both. Extraction only
+        # sees the messages since its last successful run
+        current_fields = lead.fields if lead else LeadFields()
+        history = self.lead_extractor.extraction_history(conversation)
+        if settings.single_call_extraction:
+            assistant_message, updated_fields = await self._single_call_turn(
+                user_message, conversation, tenant, history, current_fields
+            )
+        else:
+            assistant_message, updated_fields = await asyncio.gather(
+                self._generate_reply(user_message, conversation, tenant),
+                self._extract_fields(conversation, history, current_fields)
+            )
+        
+        return await self._finish_turn(
+            user_message, assistant_message, session_id, tenant, conversation, lead, updated_fields
+        )
+    
+    def start_stream(
+        self,
+        user_message: str,
+        session_id: str,
+        tenant: Tenant,
+        conversation: Optional[Conversation] = None,
+        lead: Optional[Lead] = None
+    ) -> "StreamingTurn":
+        """
+        Start a turn whose reply is streamed token by token
+        
+        Lead extraction starts in the background right away; see StreamingTurn.
+        """
+        conversation = self._start_turn(user_message, session_id, tenant, conversation)
+        current_fields = lead.fields if lead else LeadFields()
+        history = self.lead_extractor.extraction_history(conversation)
+        extraction = asyncio.create_task(self._extract_fields(conversation, history, current_fields))
+        return StreamingTurn(self, user_message, session_id, tenant, conversation, lead, extraction)
+    
+    def _start_turn(
+        self,
+        user_message: str,
+        session_id: str,
+        tenant: Tenant,
+        conversation: Optional[Conversation]
+    ) -> Conversation:
+        """Conversation (created if new) with the user's message appended"""
         # Initialize conversation if new
         if not conversation:
             conversation = Conversation(
@@ -56,60 +119,28 @@ class AIAgent:
         # Add user message
         user_msg = Message(role="user", content=user_message)
         conversation.messages.append(user_msg)
-        
-        # Retrieve relevant KB chunks
-        kb_chunks = await self.rag_service.retrieve_relevant_chunks(
-            user_message,
-            tenant.tenant_id
-        )
-        
-        # Build context
-        context = self.rag_service.build_context(kb_chunks)
-        
-        # Create system message with RAG context
-        system_message = self.rag_service.create_rag_system_message(
-            context,
-            tenant.name
-        )
-        
-        # Prepare messages for OpenAI
-        openai_messages = [
-            {"role": "system", "content": system_message}
-        ]
-        
-        # Add conversation history (last 10 messages)
-        for msg in conversation.messages[-10:]:
-            openai_messages.append({
-                "role": msg.role,
-                "content": msg.content
-            })
-        
-        # Generate response
-        try:
-            response = await client.chat.completions.create(
-                model=settings.openai_model,
-                messages=openai_messages,
-                temperature=settings.openai_temperature,
-                max_tokens=settings.max_tokens
-            )
-            
-            assistant_message = response.choices[0].message.content
-            
-        except Exception as e:
-            print(f"Error generating AI response: {e}")
-            assistant_message = "I apologize, but I'm having trouble processing your request right now. Please try again."
-        
+        return conversation
+    
+    async def _finish_turn(
+        self,
+        user_message: str,
+        assistant_message: str,
+        session_id: str,
+        tenant: Tenant,
+        conversation: Conversation,
+        lead: Optional[Lead],
+        updated_fields: Optional[LeadFields]
+    ) -> tuple[str, Conversation, Optional[Lead], bool]:
+        """Record the reply, then score and update the lead from extracted fields"""
         # Add assistant message
         assistant_msg = Message(role="assistant", content=assistant_message)
         conversation.messages.append(assistant_msg)
         conversation.last_message_at = datetime.utcnow()
         
-        # Extract lead information
+        # Fold older turns into the summary in the background if due
+        self.summarizer.schedule(conversation)
+        
         current_fields = lead.fields if lead else LeadFields()
-        updated_fields = await self.lead_extractor.extract_from_conversation(
-            [{"role": m.role, "content": m.content} for m in conversation.messages],
-            current_fields
-        )
         
         # Update or create lead
         lead_became_hot = False
@@ -172,6 +203,244 @@ class AIAgent:
         
         return assistant_message, conversation, lead, lead_became_hot
     
+    async def _reply_messages(
+        self,
+        user_message: str,
+        conversation: Conversation,
+        tenant: Tenant
+    ) -> Tuple[List[Dict[str, str]], bool]:
+        """
+        Chat messages for the reply: system prompt with KB context, then summary and recent history
+        
+        Returns:
+            Tuple of (messages, whether retrieval completed in time)
+        """
+        # Retrieve relevant KB chunks; answer without context if that is slow
+        retrieved = True
+        try:
+            kb_chunks = await asyncio.wait_for(
+                self.rag_service.retrieve_relevant_chunks(
+                    user_message,
+                    tenant.tenant_id,
+                    tenant.kb_version
+                ),
+                timeout=settings.retrieval_timeout_seconds
+            )
+        except asyncio.TimeoutError:
+            print("KB retrieval timed out, answering without context")
+            kb_chunks = []
+            retrieved = False
+        
+        # Build context
+        context = self.rag_service.build_context(kb_chunks)
+        
+        # Create system message with RAG context
+        system_message = self.rag_service.create_rag_system_message(
+            context,
+            tenant.name
+        )
+        
+        # Prepare messages for OpenAI
+        openai_messages = [
+            {"role": "system", "content": system_message}
+        ]
+        
+        # Add conversation summary and as much recent history as fits the budget
+        openai_messages.extend(self.summarizer.context_messages(conversation, settings.history_token_budget))
+        
+        return openai_messages, retrieved
+    
+    async def _cached_reply(
+        self,
+        user_message: str,
+        conversation: Conversation,
+        tenant: Tenant
+    ) -> Tuple[Optional[str], Optional[List[float]]]:
+        """
+        Answer-cache lookup for FAQ-style questions
+        
+        Returns:
+            Tuple of (cached reply or None, question embedding to store the new
+            reply under; None when the reply must not be cached)
+        """
+        if not self.answer_cache.is_cacheable(user_message, conversation, tenant):
+            return None, None
+        return await self.answer_cache.lookup(tenant, user_message)
+    
+    async def _generate_reply(
+        self,
+        user_message: str,
+        conversation: Conversation,
+        tenant: Tenant,
+        use_cache: bool = True
+    ) -> str:
+        """Retrieve KB context and generate the assistant's reply (use_cache=False if the caller already looked it up)"""
+        cached, question_embedding = None, None
+        if use_cache:
+            cached, question_embedding = await self._cached_reply(user_message, conversation, tenant)
+        if cached is not None:
+            return cached
+        
+        openai_messages, retrieved = await self._reply_messages(user_message, conversation, tenant)
+        
+        # Generate response
+        try:
+            response = await asyncio.wait_for(
+                client.chat.completions.create(
+                    model=settings.openai_model,
+                    messages=openai_messages,
+                    temperature=settings.openai_temperature,
+                    max_tokens=settings.max_tokens
+                ),
+                timeout=settings.reply_timeout_seconds
+            )
+            reply = response.choices[0].message.content
+            
+        except Exception as e:
+            print(f"Error generating AI response: {e!r}")
+            return FALLBACK_REPLY
+        
+        # Only replies grounded in a complete retrieval are worth sharing
+        if question_embedding is not None and retrieved and reply:
+            self.answer_cache.store(tenant, user_message, question_embedding, reply)
+        return reply
+    
+    async def _single_call_turn(
+        self,
+        user_message: str,
+        conversation: Conversation,
+        tenant: Tenant,
+        history: List[Dict[str, str]],
+        current_fields: LeadFields
+    ) -> Tuple[str, Optional[LeadFields]]:
+        """
+        Reply and lead extraction from one completion
+        
+        The reply call carries the update_lead_information tool, so a turn costs
+        one round trip instead of two. An answer without a tool call means the
+        message stated nothing new (the instructions ask for the call whenever
+        it does), so no second extraction call follows. Falls back to the
+        separate extraction call only when the combined call fails, and to a
+        plain reply call when it uses the tool without answering.
+        """
+        local_fields, needs_llm = self.lead_extractor.pre_extract(history, current_fields, conversation.tenant_id)
+        if not needs_llm:
+            # Nothing for the model to extract; keep the tool out of the prompt
+            conversation.extracted_until = len(conversation.messages)
+            return await self._generate_reply(user_message, conversation, tenant), local_fields
+        
+        base_fields = local_fields or current_fields
+        cached, question_embedding = await self._cached_reply(user_message, conversation, tenant)
+        if cached is not None:
+            updated_fields = await self._extract_fields(conversation, history, base_fields, use_heuristics=False)
+            return cached, updated_fields or local_fields
+        
+        openai_messages, retrieved = await self._reply_messages(user_message, conversation, tenant)
+        openai_messages[0]["content"] += SINGLE_CALL_INSTRUCTIONS
+        
+        assistant_message, updated_fields = None, None
+        answered = False
+        try:
+            response = await asyncio.wait_for(
+                client.chat.completions.create(
+                    model=settings.openai_model,
+                    messages=openai_messages,
+                    temperature=settings.openai_temperature,
+                    max_tokens=settings.max_tokens,
+                    tools=self.lead_extractor.extraction_tools,
+                    tool_choice="auto"
+                ),
+                timeout=settings.reply_timeout_seconds
+            )
+            message = response.choices[0].message
+            assistant_message = message.content
+            updated_fields = self.lead_extractor.parse_tool_calls(message, base_fields)
+            answered = True
+            
+        except Exception as e:
+            print(f"Error generating AI response with extraction: {e!r}")
+        
+        if answered:
+            # With or without the tool, this completion did the extraction
+            self.lead_extractor.counters[conversation.tenant_id]["llm_calls_combined"] += 1
+            conversation.extracted_until = len(conversation.messages)
+        else:
+            # The combined call failed: two-call path
+            updated_fields = await self._extract_fields(conversation, history, base_fields, use_heuristics=False)
+        
+        if not assistant_message:
+            assistant_message = await self._generate_reply(user_message, conversation, tenant, use_cache=False)
+        elif question_embedding is not None and retrieved:
+            self.answer_cache.store(tenant, user_message, question_embedding, assistant_message)
+        
+        return assistant_message, updated_fields or local_fields
+    
+    async def _stream_reply(self, user_message: str, conversation: Conversation, tenant: Tenant) -> AsyncIterator[str]:
+        """Retrieve KB context and yield the assistant's reply as it is generated"""
+        cached, question_embedding = await self._cached_reply(user_message, conversation, tenant)
+        if cached is not None:
+            yield cached
+            return
+        
+        openai_messages, retrieved = await self._reply_messages(user_message, conversation, tenant)
+        
+        parts = []
+        try:
+            # The timeout covers the wait for the first token, not the whole reply
+            stream = await asyncio.wait_for(
+                client.chat.completions.create(
+                    model=settings.openai_model,
+                    messages=openai_messages,
+                    temperature=settings.openai_temperature,
+                    max_tokens=settings.max_tokens,
+                    stream=True
+                ),
+                timeout=settings.reply_timeout_seconds
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+            
+            if question_embedding is not None and retrieved and parts:
+                self.answer_cache.store(tenant, user_message, question_embedding, "".join(parts))
+            
+        except Exception as e:
+            print(f"Error streaming AI response: {e!r}")
+            if not parts:
+                yield FALLBACK_REPLY
+    
+    async def _extract_fields(
+        self,
+        conversation: Conversation,
+        messages: List[Dict[str, str]],
+        current_fields: LeadFields,
+        use_heuristics: bool = True
+    ) -> Optional[LeadFields]:
+        """
+        Lead extraction bounded by settings.extraction_timeout_seconds
+        
+        On success the conversation's extraction high-water mark moves past the
+        user's message; after a failure the same messages are sent again next turn.
+        """
+        extracted_until = len(conversation.messages)
+        try:
+            updated_fields = await asyncio.wait_for(
+                self.lead_extractor.extract_from_conversation(
+                    messages, current_fields, conversation.tenant_id, use_heuristics
+                ),
+                timeout=settings.extraction_timeout_seconds
+            )
+        except asyncio.TimeoutError:
+            print("Lead extraction timed out")
+            return None
+        except Exception as e:
+            print(f"Error extracting lead information: {e}")
+            return None
+        
+        conversation.extracted_until = extracted_until
+        return updated_fields
+    
     def _extract_intent_keywords(self, message: str) -> List[str]:
         """Extract intent keywords from message"""
         intent_keywords = ["pricing", "price", "cost", "quote", "buy", "purchase", "demo", "trial", "signup", "sign up"]
@@ -187,5 +456,55 @@ class AIAgent:
         return "\n".join(lines)
 
 
+class StreamingTurn:
+    """
+    A chat turn in progress whose reply is streamed
+    
+    Iterate tokens() to relay the reply as the model produces it, then await
+    finish() for the same (message, conversation, lead, lead_became_hot) as
+    AIAgent.process_message. Lead extraction runs in the background while the
+    reply streams, so finish() usually only has scoring left to do.
+    """
+    
+    def __init__(
+        self,
+        agent: AIAgent,
+        user_message: str,
+        session_id: str,
+        tenant: Tenant,
+        conversation: Conversation,
+        lead: Optional[Lead],
+        extraction: "asyncio.Task[Optional[LeadFields]]"
+    ):
+        self.agent = agent
+        self.user_message = user_message
+        self.session_id = session_id
+        self.tenant = tenant
+        self.conversation = conversation
+        self.lead = lead
+        self.extraction = extraction
+        self.parts: List[str] = []
+    
+    async def tokens(self) -> AsyncIterator[str]:
+        async for token in self.agent._stream_reply(self.user_message, self.conversation, self.tenant):
+            self.parts.append(token)
+            yield token
+    
+    async def finish(self) -> tuple[str, Conversation, Optional[Lead], bool]:
+        return await self.agent._finish_turn(
+            self.user_message,
+            "".join(self.parts),
+            self.session_id,
+            self.tenant,
+            self.conversation,
+            self.lead,
+            await self.extraction
+        )
+    
+    def cancel(self):
+        """Abandon the turn (e.g. the client went away)"""
+        self.extraction.cancel()
+
+
 # Global AI agent instance
 ai_agent = AIAgent()
@@ -0,0 +1,172 @@
+from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+from backend.config import settings
+from backend.models.conversation import Conversation
+from backend.models.tenant import Tenant
+from backend.services.embedding_cache import query_embedding_cache, normalize_query
+from backend.services.lead_heuristics import pre_extract
+from backend.services.vector_index import normalize_rows
+import numpy as np
+import time
+
+
+class AnswerEntry:
+    """A cached reply and the question embedding it answers"""
+
+    def __init__(self, embedding: np.ndarray, answer: str, kb_version: int):
+        self.embedding = embedding  # unit length
+        self.answer = answer
+        self.kb_version = kb_version
+        self.expires_at = time.monotonic() + settings.answer_cache_ttl_seconds
+
+
+class TenantAnswers:
+    """One tenant's LRU of question -> answer, with hit/miss counters"""
+
+    def __init__(self):
+        self.entries: "OrderedDict[str, AnswerEntry]" = OrderedDict()  # normalized question -> entry
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class SemanticAnswerCache:
+    """
+    Per-tenant cache of replies to repeated first-turn FAQ-style questions
+
+    A question is matched by cosine similarity of its embedding (the same
+    cached query embedding retrieval uses, so a lookup costs no extra API
+    call) against earlier questions of the same tenant. A hit needs
+    settings.answer_cache_similarity_threshold and the tenant's current KB
+    version, so a knowledge-base change retires every cached answer. Only the
+    reply is cached: lead extraction and scoring run on every turn as usual.
+
+    In-process: each worker has its own cache, bounded per tenant
+    (answer_cache_max_entries_per_tenant) and in the number of tenants
+    (answer_cache_max_tenants), both least recently used first.
+    """
+
+    def __init__(self):
+        self.tenants: "OrderedDict[str, TenantAnswers]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def enabled_for(self, tenant: Tenant) -> bool:
+        if tenant.settings.answer_cache is not None:
+            return tenant.settings.answer_cache
+        return settings.answer_cache_enabled
+
+    def is_cacheable(self, question: str, conversation: Conversation, tenant: Tenant) -> bool:
+        """
+        Whether a reply to this question can be shared between visitors
+
+        Only the first message of a chat: the reply prompt then holds nothing
+        but the system prompt, KB context and the question itself, so no other
+        visitor's history or summary can end up in a shared answer. The
+        question must also be short and carry no personal details.
+        """
+        if not self.enabled_for(tenant):
+            return False
+        if len(conversation.messages) > 1 or conversation.summary:
+            return False
+        if len(question.split()) > settings.answer_cache_max_question_words:
+            return False
+        return not pre_extract(question).fields  # email, phone, name, budget...
+
+    async def lookup(self, tenant: Tenant, question: str) -> Tuple[Optional[str], Optional[List[float]]]:
+        """
+        Cached answer for a question similar enough to an earlier one
+
+        Returns:
+            Tuple of (answer or None, the question's embedding for store(); None
+            if embedding failed)
+        """
+        try:
+            embedding = await query_embedding_cache.get_embedding(question, tenant_id=tenant.tenant_id)
+        except Exception as e:
+            print(f"Error embedding question for answer cache: {e}")
+            return None, None
+
+        answers = self._tenant_answers(tenant.tenant_id)
+        entry = self._best_match(answers, np.asarray(embedding, dtype=np.float32), tenant.kb_version)
+        if entry is None:
+            self.misses += 1
+            answers.misses += 1
+            return None, embedding
+
+        self.hits += 1
+        answers.hits += 1
+        return entry.answer, embedding
+
+    def store(self, tenant: Tenant, question: str, embedding: List[float], answer: str):
+        """Remember an answer, evicting the tenant's oldest entries beyond its cap"""
+        answers = self._tenant_answers(tenant.tenant_id)
+        vector = normalize_rows(np.asarray(embedding, dtype=np.float32)[None, :])[0]
+        key = normalize_query(question)
+        answers.entries[key] = AnswerEntry(vector, answer, tenant.kb_version)
+        answers.entries.move_to_end(key)
+        while len(answers.entries) > settings.answer_cache_max_entries_per_tenant:
+            answers.entries.popitem(last=False)
+            self.evictions += 1
+
+    def _tenant_answers(self, tenant_id: str) -> TenantAnswers:
+        """A tenant's answers, marked most recently used; evicts the least recent tenant beyond the cap"""
+        answers = self.tenants.get(tenant_id)
+        if answers is None:
+            answers = self.tenants[tenant_id] = TenantAnswers()
+            while len(self.tenants) > settings.answer_cache_max_tenants:
+                _, evicted = self.tenants.popitem(last=False)
+                self.evictions += len(evicted.entries)
+        self.tenants.move_to_end(tenant_id)
+        return answers
+
+    def _best_match(self, answers: TenantAnswers, embedding: np.ndarray, kb_version: int) -> Optional[AnswerEntry]:
+        if not answers.entries:
+            return None
+
+        # Answers from an older KB or past their TTL are dropped on sight
+        now = time.monotonic()
+        for key in [key for key, entry in answers.entries.items() if entry.kb_version != kb_version or entry.expires_at <= now]:
+            del answers.entries[key]
+            self.evictions += 1
+        if not answers.entries:
+            return None
+
+        keys = list(answers.entries)
+        matrix = np.stack([answers.entries[key].embedding for key in keys])
+        similarities = matrix @ normalize_rows(embedding[None, :])[0]
+        best = int(np.argmax(similarities))
+        if similarities[best] < settings.answer_cache_similarity_threshold:
+            return None
+
+        answers.entries.move_to_end(keys[best])
+        return answers.entries[keys[best]]
+
+    def stats(self) -> Dict[str, object]:
+        """Worker-wide counters"""
+        lookups = self.hits + self.misses
+        return {
+            "tenants": len(self.tenants),
+            "size": sum(len(answers.entries) for answers in self.tenants.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+    def tenant_stats(self, tenant_id: str) -> Dict[str, object]:
+        """One tenant's counters"""
+        return (self.tenants.get(tenant_id) or TenantAnswers()).stats()
+
+
+# Global answer cache instance
+answer_cache = SemanticAnswerCache()
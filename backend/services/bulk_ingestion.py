@@ -0,0 +1,226 @@
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path, PurePosixPath
+from backend.config import settings
+from backend.models.kb_chunk import DocumentUpload
+from backend.services.kb_processor import KBProcessor, IngestionSuperseded
+from backend.services.text_extraction import SUPPORTED_EXTENSIONS, extract_text
+import asyncio
+import multiprocessing
+import tarfile
+import time
+import uuid
+import zipfile
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Shared pool for CPU-bound text extraction, created on first use
+
+    Workers are spawned rather than forked: a fork of the running server would
+    inherit its threads' held locks (logging, the Mongo driver) and can deadlock.
+    """
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=settings.extraction_workers or None,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+def archive_members(path: Path) -> Iterator[Tuple[str, int, Callable[[], bytes]]]:
+    """
+    (name, size, read) for every regular file in a .zip or .tar(.gz/.bz2/.xz)
+    archive, or below a directory
+
+    read() loads one member's bytes, so only members in flight are in memory.
+    """
+    if path.is_dir():
+        for file in sorted(p for p in path.rglob("*") if p.is_file()):
+            yield file.relative_to(path).as_posix(), file.stat().st_size, file.read_bytes
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    yield info.filename, info.file_size, lambda info=info: archive.read(info)
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path) as archive:
+            for member in archive:
+                if member.isfile():
+                    yield member.name, member.size, lambda member=member: archive.extractfile(member).read()
+    else:
+        raise ValueError("Archive must be a .zip or .tar file or a directory")
+
+
+def is_ingestible(name: str) -> bool:
+    """Supported type, and not OS metadata such as __MACOSX/ or .DS_Store"""
+    path = PurePosixPath(name)
+    if any(part.startswith(".") or part == "__MACOSX" for part in path.parts):
+        return False
+    return path.suffix.lower() in SUPPORTED_EXTENSIONS
+
+
+class BulkIngestor:
+    """
+    Ingest every document in an archive
+
+    A producer reads archive members and hands text extraction to a process
+    pool; a bounded queue between extraction and the async embed/insert
+    workers provides backpressure, so at most bulk_extraction_backlog
+    extracted documents wait in memory while embedding catches up.
+    """
+
+    def __init__(self, kb_processor: Optional[KBProcessor] = None):
+        # The ingestion queue passes its own processor so both share one OpenAI client
+        self.kb_processor = kb_processor or KBProcessor()
+
+    async def ingest_archive(
+        self,
+        path: Path,
+        tenant_id: str,
+        batch_id: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        replace_existing: bool = False,
+        on_file_done: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        on_batch: Optional[Callable[[], Awaitable[None]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Extract, chunk, embed and store each file of an archive
+
+        Args:
+            path: Archive (or directory) on disk
+            tenant_id: Tenant ID
+            batch_id: Stable id of this import; document ids are derived from it
+                so a re-run maps each file to the same document
+            metadata: Metadata added to every document
+            replace_existing: Delete a file's document first (resuming an interrupted run)
+            on_file_done: Awaited with each file's report entry as it completes
+            on_batch: Awaited after every batch of chunks a file stores, so a
+                long file keeps signalling progress; raising IngestionSuperseded
+                from it (or on_file_done) stops the whole import
+
+        Returns:
+            Per-file report entries, in archive order
+        """
+        loop = asyncio.get_running_loop()
+        pool = get_process_pool()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, settings.bulk_extraction_backlog))
+        report: List[Dict[str, Any]] = []
+        max_file_bytes = settings.bulk_max_file_size_mb * 1024 * 1024
+        consumers = max(1, settings.bulk_ingest_concurrency)
+
+        async def produce():
+            members = archive_members(path)
+            try:
+                while True:
+                    member = await asyncio.to_thread(next, members, None)
+                    if member is None:
+                        break
+                    await enqueue(*member)
+            finally:
+                members.close()
+            for _ in range(consumers):
+                await queue.put(None)
+
+        async def enqueue(name: str, size: int, read: Callable[[], bytes]):
+            entry = {
+                "file": name,
+                "document_id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"{batch_id}/{name}")),
+                "status": "pending",
+                "chunks": 0,
+                "extract_ms": None,
+                "ingest_ms": None,
+                "error": None
+            }
+            report.append(entry)
+
+            if not is_ingestible(name):
+                entry.update(status="skipped", error="Unsupported file type")
+            elif size > max_file_bytes:
+                entry.update(status="skipped", error=f"File exceeds {settings.bulk_max_file_size_mb} MB")
+            if entry["status"] == "skipped":
+                if on_file_done:
+                    await on_file_done(entry)
+                return
+
+            started = time.perf_counter()
+            data = await asyncio.to_thread(read)
+            extraction = loop.run_in_executor(pool, extract_text, name, data)
+            # Blocks while the embed/insert side is behind
+            await queue.put((entry, extraction, started))
+
+        async def on_progress(chunks_count: int):
+            if on_batch:
+                await on_batch()
+
+        async def consume():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                entry, extraction, started = item
+                try:
+                    text = await extraction
+                    entry["extract_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                    if not text:
+                        entry.update(status="skipped", error="No text found")
+                        continue
+
+                    started = time.perf_counter()
+                    if replace_existing:
+                        await self.kb_processor.delete_document(entry["document_id"], tenant_id)
+                    _, chunks_count = await self.kb_processor.process_document(
+                        DocumentUpload(
+                            name=PurePosixPath(entry["file"]).name,
+                            content=text,
+                            metadata={**(metadata or {}), "source_file": entry["file"], "bulk_import_id": batch_id}
+                        ),
+                        tenant_id,
+                        document_id=entry["document_id"],
+                        on_progress=on_progress
+                    )
+                    entry.update(
+                        status="ingested",
+                        chunks=chunks_count,
+                        ingest_ms=round((time.perf_counter() - started) * 1000, 1)
+                    )
+                except IngestionSuperseded:
+                    raise
+                except Exception as e:
+                    entry.update(status="failed", error=str(e))
+                finally:
+                    if on_file_done:
+                        await on_file_done(entry)
+
+        tasks = [asyncio.create_task(produce())]
+        tasks += [asyncio.create_task(consume()) for _ in range(consumers)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # A dead consumer would otherwise leave the producer blocked on put()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        return report
+
+
+def summarize_report(report: List[Dict[str, Any]]) -> Dict[str, int]:
+    """File counts per status and total chunks"""
+    summary = {"files": len(report), "ingested": 0, "skipped": 0, "failed": 0, "chunks": 0}
+    for entry in report:
+        if entry["status"] in summary:
+            summary[entry["status"]] += 1
+        summary["chunks"] += entry["chunks"]
+    return summary
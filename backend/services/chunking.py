@@ -0,0 +1,327 @@
+from typing import List, Optional, Tuple
+from functools import lru_cache
+import re
+
+try:
+    import tiktoken
+except ImportError:  # fall back to a word-based estimate
+    tiktoken = None
+
+# Markdown-ish structure: "# Heading" lines and "| a | b |" table rows
+HEADING_PATTERN = re.compile(r"^\s{0,3}#{1,6}\s")
+TABLE_ROW_PATTERN = re.compile(r"^\s*\|")
+PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+# A paragraph break split across two blocks: "...\n  " then "  \n..."
+OPEN_BREAK_END = re.compile(r"\n[ \t]*\Z")
+OPEN_BREAK_START = re.compile(r"[ \t]*\n")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=\S)")
+WORD_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Paragraphs longer than this many characters are chunked in windows of this
+# size, each cut within its last OVERFLOW_TAIL_CHARS; the windows are counted
+# from the start of the paragraph, so streamed and one-shot input cut alike
+MAX_PENDING_CHARS = 100_000
+OVERFLOW_TAIL_CHARS = 10_000
+
+# Text without spaces is cut into pieces of about this many characters per token
+HARD_SPLIT_CHARS_PER_TOKEN = 4
+# Units longer than this many characters per target token skip the token count
+# and go straight to the hard split (tokenizing one huge run is slow)
+MAX_UNIT_CHARS_PER_TOKEN = 16
+
+
+@lru_cache(maxsize=4)
+def get_encoding(name: str):
+    """tiktoken encoding, or None when tiktoken is not installed"""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception:
+        return None
+
+
+def count_tokens(text: str, encoding=None) -> int:
+    """Token count with a tiktoken encoding, or an estimate without one"""
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # ~1.3 tokens per word for English prose; punctuation counts as a token.
+    # Never fewer than one per 4 characters (long runs without spaces)
+    return max(int(len(WORD_PATTERN.findall(text)) * 1.3), len(text) // 4) + 1
+
+
+class FixedSizeChunker:
+    """
+    Fixed-size character windows with overlap (the original chunker)
+
+    Stateful: feed() text blocks as they arrive, then finish(). The output is
+    the same as slicing the concatenated text in one go.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self._buffer = ""
+
+    def feed(self, block: str) -> List[str]:
+        chunks, self._buffer = self._split(self._buffer + block, final=False)
+        return chunks
+
+    def finish(self) -> List[str]:
+        chunks, self._buffer = self._split(self._buffer, final=True)
+        return chunks
+
+    def _split(self, buffer: str, final: bool) -> Tuple[List[str], str]:
+        """Complete chunks at the head of buffer, plus the tail still needed for the next one"""
+        chunks = []
+        start = 0
+        step = self.chunk_size - self.chunk_overlap
+
+        # A chunk is only final once text beyond it has arrived
+        while len(buffer) - start > self.chunk_size:
+            chunks.append(buffer[start:start + self.chunk_size])
+            start += step
+
+        if final:
+            if start < len(buffer):
+                chunks.append(buffer[start:])
+            return chunks, ""
+        return chunks, buffer[start:]
+
+
+class StructuredChunker:
+    """
+    Token-sized chunks that break at headings, paragraphs and sentences
+
+    Text is cut into units (headings, paragraphs, table rows, and sentences of
+    paragraphs too long to keep whole) which are packed greedily up to
+    target_tokens. A heading always starts a new chunk once the current one
+    is reasonably full, so sections are not glued together. Overlap repeats
+    whole trailing sentences of the previous chunk, up to overlap_tokens.
+
+    Every unit is tokenized once, so the cost is linear in the text length.
+    Like FixedSizeChunker it consumes text incrementally via feed()/finish().
+    """
+
+    def __init__(self, target_tokens: int = 300, overlap_tokens: int = 30, encoding: str = "cl100k_base"):
+        self.target_tokens = max(1, target_tokens)
+        self.overlap_tokens = max(0, min(overlap_tokens, self.target_tokens // 2))
+        self.min_tokens = self.target_tokens // 4
+        self.encoding = get_encoding(encoding)
+
+        self._pending: List[str] = []  # text of the unfinished paragraph, joined only when used
+        self._pending_chars = 0
+        self._break_open = False  # pending ends with "\n" plus spaces/tabs
+        self._units: List[Tuple[str, str, int]] = []  # (separator, text, tokens)
+        self._tokens = 0
+
+    def count_tokens(self, text: str) -> int:
+        """Token count with the local tokenizer, or an estimate without one"""
+        return count_tokens(text, self.encoding)
+
+    def feed(self, block: str) -> List[str]:
+        chunks = []
+        start = 0
+
+        # A break whose first newline ended the previous block
+        if self._break_open:
+            match = OPEN_BREAK_START.match(block)
+            if match:
+                pending = self._take_pending()
+                chunks.extend(self._end_paragraph(pending[:OPEN_BREAK_END.search(pending).start()]))
+                start = match.end()
+
+        # Everything before the last paragraph break is complete
+        for match in PARAGRAPH_BREAK.finditer(block, start):
+            chunks.extend(self._end_paragraph(self._take_pending() + block[start:match.start()]))
+            start = match.end()
+
+        rest = block[start:]
+        if rest:
+            self._pending.append(rest)
+            self._pending_chars += len(rest)
+            if OPEN_BREAK_END.search(rest):
+                self._break_open = True
+            elif rest.strip(" \t"):
+                self._break_open = False
+
+        # A paragraph that never ends
+        if self._pending_chars > MAX_PENDING_CHARS:
+            chunks.extend(self._release_overflow())
+        return chunks
+
+    def finish(self) -> List[str]:
+        chunks = self._end_paragraph(self._take_pending())
+        if self._units:
+            chunks.append(self._flush(carry_overlap=False))
+        return chunks
+
+    def _take_pending(self) -> str:
+        text = "".join(self._pending)
+        self._pending, self._pending_chars, self._break_open = [], 0, False
+        return text
+
+    def _end_paragraph(self, paragraph: str) -> List[str]:
+        """A complete paragraph; an oversized one is first released window by window, as if streamed"""
+        chunks = []
+        if len(paragraph) > MAX_PENDING_CHARS:
+            self._pending, self._pending_chars, self._break_open = [paragraph], len(paragraph), False
+            chunks = self._release_overflow()
+            paragraph = self._take_pending()
+        return chunks + self._add_paragraph(paragraph)
+
+    def _release_overflow(self) -> List[str]:
+        """
+        Chunk the head of an oversized paragraph, keeping at most MAX_PENDING_CHARS pending
+
+        Each window of MAX_PENDING_CHARS is cut at its last sentence end within
+        OVERFLOW_TAIL_CHARS of its end, else the last line break, else the last
+        whitespace, else at the window end (minified text). A cut only looks at
+        its own window, so it lands in the same place however the paragraph
+        was split into blocks.
+        """
+        break_open = self._break_open
+        text = self._take_pending()
+        # The first half of a paragraph break that may follow is not part of the paragraph
+        limit = OPEN_BREAK_END.search(text).start() if break_open else len(text)
+
+        chunks = []
+        start = 0
+        while limit - start > MAX_PENDING_CHARS:
+            end = start + MAX_PENDING_CHARS
+            floor = end - OVERFLOW_TAIL_CHARS
+
+            sentence_ends = [match.end() for match in SENTENCE_END.finditer(text, floor, end)]
+            if sentence_ends:
+                cut = sentence_ends[-1]
+                units = [(" ", sentence) for sentence in SENTENCE_END.split(text[start:cut].rstrip())]
+            elif text.rfind("\n", floor, end) >= 0:
+                cut = text.rfind("\n", floor, end) + 1
+                units = [("\n", line) for line in text[start:cut].split("\n")]
+            else:
+                space = max(text.rfind(" ", floor, end), text.rfind("\t", floor, end))
+                cut = space + 1 if space >= 0 else end
+                units = [(" ", text[start:cut])]
+
+            for separator, unit in units:
+                chunks.extend(self._add_unit(separator, unit))
+            start = cut
+
+        tail = text[start:]
+        self._pending, self._pending_chars, self._break_open = [tail], len(tail), break_open
+        return chunks
+
+    def _add_paragraph(self, paragraph: str) -> List[str]:
+        chunks = []
+        if not paragraph.strip():
+            return chunks
+
+        lines = paragraph.strip("\n").split("\n")
+        if all(TABLE_ROW_PATTERN.match(line) for line in lines if line.strip()):
+            # Tables split between rows, never inside one
+            rows = [line for line in lines if line.strip()]
+            for i, row in enumerate(rows):
+                chunks.extend(self._add_unit("\n\n" if i == 0 else "\n", row))
+            return chunks
+
+        body = []
+        for line in lines:
+            if HEADING_PATTERN.match(line):
+                if body:
+                    chunks.extend(self._add_body("\n".join(body)))
+                    body = []
+                chunks.extend(self._add_unit("\n\n", line.strip(), heading=True))
+            else:
+                body.append(line)
+        if body:
+            chunks.extend(self._add_body("\n".join(body)))
+        return chunks
+
+    def _add_body(self, text: str) -> List[str]:
+        text = text.strip()
+        if not text:
+            return []
+        tokens = self.count_tokens(text)
+        if tokens <= self.target_tokens:
+            return self._add_unit("\n\n", text, tokens=tokens)
+
+        chunks = []
+        for i, sentence in enumerate(SENTENCE_END.split(text)):
+            chunks.extend(self._add_unit("\n\n" if i == 0 else " ", sentence))
+        return chunks
+
+    def _add_unit(self, separator: str, text: str, tokens: Optional[int] = None, heading: bool = False) -> List[str]:
+        if not text.strip():
+            return []
+        if tokens is None:
+            if len(text) > self.target_tokens * MAX_UNIT_CHARS_PER_TOKEN:
+                tokens = self.target_tokens + 1  # certainly too long; split without tokenizing it whole
+            else:
+                tokens = self.count_tokens(text)
+        if tokens > self.target_tokens:
+            # A single sentence longer than a chunk: cut it by tokens
+            chunks = []
+            for i, piece in enumerate(self._split_long(text)):
+                # Capped so a piece that is still "too long" (e.g. one huge token-dense word) is not split again
+                piece_tokens = min(self.count_tokens(piece), self.target_tokens)
+                chunks.extend(self._add_unit(separator if i == 0 else " ", piece, tokens=piece_tokens))
+            return chunks
+
+        chunks = []
+        if self._units and (
+            self._tokens + tokens > self.target_tokens
+            or (heading and self._tokens >= self.min_tokens)
+        ):
+            chunks.append(self._flush(carry_overlap=not heading))
+            if self._tokens + tokens > self.target_tokens:
+                self._units, self._tokens = [], 0
+        self._units.append((separator, text, tokens))
+        self._tokens += tokens
+        return chunks
+
+    def _split_long(self, text: str) -> List[str]:
+        max_chars = self.target_tokens * HARD_SPLIT_CHARS_PER_TOKEN
+        if self.encoding is not None:
+            # Encoded in slices so a huge run without spaces stays cheap to tokenize;
+            # decoding the ids back gives the same text
+            ids = []
+            for i in range(0, len(text), max_chars):
+                ids.extend(self.encoding.encode(text[i:i + max_chars], disallowed_special=()))
+            step = self.target_tokens
+            return [self.encoding.decode(ids[i:i + step]) for i in range(0, len(ids), step)]
+
+        # Words longer than a chunk (minified text, encoded data) are cut by characters
+        words = [word[i:i + max_chars] for word in text.split() for i in range(0, len(word), max_chars)]
+        pieces, piece, piece_tokens = [], [], 0
+        for word in words:
+            tokens = self.count_tokens(word)
+            if piece and piece_tokens + tokens > self.target_tokens:
+                pieces.append(" ".join(piece))
+                piece, piece_tokens = [], 0
+            piece.append(word)
+            piece_tokens += tokens
+        if piece:
+            pieces.append(" ".join(piece))
+        return pieces
+
+    def _flush(self, carry_overlap: bool) -> str:
+        chunk = "".join(
+            (separator if i else "") + text
+            for i, (separator, text, _) in enumerate(self._units)
+        )
+
+        # Repeat trailing sentences that fit in the overlap budget
+        carried = []
+        carried_tokens = 0
+        if carry_overlap and self.overlap_tokens:
+            for unit in reversed(self._units):
+                if carried_tokens + unit[2] > self.overlap_tokens:
+                    break
+                carried.insert(0, unit)
+                carried_tokens += unit[2]
+            if len(carried) == len(self._units):
+                carried, carried_tokens = [], 0
+
+        self._units = carried
+        self._tokens = carried_tokens
+        return chunk
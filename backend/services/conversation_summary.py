@@ -0,0 +1,133 @@
+from typing import Dict, List, Optional
+from openai import AsyncOpenAI
+from backend.config import settings
+from backend.models.conversation import Conversation, Message
+from backend.services.chunking import count_tokens, get_encoding
+from backend.services.message_tokens import MESSAGE_OVERHEAD_TOKENS, newest_within_budget
+from backend.database import get_conversations_collection
+import asyncio
+
+client = AsyncOpenAI(api_key=settings.openai_api_key)
+
+SUMMARY_SYSTEM_MESSAGE = """You maintain a running summary of a sales chat between a customer and a business's AI assistant.
+Fold the new messages into the existing summary. Keep every detail the customer gave about
+themselves (name, contact details, company, location, needs, budget, timeline), what they asked
+and what was answered, and anything still open. Drop greetings and small talk.
+Write plain prose in the conversation's language, at most {words} words."""
+
+
+class ConversationSummarizer:
+    """
+    Rolling summary of older turns, stored on the conversation
+
+    Prompts send Conversation.summary plus as many of the messages after
+    Conversation.summarized_until as fit their token budget.
+    Once settings.summary_interval_messages messages have fallen out of the
+    recent window, they are folded into the summary in the background, so
+    the chat turn never waits for it.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}  # session_id -> summary in progress
+
+    def context_messages(self, conversation: Conversation, token_budget: int) -> List[Dict[str, str]]:
+        """
+        Summary (as a system message) followed by the recent turns
+
+        The summary covers messages[:summarized_until]; the messages after it
+        fill what is left of the token budget, newest first.
+        """
+        summary = conversation.summary if settings.summary_enabled else None
+        context = []
+        start = 0
+        if summary:
+            content = f"Summary of the earlier conversation:\n{summary}"
+            context.append({"role": "system", "content": content})
+            token_budget -= count_tokens(content, get_encoding(settings.chunk_tokenizer)) + MESSAGE_OVERHEAD_TOKENS
+            start = conversation.summarized_until
+
+        recent = newest_within_budget(conversation.messages[start:], token_budget)
+        context.extend({"role": m.role, "content": m.content} for m in recent)
+        return context
+
+    def needs_summary(self, conversation: Conversation) -> bool:
+        """Whether enough messages have left the recent window to fold them in"""
+        if not settings.summary_enabled:
+            return False
+        unsummarized = len(conversation.messages) - settings.summary_recent_messages - conversation.summarized_until
+        return unsummarized >= settings.summary_interval_messages
+
+    def schedule(self, conversation: Conversation):
+        """Start a background summary if one is due and none is running for the session"""
+        session_id = conversation.session_id
+        if not self.needs_summary(conversation) or session_id in self._tasks:
+            return
+
+        # Snapshot now: the caller keeps mutating the conversation
+        start = conversation.summarized_until
+        end = len(conversation.messages) - settings.summary_recent_messages
+        task = asyncio.create_task(
+            self._update_summary(session_id, conversation.summary, conversation.messages[start:end], start, end)
+        )
+        self._tasks[session_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(session_id, None))
+
+    async def stop(self):
+        """Wait for summaries in progress (application shutdown)"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def summarize(self, summary: Optional[str], messages: List[Message]) -> Optional[str]:
+        """
+        Fold messages into an existing summary
+
+        Args:
+            summary: Current summary, or None
+            messages: Messages the summary does not cover yet
+
+        Returns:
+            The new summary, or None if the call failed
+        """
+        transcript = "\n".join(
+            f"{'Customer' if m.role == 'user' else 'Assistant'}: {m.content}" for m in messages
+        )
+        try:
+            response = await client.chat.completions.create(
+                model=settings.summary_model or settings.openai_model,
+                messages=[
+                    {"role": "system", "content": SUMMARY_SYSTEM_MESSAGE.format(words=settings.summary_max_words)},
+                    {"role": "user", "content": f"Existing summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"}
+                ],
+                temperature=0.3,
+                max_tokens=settings.summary_max_words * 2
+            )
+            return response.choices[0].message.content
+
+        except Exception as e:
+            print(f"Error summarizing conversation: {e!r}")
+            return None
+
+    async def _update_summary(
+        self,
+        session_id: str,
+        summary: Optional[str],
+        messages: List[Message],
+        start: int,
+        end: int
+    ):
+        new_summary = await self.summarize(summary, messages)
+        if not new_summary:
+            return
+
+        conversations_collection = get_conversations_collection()
+        if conversations_collection is None:
+            return
+        # Skip if another worker has already summarized past this point
+        await conversations_collection.update_one(
+            {"session_id": session_id, "summarized_until": {"$not": {"$gt": start}}},
+            {"$set": {"summary": new_summary, "summarized_until": end}}
+        )
+
+
+# Global summarizer instance
+conversation_summarizer = ConversationSummarizer()
@@ -0,0 +1,173 @@
+from typing import Dict, List, Optional
+from collections import Counter, defaultdict
+from datetime import datetime
+from openai import AsyncOpenAI
+from pymongo import UpdateOne
+from backend.config import settings
+from backend.database import get_embedding_cache_collection, get_chunk_embeddings_collection
+from backend.utils.cache import TTLCache
+from backend.utils.vector_codec import encode_embedding, decode_embedding
+import hashlib
+import re
+
+client = AsyncOpenAI(api_key=settings.openai_api_key)
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Case- and whitespace-insensitive form of a query ("  Hi " == "hi")"""
+    return WHITESPACE_PATTERN.sub(" ", text).strip().lower()
+
+
+def embedding_cache_key(text: str, model: str) -> str:
+    """Stable key for an embedding of text under a given model"""
+    return hashlib.sha256(f"{model}\0{text}".encode()).hexdigest()
+
+
+def content_hash(text: str, model: Optional[str] = None) -> str:
+    """Cache key of a KB chunk's embedding; whitespace-only edits keep the same key"""
+    normalized = WHITESPACE_PATTERN.sub(" ", text).strip()
+    return embedding_cache_key(normalized, model or settings.embedding_model)
+
+
+async def load_cached_embeddings(collection, keys: List[str]) -> Dict[str, List[float]]:
+    """
+    Bulk lookup of cached embeddings; unknown keys are left out
+    
+    collection is get_embedding_cache_collection() (query embeddings, expire
+    after embedding_cache_persistent_ttl_seconds) or
+    get_chunk_embeddings_collection() (chunk embeddings, kept indefinitely).
+    """
+    if collection is None or not keys:
+        return {}
+    
+    found = {}
+    try:
+        cursor = collection.find({"_id": {"$in": keys}}, {"embedding": 1})
+        async for doc in cursor:
+            vector = decode_embedding(doc.get("embedding"))
+            if vector is not None:
+                found[doc["_id"]] = vector.tolist()
+    except Exception as e:
+        print(f"Error reading embedding cache: {e}")
+    return found
+
+
+async def store_cached_embeddings(collection, model: str, embeddings: Dict[str, List[float]]):
+    """Bulk upsert of embeddings into a cache collection (see load_cached_embeddings)"""
+    if collection is None or not embeddings:
+        return
+    
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne(
+            {"_id": key},
+            {"$set": {
+                "model": model,
+                "embedding": encode_embedding(embedding, "float32"),
+                "created_at": now
+            }},
+            upsert=True
+        )
+        for key, embedding in embeddings.items()
+    ]
+    try:
+        await collection.bulk_write(operations, ordered=False)
+    except Exception as e:
+        print(f"Error writing embedding cache: {e}")
+
+
+class QueryEmbeddingCache:
+    """
+    Query embeddings cached in front of the OpenAI embeddings call
+    
+    First tier is an in-process LRU with a TTL; the optional second tier is the
+    embedding_cache collection, so repeated queries survive restarts and are
+    shared between workers.
+    """
+    
+    def __init__(self):
+        self.memory = TTLCache(
+            maxsize=settings.query_embedding_cache_size,
+            ttl_seconds=settings.query_embedding_cache_ttl_seconds
+        )
+        self.persistent_hits = 0
+        self.api_calls = 0
+        # Entries are shared between tenants; only the counters are kept per tenant
+        self.tenant_counters: Dict[str, Counter] = defaultdict(Counter)
+    
+    async def get_embedding(self, query: str, model: Optional[str] = None, tenant_id: Optional[str] = None) -> List[float]:
+        """
+        Embedding for a query, from cache when possible
+        
+        Args:
+            query: User query
+            model: Embedding model (defaults to settings.embedding_model)
+            tenant_id: Tenant the lookup is counted for in stats()
+        
+        Returns:
+            Embedding vector
+        """
+        model = model or settings.embedding_model
+        key = embedding_cache_key(normalize_query(query), model)
+        counters = self.tenant_counters[tenant_id] if tenant_id else Counter()
+        
+        embedding = self.memory.get(key)
+        if embedding is not None:
+            counters["hits"] += 1
+            return embedding
+        counters["misses"] += 1
+        
+        embedding = await self._load_persistent(key)
+        if embedding is not None:
+            self.persistent_hits += 1
+            counters["persistent_hits"] += 1
+            self.memory.set(key, embedding)
+            return embedding
+        
+        self.api_calls += 1
+        counters["api_calls"] += 1
+        response = await client.embeddings.create(
+            model=model,
+            input=query
+        )
+        embedding = response.data[0].embedding
+        
+        self.memory.set(key, embedding)
+        await self._store_persistent(key, model, embedding)
+        return embedding
+    
+    async def _load_persistent(self, key: str) -> Optional[List[float]]:
+        if not settings.query_embedding_cache_persistent:
+            return None
+        return (await load_cached_embeddings(get_embedding_cache_collection(), [key])).get(key)
+    
+    async def _store_persistent(self, key: str, model: str, embedding: List[float]):
+        if not settings.query_embedding_cache_persistent:
+            return
+        await store_cached_embeddings(get_embedding_cache_collection(), model, {key: embedding})
+    
+    def stats(self) -> Dict[str, object]:
+        """Hit/miss counters for both tiers"""
+        return {
+            **self.memory.stats(),
+            "persistent_hits": self.persistent_hits,
+            "api_calls": self.api_calls
+        }
+    
+    def tenant_stats(self, tenant_id: str) -> Dict[str, object]:
+        """Hit/miss counters of one tenant's lookups"""
+        counters = self.tenant_counters.get(tenant_id, Counter())
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "hits": counters["hits"],
+            "misses": counters["misses"],
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+            "persistent_hits": counters["persistent_hits"],
+            "api_calls": counters["api_calls"]
+        }
+
+
+# Global query embedding cache instance
+query_embedding_cache = QueryEmbeddingCache()
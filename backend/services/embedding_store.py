@@ -0,0 +1,284 @@
+from typing import List, Optional, Sequence
+from bson import ObjectId
+from backend.config import settings
+from contextlib import contextmanager
+from pathlib import Path
+import numpy as np
+import threading
+import hashlib
+import struct
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-worker dev setups only
+    fcntl = None
+
+# File layout (little-endian):
+#   64-byte header: magic, format version, embedding dim, record size
+#   fixed-size records appended after it, one per chunk:
+#     flag (1) | pad (3) | chunk ObjectId (12) | document_id (48) | float32 vector (dim)
+# Vectors are stored L2-normalised so they can be searched straight off the map.
+STORE_MAGIC = b"LPVSTORE"
+STORE_VERSION = 1
+HEADER = struct.Struct("<8sHII")
+HEADER_SIZE = 64
+
+FLAG_LIVE = 0
+FLAG_DELETED = 1
+FLAG_EMPTY = 2  # chunk exists in MongoDB but has no embedding
+
+
+def record_dtype(dim: int) -> np.dtype:
+    """Structured dtype of one on-disk record"""
+    return np.dtype([
+        ("flag", "u1"),
+        ("_pad", "V3"),
+        ("chunk_id", "V12"),
+        ("document_id", "S48"),
+        ("vector", "<f4", (dim,))
+    ])
+
+
+class EmbeddingStore:
+    """
+    Append-only, memory-mapped float32 embedding file for one tenant
+
+    Every worker maps the same file read-only, so the vectors live once in the
+    OS page cache. Appends and tombstones are written through the file under an
+    advisory lock; other workers notice them with a single stat() per search.
+    `generation` changes whenever row numbers may have shifted (full reopen or
+    rewrite), which invalidates anything holding row offsets.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.dim: Optional[int] = None
+        self.records: Optional[np.ndarray] = None
+        self.chunk_ids: List[ObjectId] = []
+        self.document_ids: List[str] = []
+        self.generation = 0
+        self._dtype: Optional[np.dtype] = None
+        self._stat = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_tenant(cls, tenant_id: str) -> "EmbeddingStore":
+        """Store for a tenant under settings.embedding_store_dir"""
+        name = hashlib.sha1(tenant_id.encode()).hexdigest()
+        return cls(Path(settings.embedding_store_dir) / f"{name}.lpv")
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """(rows, dim) strided view over the mapped vectors"""
+        return self.records["vector"]
+
+    def deleted_mask(self) -> np.ndarray:
+        """True for rows that must not be returned by a search"""
+        return self.records["flag"] != FLAG_LIVE
+
+    def chunk_count(self) -> int:
+        """Number of chunks the store believes exist in MongoDB"""
+        return int(np.count_nonzero(self.records["flag"] != FLAG_DELETED))
+
+    def open(self) -> bool:
+        """Map an existing store; False if it is missing or in an unknown format"""
+        with self._lock:
+            return self._open()
+
+    def _open(self) -> bool:
+        try:
+            with open(self.path, "rb") as f:
+                magic, version, dim, record_size = HEADER.unpack(f.read(HEADER.size))
+        except (OSError, struct.error):
+            return False
+
+        if magic != STORE_MAGIC or version != STORE_VERSION:
+            return False
+
+        self.dim = dim
+        self._dtype = record_dtype(dim)
+        if record_size != self._dtype.itemsize:
+            return False
+
+        self._reset()
+        self._map()
+        return True
+
+    def _reset(self):
+        self.records = None
+        self.chunk_ids = []
+        self.document_ids = []
+        self.generation += 1
+
+    def _map(self) -> int:
+        """(Re)map the committed records, decoding ids of rows not seen before"""
+        stat = os.stat(self.path)
+        rows = (stat.st_size - HEADER_SIZE) // self._dtype.itemsize
+        if rows > 0:
+            self.records = np.memmap(self.path, dtype=self._dtype, mode="r", offset=HEADER_SIZE, shape=(rows,))
+        else:
+            self.records = np.zeros(0, dtype=self._dtype)
+        self._stat = stat
+
+        start = len(self.chunk_ids)
+        new = self.records[start:rows]
+        self.chunk_ids.extend(ObjectId(bytes(raw)) for raw in new["chunk_id"].tolist())
+        self.document_ids.extend(raw.decode() for raw in new["document_id"].tolist())
+        return start
+
+    def changed(self) -> Optional[str]:
+        """"replaced" if the file was rewritten, "modified" if appended/tombstoned, else None"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return "replaced"
+        if stat.st_ino != self._stat.st_ino:
+            return "replaced"
+        if stat.st_size != self._stat.st_size or stat.st_mtime_ns != self._stat.st_mtime_ns:
+            return "modified"
+        return None
+
+    def refresh(self) -> bool:
+        """
+        Pick up appends and tombstones written by any process
+
+        Never blocks: returns False (keep using the current view) while this
+        process is writing to the store from another thread.
+        """
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self._map()
+            return True
+        finally:
+            self._lock.release()
+
+    @contextmanager
+    def _locked_file(self):
+        """Open the live file exclusively, remapping first if it was replaced"""
+        with self._lock:
+            while True:
+                f = open(self.path, "r+b")
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                # A compaction may have swapped the file while we waited for the lock
+                if os.fstat(f.fileno()).st_ino == os.stat(self.path).st_ino:
+                    break
+                f.close()
+
+            try:
+                if self._stat is None or self._stat.st_ino != os.fstat(f.fileno()).st_ino:
+                    self._open()
+                yield f
+            finally:
+                f.close()
+
+    def _build_records(
+        self,
+        chunk_ids: Sequence[ObjectId],
+        document_ids: Sequence[str],
+        vectors: Sequence[Optional[Sequence[float]]]
+    ) -> np.ndarray:
+        records = np.zeros(len(chunk_ids), dtype=self._dtype)
+        for row, (chunk_id, document_id, vector) in enumerate(zip(chunk_ids, document_ids, vectors)):
+            records["chunk_id"][row] = chunk_id.binary
+            records["document_id"][row] = document_id.encode()
+            if vector is not None and len(vector):
+                records["vector"][row] = vector
+            else:
+                records["flag"][row] = FLAG_EMPTY
+
+        norms = np.linalg.norm(records["vector"], axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        records["vector"] /= norms
+        return records
+
+    def append(
+        self,
+        chunk_ids: Sequence[ObjectId],
+        document_ids: Sequence[str],
+        vectors: Sequence[Optional[Sequence[float]]]
+    ):
+        """Append rows; a missing/empty vector is stored as a FLAG_EMPTY row"""
+        records = self._build_records(chunk_ids, document_ids, vectors)
+        with self._locked_file() as f:
+            # Drop any partial record left by a crashed writer before appending
+            committed = (os.fstat(f.fileno()).st_size - HEADER_SIZE) // self._dtype.itemsize
+            f.truncate(HEADER_SIZE + committed * self._dtype.itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(records.tobytes())
+            f.flush()
+            self._map()
+
+    def mark_deleted(self, document_id: str, chunk_ids: Optional[Sequence[ObjectId]] = None) -> int:
+        """Tombstone every row of a document (or just the given chunks) in place, returns rows marked"""
+        flag = bytes([FLAG_DELETED])
+        targets = set(chunk_ids) if chunk_ids is not None else None
+        with self._locked_file() as f:
+            self._map()
+            rows = [
+                row for row, doc_id in enumerate(self.document_ids)
+                if doc_id == document_id
+                and self.records["flag"][row] != FLAG_DELETED
+                and (targets is None or self.chunk_ids[row] in targets)
+            ]
+            for row in rows:
+                f.seek(HEADER_SIZE + row * self._dtype.itemsize)
+                f.write(flag)
+            f.flush()
+            self._map()
+        return len(rows)
+
+    def write(
+        self,
+        dim: int,
+        chunk_ids: Sequence[ObjectId],
+        document_ids: Sequence[str],
+        vectors: Sequence[Optional[Sequence[float]]]
+    ):
+        """Atomically replace the store with the given rows and map it"""
+        with self._lock:
+            self._write(dim, chunk_ids, document_ids, vectors)
+
+    def _write(
+        self,
+        dim: int,
+        chunk_ids: Sequence[ObjectId],
+        document_ids: Sequence[str],
+        vectors: Sequence[Optional[Sequence[float]]]
+    ):
+        self.dim = dim
+        self._dtype = record_dtype(dim)
+        records = self._build_records(chunk_ids, document_ids, vectors)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".tmp{os.getpid()}")
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(STORE_MAGIC, STORE_VERSION, dim, self._dtype.itemsize).ljust(HEADER_SIZE, b"\0"))
+            f.write(records.tobytes())
+        os.replace(tmp_path, self.path)
+
+        self._reset()
+        self._map()
+
+    def compact(self):
+        """Rewrite the store without tombstoned rows"""
+        # Hold the old file's lock across the swap so no append lands in it meanwhile
+        with self._locked_file():
+            self._map()
+            keep = np.flatnonzero(self.records["flag"] != FLAG_DELETED)
+            live = self.records[keep]
+            vectors = [
+                None if flag == FLAG_EMPTY else vector
+                for flag, vector in zip(live["flag"], live["vector"])
+            ]
+            self._write(
+                self.dim,
+                [self.chunk_ids[i] for i in keep],
+                [self.document_ids[i] for i in keep],
+                vectors
+            )
@@ -0,0 +1,311 @@
+from typing import Any, AsyncIterator, Dict, Optional, List, Set
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from backend.config import settings
+from backend.database import get_kb_jobs_collection
+from backend.models.kb_chunk import DocumentUpload
+from backend.models.kb_job import KBJob
+from backend.services.kb_processor import KBProcessor, IngestionSuperseded
+from backend.services.bulk_ingestion import BulkIngestor, summarize_report
+from backend.utils.logger import get_logger
+from backend.utils.uploads import read_text_blocks, remove_spooled, spool_text
+from pathlib import Path
+import asyncio
+import uuid
+
+logger = get_logger(__name__)
+
+
+class IngestionQueueFull(Exception):
+    """Raised when the ingestion backlog is at capacity"""
+
+
+class IngestionQueue:
+    """
+    Bounded background queue for knowledge-base ingestion
+    
+    Jobs are persisted in kb_jobs before they are queued, so the queue itself
+    only holds job ids. A job is claimed atomically (queued -> running) before
+    it is processed, which makes it safe for several workers to enqueue the
+    same job after a restart. Running jobs heartbeat through updated_at after
+    every stored batch; one whose heartbeat stops is treated as abandoned and
+    re-run from scratch after its partially written chunks are removed. Each
+    claim sets a new lease_id that every later write of the run must match,
+    so a run that was re-queued while still alive stops at its next batch
+    instead of writing over its successor.
+    """
+    
+    def __init__(self):
+        self.kb_processor = KBProcessor()
+        self.bulk_ingestor = BulkIngestor(self.kb_processor)
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers: List[asyncio.Task] = []
+        self.queued_ids: Set[str] = set()
+    
+    async def start(self):
+        """Start the workers and re-queue jobs left over from a previous run"""
+        self.queue = asyncio.Queue(maxsize=settings.ingestion_queue_size)
+        self.workers = [
+            asyncio.create_task(self._worker())
+            for _ in range(max(1, settings.ingestion_workers))
+        ]
+        self.workers.append(asyncio.create_task(self._sweeper()))
+        await self.resume_pending()
+    
+    async def stop(self):
+        """Cancel the workers; interrupted jobs are resumed on the next start"""
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+    
+    async def resume_pending(self):
+        """Queue persisted jobs that are waiting or whose worker went away"""
+        kb_jobs_collection = get_kb_jobs_collection()
+        if kb_jobs_collection is None or self.queue is None:
+            return
+        
+        stale_before = datetime.utcnow() - timedelta(seconds=settings.ingestion_job_stale_seconds)
+        await kb_jobs_collection.update_many(
+            {"status": "running", "updated_at": {"$lt": stale_before}},
+            {"$set": {"status": "queued", "updated_at": datetime.utcnow()}}
+        )
+        
+        cursor = kb_jobs_collection.find({"status": "queued"}, {"job_id": 1}).sort("created_at", 1)
+        resumed = 0
+        async for doc in cursor:
+            if self.queue.full():
+                break
+            if doc["job_id"] in self.queued_ids:
+                continue
+            self._enqueue(doc["job_id"])
+            resumed += 1
+        if resumed:
+            logger.info(f"Resumed {resumed} knowledge-base ingestion jobs")
+    
+    async def submit(self, document: DocumentUpload, tenant_id: str) -> KBJob:
+        """
+        Persist an ingestion job for inline text and queue it
+        
+        The text is spooled to disk like a file upload, so the job document
+        only holds its path and stays far below MongoDB's 16 MB limit.
+        
+        Raises:
+            IngestionQueueFull: If the backlog is at capacity
+        """
+        path = await spool_text(document.content, settings.upload_spool_dir)
+        try:
+            return await self._submit(KBJob(
+                job_id=str(uuid.uuid4()),
+                tenant_id=tenant_id,
+                document_id=str(uuid.uuid4()),
+                document_name=document.name,
+                source_path=str(path),
+                metadata=document.metadata or {}
+            ))
+        except BaseException:
+            remove_spooled(path)
+            raise
+    
+    async def submit_file(self, path: Path, name: str, tenant_id: str, metadata: Optional[Dict[str, Any]] = None) -> KBJob:
+        """
+        Persist an ingestion job for a spooled file upload and queue it
+        
+        The job owns the file from here on and deletes it once it finishes.
+        
+        Raises:
+            IngestionQueueFull: If the backlog is at capacity
+        """
+        return await self._submit(KBJob(
+            job_id=str(uuid.uuid4()),
+            tenant_id=tenant_id,
+            document_id=str(uuid.uuid4()),
+            document_name=name,
+            source_path=str(path),
+            metadata=metadata or {}
+        ))
+    
+    async def submit_archive(self, path: Path, name: str, tenant_id: str, metadata: Optional[Dict[str, Any]] = None) -> KBJob:
+        """
+        Persist a bulk ingestion job for a spooled archive and queue it
+        
+        Every supported file in the archive becomes its own document. The job
+        owns the archive from here on and deletes it once it finishes.
+        
+        Raises:
+            IngestionQueueFull: If the backlog is at capacity
+        """
+        return await self._submit(KBJob(
+            job_id=str(uuid.uuid4()),
+            tenant_id=tenant_id,
+            document_id=str(uuid.uuid4()),
+            document_name=name,
+            kind="archive",
+            source_path=str(path),
+            metadata=metadata or {}
+        ))
+    
+    async def _submit(self, job: KBJob) -> KBJob:
+        kb_jobs_collection = get_kb_jobs_collection()
+        if kb_jobs_collection is None or self.queue is None:
+            raise Exception("Ingestion queue not initialized")
+        if self.queue.full():
+            raise IngestionQueueFull()
+        
+        await kb_jobs_collection.insert_one({**job.model_dump(), "updated_at": job.created_at})
+        try:
+            self._enqueue(job.job_id)
+        except asyncio.QueueFull:
+            # Filled up while the job was being saved; it is persisted as
+            # queued (and owns its file), so the sweeper picks it up later
+            logger.warning(f"Ingestion queue full, job {job.job_id} left for the sweeper")
+        return job
+    
+    def _enqueue(self, job_id: str):
+        self.queue.put_nowait(job_id)
+        self.queued_ids.add(job_id)
+    
+    async def _sweeper(self):
+        """Periodically pick up jobs abandoned by workers that died"""
+        while True:
+            await asyncio.sleep(settings.ingestion_job_stale_seconds / 2)
+            try:
+                await self.resume_pending()
+            except Exception as e:
+                logger.error(f"Failed to resume ingestion jobs: {e}")
+    
+    async def _worker(self):
+        while True:
+            job_id = await self.queue.get()
+            self.queued_ids.discard(job_id)
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ingestion job {job_id} crashed: {e}")
+            finally:
+                self.queue.task_done()
+    
+    async def _run(self, job_id: str):
+        kb_jobs_collection = get_kb_jobs_collection()
+        if kb_jobs_collection is None:
+            return
+        
+        # Claim the job; another worker may already have it
+        now = datetime.utcnow()
+        lease_id = str(uuid.uuid4())
+        job_doc = await kb_jobs_collection.find_one_and_update(
+            {"job_id": job_id, "status": "queued"},
+            {
+                "$set": {
+                    "status": "running",
+                    "lease_id": lease_id,
+                    "started_at": now,
+                    "updated_at": now,
+                    "chunks_processed": 0,
+                    "files_processed": 0
+                },
+                "$inc": {"attempts": 1}
+            },
+            return_document=ReturnDocument.AFTER
+        )
+        if not job_doc:
+            return
+        job = KBJob(**job_doc)
+        
+        lease = {"job_id": job_id, "lease_id": lease_id}
+        
+        async def on_progress(chunks_processed: int, files_processed: int = 0):
+            result = await kb_jobs_collection.update_one(
+                lease,
+                {"$set": {
+                    "chunks_processed": chunks_processed,
+                    "files_processed": files_processed,
+                    "updated_at": datetime.utcnow()
+                }}
+            )
+            if result.matched_count == 0:
+                raise IngestionSuperseded(f"Ingestion job {job_id} was taken over by another run")
+        
+        try:
+            if job.kind == "archive":
+                report = await self._ingest_archive(job, on_progress)
+                result = {"chunks_processed": summarize_report(report)["chunks"], "report": report}
+            else:
+                chunks_count = await self._ingest_document(job, on_progress)
+                result = {"chunks_processed": chunks_count}
+        except IngestionSuperseded as e:
+            # The source file and the documents now belong to the newer run
+            logger.warning(str(e))
+            return
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} failed: {e}")
+            await self._finish(job, lease, {"status": "failed", "error": str(e)})
+            return
+        
+        await self._finish(job, lease, {"status": "completed", **result})
+    
+    async def _finish(self, job: KBJob, lease: Dict[str, str], fields: Dict[str, Any]):
+        """Record the outcome and release the source, unless another run holds the job by now"""
+        kb_jobs_collection = get_kb_jobs_collection()
+        now = datetime.utcnow()
+        result = await kb_jobs_collection.update_one(
+            lease,
+            {"$set": {**fields, "content": None, "finished_at": now, "updated_at": now}}
+        )
+        if result.matched_count == 0:
+            logger.warning(f"Ingestion job {job.job_id} was taken over by another run; discarding this result")
+            return
+        self._release_source(job)
+    
+    async def _ingest_document(self, job: KBJob, on_progress) -> int:
+        # A previous attempt may have been cut off mid-write
+        if job.attempts > 1:
+            await self.kb_processor.delete_document(job.document_id, job.tenant_id)
+        
+        _, chunks_count = await self.kb_processor.process_stream(
+            job.document_name,
+            self._read_source(job),
+            job.tenant_id,
+            metadata=job.metadata,
+            document_id=job.document_id,
+            on_progress=on_progress
+        )
+        return chunks_count
+    
+    async def _ingest_archive(self, job: KBJob, on_progress) -> List[Dict[str, Any]]:
+        progress = {"chunks": 0, "files": 0}
+        
+        async def on_file_done(entry: Dict[str, Any]):
+            progress["chunks"] += entry["chunks"]
+            progress["files"] += 1
+            await on_progress(progress["chunks"], progress["files"])
+        
+        # Document ids are derived from the job's import id, so a re-run
+        # replaces whatever an interrupted attempt wrote for each file
+        return await self.bulk_ingestor.ingest_archive(
+            Path(job.source_path),
+            job.tenant_id,
+            batch_id=job.document_id,
+            metadata=job.metadata,
+            replace_existing=job.attempts > 1,
+            on_file_done=on_file_done,
+            on_batch=lambda: on_progress(progress["chunks"], progress["files"])
+        )
+    
+    async def _read_source(self, job: KBJob) -> AsyncIterator[str]:
+        """Document text in blocks, from the spooled file or the inline content"""
+        if job.source_path:
+            async for block in read_text_blocks(Path(job.source_path), settings.upload_block_size):
+                yield block
+        elif job.content:
+            yield job.content
+    
+    def _release_source(self, job: KBJob):
+        if job.source_path:
+            remove_spooled(Path(job.source_path))
+
+
+# Global ingestion queue instance
+ingestion_queue = IngestionQueue()
@@ -0,0 +1,172 @@
+from typing import List, Optional, Sequence, Tuple
+from backend.services.vector_index import FlatVectorIndex, normalize_rows
+import numpy as np
+
+
+def kmeans(
+    vectors: np.ndarray,
+    k: int,
+    iterations: int = 10,
+    sample_size: Optional[int] = None,
+    seed: int = 0
+) -> np.ndarray:
+    """
+    Spherical k-means over L2-normalised vectors
+
+    Args:
+        vectors: (n, dim) normalised vectors
+        k: Number of centroids
+        iterations: Lloyd iterations
+        sample_size: Train on a random sample of this many rows
+        seed: RNG seed so rebuilds are reproducible
+
+    Returns:
+        (k, dim) normalised centroids
+    """
+    rng = np.random.default_rng(seed)
+    if sample_size and len(vectors) > sample_size:
+        vectors = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+
+    centroids = np.array(vectors[rng.choice(len(vectors), k, replace=False)], dtype=np.float32)
+
+    for _ in range(iterations):
+        assignments = assign_to_centroids(vectors, centroids)
+        counts = np.bincount(assignments, minlength=k)
+        nonempty = counts > 0
+
+        # Sum members per centroid with one sort + reduceat instead of np.add.at
+        order = np.argsort(assignments, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sums = np.add.reduceat(vectors[order], starts[nonempty], axis=0)
+        centroids[nonempty] = normalize_rows(sums)
+
+        # Re-seed empty cells from random points
+        empty = np.flatnonzero(~nonempty)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+
+    return centroids
+
+
+def assign_to_centroids(vectors: np.ndarray, centroids: np.ndarray, batch_size: int = 16384) -> np.ndarray:
+    """Nearest centroid (by inner product) for each row, in bounded-memory batches"""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), batch_size):
+        end = start + batch_size
+        assignments[start:end] = np.argmax(vectors[start:end] @ centroids.T, axis=1)
+    return assignments
+
+
+class IVFFlatIndex(FlatVectorIndex):
+    """
+    Approximate index: k-means cells over the flat matrix, searching only the
+    nprobe cells nearest the query. Until the first training the index
+    answers exactly.
+    """
+
+    def __init__(
+        self,
+        nlist: int = 0,
+        nprobe: int = 8,
+        min_train_size: int = 5000,
+        kmeans_iterations: int = 10,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.kmeans_iterations = kmeans_iterations
+
+        self.centroids: Optional[np.ndarray] = None
+        self._lists: List[np.ndarray] = []
+        self._pending: List[List[int]] = []
+        self._trained_size = 0
+
+    def _route(self, start: int):
+        """Queue rows [start, len) for their nearest cells; merged lazily on search"""
+        if self.centroids is None or len(self) <= start:
+            return
+        rows = np.arange(start, len(self))
+        for row, cell in zip(rows, assign_to_centroids(self._matrix[start:len(self)], self.centroids)):
+            self._pending[cell].append(row)
+
+    def add(self, chunk_ids: Sequence, document_ids: Sequence[str], vectors: np.ndarray):
+        start = len(self)
+        super().add(chunk_ids, document_ids, vectors)
+        self._route(start)
+
+    def attach(self, matrix: np.ndarray, chunk_ids: Sequence, document_ids: Sequence[str], deleted: np.ndarray) -> int:
+        start = super().attach(matrix, chunk_ids, document_ids, deleted)
+        self._route(start)
+        return start
+
+    def needs_rebuild(self) -> bool:
+        """True when the cells should be (re)trained or tombstones compacted"""
+        if super().needs_rebuild():
+            return True
+        if self.rebuilding:
+            return False
+        if self.centroids is None:
+            return self.live_count >= self.min_train_size
+        # Cells trained on a much smaller KB get unbalanced as it grows
+        return self.live_count > 4 * self._trained_size
+
+    def compact(self):
+        """Drop tombstoned rows; invalidates the cells until the next training"""
+        super().compact()
+        self.centroids = None
+        self._lists = []
+        self._pending = []
+
+    def train(self, vectors: np.ndarray) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        Compute centroids and cell assignments for a snapshot of rows
+
+        Pure function of its input so it can run in a worker thread while the
+        index keeps serving (exact) searches and accepting inserts.
+        """
+        if len(vectors) < self.min_train_size:
+            return None, None
+
+        nlist = self.nlist or int(np.sqrt(len(vectors)))
+        nlist = max(1, min(nlist, 4096, len(vectors)))
+        centroids = kmeans(
+            vectors,
+            nlist,
+            iterations=self.kmeans_iterations,
+            sample_size=nlist * 64
+        )
+        return centroids, assign_to_centroids(vectors, centroids)
+
+    def apply_training(self, centroids: Optional[np.ndarray], assignments: Optional[np.ndarray], size: int):
+        """Install cells trained on rows [0, size); rows added since are routed now"""
+        if centroids is None:
+            return
+
+        counts = np.bincount(assignments, minlength=len(centroids))
+        order = np.argsort(assignments, kind="stable").astype(np.int64)
+        self._lists = np.split(order, np.cumsum(counts)[:-1])
+        self._pending = [[] for _ in range(len(centroids))]
+        self.centroids = centroids
+        self._trained_size = size
+        self._route(size)
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[object, float]]:
+        if len(self) == 0 or k <= 0:
+            return []
+
+        query = normalize_rows(np.asarray(query, dtype=np.float32))
+        if self.centroids is None:
+            return self._top_k(None, query, k)
+
+        nprobe = min(self.nprobe, len(self.centroids))
+        cell_scores = self.centroids @ query
+        probes = np.argpartition(-cell_scores, nprobe - 1)[:nprobe]
+        for cell in probes:
+            if self._pending[cell]:
+                self._lists[cell] = np.concatenate((self._lists[cell], np.array(self._pending[cell], dtype=np.int64)))
+                self._pending[cell] = []
+
+        candidates = np.concatenate([self._lists[cell] for cell in probes])
+        return self._top_k(candidates, query, k)
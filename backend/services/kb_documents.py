@@ -0,0 +1,191 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+from pymongo import ReturnDocument
+from backend.database import get_kb_documents_collection, get_tenants_collection
+from backend.models.kb_document import KBDocument
+import base64
+
+
+async def start_document(tenant_id: str, document_id: str, name: str, metadata: Optional[Dict[str, Any]] = None):
+    """Register a document as processing before its chunks are written"""
+    kb_documents_collection = get_kb_documents_collection()
+    if kb_documents_collection is None:
+        return
+    document = KBDocument(tenant_id=tenant_id, document_id=document_id, name=name, metadata=metadata or {})
+    await kb_documents_collection.update_one(
+        {"tenant_id": tenant_id, "document_id": document_id},
+        {"$setOnInsert": document.model_dump()},
+        upsert=True
+    )
+
+
+async def complete_document(tenant_id: str, document_id: str, chunk_count: int, token_count: int):
+    """Mark a document ready and add it to the tenant's totals"""
+    kb_documents_collection = get_kb_documents_collection()
+    if kb_documents_collection is None:
+        return
+    previous = await kb_documents_collection.find_one_and_update(
+        {"tenant_id": tenant_id, "document_id": document_id},
+        {"$set": {
+            "status": "ready",
+            "chunk_count": chunk_count,
+            "token_count": token_count,
+            "updated_at": datetime.utcnow()
+        }},
+        return_document=ReturnDocument.BEFORE
+    )
+    if previous is None:
+        return
+    if previous.get("status") == "ready":
+        await _adjust_totals(
+            tenant_id, 0, chunk_count - previous.get("chunk_count", 0), token_count - previous.get("token_count", 0)
+        )
+    else:
+        await _adjust_totals(tenant_id, 1, chunk_count, token_count)
+
+
+async def update_document(
+    tenant_id: str,
+    document_id: str,
+    name: str,
+    chunk_count: int,
+    token_count: int,
+    created_at: Optional[datetime] = None
+) -> Optional[datetime]:
+    """
+    Record new counts (and name) after a document's content was replaced
+
+    created_at is only used for documents that were never registered (ingested
+    before kb_documents existed). Returns the document's stored creation time.
+    """
+    kb_documents_collection = get_kb_documents_collection()
+    if kb_documents_collection is None:
+        return created_at
+    created_at = created_at or datetime.utcnow()
+    previous = await kb_documents_collection.find_one_and_update(
+        {"tenant_id": tenant_id, "document_id": document_id},
+        {
+            "$set": {
+                "name": name,
+                "status": "ready",
+                "chunk_count": chunk_count,
+                "token_count": token_count,
+                "updated_at": datetime.utcnow()
+            },
+            "$setOnInsert": {"created_at": created_at, "metadata": {}}
+        },
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+    if previous is None or previous.get("status") != "ready":
+        await _adjust_totals(tenant_id, 1, chunk_count, token_count)
+    else:
+        await _adjust_totals(
+            tenant_id, 0, chunk_count - previous.get("chunk_count", 0), token_count - previous.get("token_count", 0)
+        )
+    return previous.get("created_at", created_at) if previous else created_at
+
+
+async def get_status(tenant_id: str, document_id: str) -> Optional[str]:
+    """A document's status ("processing" or "ready"), or None if it is not registered"""
+    kb_documents_collection = get_kb_documents_collection()
+    if kb_documents_collection is None:
+        return None
+    document = await kb_documents_collection.find_one(
+        {"tenant_id": tenant_id, "document_id": document_id},
+        {"status": 1}
+    )
+    return document.get("status") if document else None
+
+
+async def remove_document(tenant_id: str, document_id: str):
+    """Drop a document and, if it was ready, subtract it from the tenant's totals"""
+    kb_documents_collection = get_kb_documents_collection()
+    if kb_documents_collection is None:
+        return
+    previous = await kb_documents_collection.find_one_and_delete(
+        {"tenant_id": tenant_id, "document_id": document_id}
+    )
+    if previous and previous.get("status") == "ready":
+        await _adjust_totals(tenant_id, -1, -previous.get("chunk_count", 0), -previous.get("token_count", 0))
+
+
+async def _adjust_totals(tenant_id: str, documents: int, chunks: int, tokens: int):
+    tenants_collection = get_tenants_collection()
+    if tenants_collection is None:
+        return
+    await tenants_collection.update_one(
+        {"tenant_id": tenant_id},
+        {"$inc": {"kb_document_count": documents, "kb_chunk_count": chunks, "kb_token_count": tokens}}
+    )
+
+
+async def get_totals(tenant_id: str) -> Dict[str, int]:
+    """Document, chunk and token totals of a tenant (one point read)"""
+    tenants_collection = get_tenants_collection()
+    if tenants_collection is None:
+        raise Exception("Database not initialized")
+    tenant_doc = await tenants_collection.find_one(
+        {"tenant_id": tenant_id},
+        {"kb_document_count": 1, "kb_chunk_count": 1, "kb_token_count": 1}
+    ) or {}
+    return {
+        "total_documents": tenant_doc.get("kb_document_count", 0),
+        "total_chunks": tenant_doc.get("kb_chunk_count", 0),
+        "total_tokens": tenant_doc.get("kb_token_count", 0)
+    }
+
+
+async def list_documents(tenant_id: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[KBDocument], Optional[str]]:
+    """
+    One page of a tenant's documents, newest first
+
+    Keyset pagination on (created_at, document_id): every page is a range scan
+    of the (tenant_id, created_at, document_id) index, however deep it is.
+
+    Args:
+        tenant_id: Tenant ID
+        limit: Page size
+        cursor: next_cursor of the previous page
+
+    Returns:
+        Tuple of (documents, next_cursor); next_cursor is None on the last page
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    kb_documents_collection = get_kb_documents_collection()
+    if kb_documents_collection is None:
+        raise Exception("Database not initialized")
+
+    query: Dict[str, Any] = {"tenant_id": tenant_id}
+    if cursor:
+        created_at, document_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "document_id": {"$lt": document_id}}
+        ]
+
+    docs = await kb_documents_collection.find(query, {"metadata": 0}).sort(
+        [("created_at", -1), ("document_id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+
+    documents = [KBDocument(**doc) for doc in docs[:limit]]
+    next_cursor = None
+    if len(docs) > limit:
+        next_cursor = encode_cursor(documents[-1].created_at, documents[-1].document_id)
+    return documents, next_cursor
+
+
+def encode_cursor(created_at: datetime, document_id: str) -> str:
+    raw = f"{created_at.isoformat()}|{document_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, document_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), document_id
+    except Exception:
+        raise ValueError("Invalid cursor")
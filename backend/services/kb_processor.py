@@ -1,24 +1,68 @@
-from typing import List
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from openai import AsyncOpenAI
+from bson import ObjectId
+from pymongo import InsertOne, DeleteMany, UpdateOne, UpdateMany
+from collections import defaultdict
 from backend.config import settings
 from backend.models.kb_chunk import KBChunk, DocumentUpload
-from backend.database import get_kb_chunks_collection
+from backend.database import get_kb_chunks_collection, get_chunk_embeddings_collection
+from backend.services.vector_index import vector_index
+from backend.services.lexical_index import lexical_index
+from backend.services.kb_version import bump_kb_version
+from backend.services import kb_documents
+from backend.services.embedding_cache import content_hash, load_cached_embeddings, store_cached_embeddings
+from backend.services.chunking import FixedSizeChunker, StructuredChunker, count_tokens, get_encoding
+from backend.utils.vector_codec import encode_embedding
+import openai
+import asyncio
+import random
 import uuid
 from datetime import datetime
 
-client = AsyncOpenAI(api_key=settings.openai_api_key)
+# Retries are handled per batch in KBProcessor._embed_with_retry
+client = AsyncOpenAI(api_key=settings.openai_api_key, max_retries=0)
+
+# Upper bound on inputs per embeddings request accepted by the API
+MAX_EMBEDDING_INPUTS = 2048
+
+
+class DocumentProcessing(Exception):
+    """Raised when a document cannot be changed while it is still being ingested"""
+
+
+class IngestionSuperseded(Exception):
+    """
+    Raised by an on_progress callback when another run has taken over the
+    document; what was written so far then belongs to that run and is not
+    cleaned up
+    """
 
 
 class KBProcessor:
     """Knowledge base document processor"""
     
     def __init__(self):
-        self.chunk_size = 1000  # characters
-        self.chunk_overlap = 200  # characters
+        self.chunking_strategy = settings.chunking_strategy
+        self.chunk_size = 1000  # characters ("fixed" strategy)
+        self.chunk_overlap = 200  # characters ("fixed" strategy)
+    
+    def new_chunker(self):
+        """Fresh chunker for one document, per settings.chunking_strategy"""
+        if self.chunking_strategy == "fixed":
+            return FixedSizeChunker(self.chunk_size, self.chunk_overlap)
+        return StructuredChunker(
+            target_tokens=settings.chunk_target_tokens,
+            overlap_tokens=settings.chunk_overlap_tokens,
+            encoding=settings.chunk_tokenizer
+        )
+    
+    def count_tokens(self, text: str) -> int:
+        """Tokens of a chunk, as recorded in kb_documents.token_count"""
+        return count_tokens(text, get_encoding(settings.chunk_tokenizer))
     
     def chunk_text(self, text: str) -> List[str]:
         """
-        Split text into chunks with overlap
+        Split text into chunks
         
         Args:
             text: Input text to chunk
@@ -26,93 +70,382 @@ class KBProcessor:
         Returns:
             List of text chunks
         """
-        chunks = []
-        start = 0
-        text_length = len(text)
-        
-        while start < text_length:
-            # Get chunk
-            end = start + self.chunk_size
-            chunk = text[start:end]
-            chunks.append(chunk)
-            
-            # Move start with overlap
-            start = end - self.chunk_overlap
-            
-            # Prevent infinite loop
-            if start >= text_length or end >= text_length:
-                break
+        return list(self.iter_chunks([text]))
+    
+    def iter_chunks(self, blocks: Iterable[str]) -> Iterator[str]:
+        """
+        Chunk text that arrives in blocks, yielding chunks as soon as they are complete
         
-        return chunks
+        Chunker state is carried across block boundaries, so the output is the
+        same as chunking the concatenated text in one go.
+        """
+        chunker = self.new_chunker()
+        for block in blocks:
+            yield from chunker.feed(block)
+        yield from chunker.finish()
+    
+    async def aiter_chunks(self, blocks: AsyncIterable[str]) -> AsyncIterator[str]:
+        """Async counterpart of iter_chunks"""
+        chunker = self.new_chunker()
+        async for block in blocks:
+            for chunk in chunker.feed(block):
+                yield chunk
+        for chunk in chunker.finish():
+            yield chunk
     
-    async def generate_embedding(self, text: str) -> List[float]:
+    async def generate_embeddings(self, texts: List[str], hashes: Optional[List[str]] = None) -> List[List[float]]:
         """
-        Generate embedding for text using OpenAI
+        Generate embeddings for many texts, reusing cached ones
+        
+        Each text is looked up by content hash in the chunk_embeddings
+        collection first (no expiry, so an embedding is never paid for twice);
+        only texts never seen before (deduplicated) go to the API.
         
         Args:
-            text: Text to embed
+            texts: Texts to embed
+            hashes: Precomputed content hashes of texts
         
         Returns:
-            Embedding vector
+            Embedding vectors, in input order
+        
+        Raises:
+            Exception: If any batch still fails after retries
         """
-        try:
-            response = await client.embeddings.create(
-                model="text-embedding-3-small",
-                input=text
-            )
-            return response.data[0].embedding
-        except Exception as e:
-            print(f"Error generating embedding: {e}")
-            return []
+        if not settings.chunk_embedding_cache_enabled:
+            return await self._embed_uncached(texts)
+        
+        hashes = hashes or [content_hash(text) for text in texts]
+        chunk_embeddings_collection = get_chunk_embeddings_collection()
+        embeddings = await load_cached_embeddings(chunk_embeddings_collection, list(set(hashes)))
+        
+        missing = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in embeddings:
+                missing.setdefault(text_hash, text)
+        
+        if missing:
+            fresh = dict(zip(missing, await self._embed_uncached(list(missing.values()))))
+            await store_cached_embeddings(chunk_embeddings_collection, settings.embedding_model, fresh)
+            embeddings.update(fresh)
+        
+        return [embeddings[text_hash] for text_hash in hashes]
+    
+    async def _embed_uncached(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts with OpenAI
+        
+        Texts are sent in batches of settings.embedding_batch_size with at most
+        settings.embedding_concurrency requests in flight.
+        """
+        batch_size = max(1, min(settings.embedding_batch_size, MAX_EMBEDDING_INPUTS))
+        semaphore = asyncio.Semaphore(max(1, settings.embedding_concurrency))
+        
+        async def embed_batch(start: int) -> List[List[float]]:
+            async with semaphore:
+                return await self._embed_with_retry(texts[start:start + batch_size])
+        
+        batches = await asyncio.gather(*[
+            embed_batch(start) for start in range(0, len(texts), batch_size)
+        ])
+        return [embedding for batch in batches for embedding in batch]
+    
+    async def _embed_with_retry(self, texts: List[str]) -> List[List[float]]:
+        """One embeddings request with backoff on rate limits and transient errors"""
+        for attempt in range(settings.embedding_max_retries + 1):
+            try:
+                response = await client.embeddings.create(
+                    model=settings.embedding_model,
+                    input=texts
+                )
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            except openai.BadRequestError:
+                if len(texts) == 1:
+                    raise
+                # Retry the halves so one bad input does not sink its whole batch
+                middle = len(texts) // 2
+                return (
+                    await self._embed_with_retry(texts[:middle])
+                    + await self._embed_with_retry(texts[middle:])
+                )
+            except (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError) as e:
+                if attempt == settings.embedding_max_retries:
+                    raise
+                delay = settings.embedding_retry_base_delay * (2 ** attempt)
+                retry_after = getattr(getattr(e, "response", None), "headers", {}).get("retry-after")
+                if retry_after:
+                    try:
+                        delay = max(delay, float(retry_after))
+                    except ValueError:
+                        pass
+                print(f"Embedding request failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay + random.uniform(0, delay / 2))
     
     async def process_document(
         self,
         document: DocumentUpload,
-        tenant_id: str
-    ) -> str:
+        tenant_id: str,
+        document_id: Optional[str] = None,
+        on_progress: Optional[Callable[[int], Awaitable[None]]] = None
+    ) -> Tuple[str, int]:
         """
         Process document: chunk and generate embeddings
         
         Args:
             document: Document to process
             tenant_id: Tenant ID
+            document_id: Use this ID instead of generating one
+            on_progress: Awaited with the number of chunks stored after each batch
         
         Returns:
-            Document ID
+            Tuple of (document_id, chunks_count)
         """
-        document_id = str(uuid.uuid4())
+        async def content_blocks():
+            yield document.content
         
-        # Chunk the document
-        chunks = self.chunk_text(document.content)
+        return await self.process_stream(
+            document.name,
+            content_blocks(),
+            tenant_id,
+            metadata=document.metadata,
+            document_id=document_id,
+            on_progress=on_progress
+        )
+    
+    async def process_stream(
+        self,
+        name: str,
+        blocks: AsyncIterable[str],
+        tenant_id: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        document_id: Optional[str] = None,
+        on_progress: Optional[Callable[[int], Awaitable[None]]] = None
+    ) -> Tuple[str, int]:
+        """
+        Process a document whose text arrives in blocks
+        
+        Chunks are embedded and written in batches of settings.kb_insert_batch_size
+        as the text streams in, so memory stays flat however large the document
+        is. If any batch fails, the chunks already written are removed again,
+        unless on_progress raised IngestionSuperseded.
+        
+        Args:
+            name: Document name
+            blocks: Document text, in blocks of any size
+            tenant_id: Tenant ID
+            metadata: Document metadata copied onto every chunk
+            document_id: Use this ID instead of generating one
+            on_progress: Awaited with the number of chunks stored after each batch
         
-        # Process each chunk
-        for idx, chunk_text in enumerate(chunks):
-            # Generate embedding
-            embedding = await self.generate_embedding(chunk_text)
+        Returns:
+            Tuple of (document_id, chunks_count)
+        """
+        kb_chunks_collection = get_kb_chunks_collection()
+        if kb_chunks_collection is None:
+            raise Exception("Database not initialized")
+        
+        document_id = document_id or str(uuid.uuid4())
+        batch_size = max(1, settings.kb_insert_batch_size)
+        chunks_count = 0
+        token_count = 0
+        
+        await kb_documents.start_document(tenant_id, document_id, name, metadata)
+        
+        async def store_batch(batch: List[str]):
+            nonlocal chunks_count, token_count
             
-            # Create KB chunk
-            kb_chunk = KBChunk(
-                tenant_id=tenant_id,
-                document_id=document_id,
-                document_name=document.name,
-                text=chunk_text,
-                chunk_index=idx,
-                embedding=embedding,
-                metadata=document.metadata or {},
-                created_at=datetime.utcnow()
-            )
+            # Embed the batch first; a failure aborts before it is stored
+            hashes = [content_hash(chunk_text) for chunk_text in batch]
+            embeddings = await self.generate_embeddings(batch, hashes)
             
-            # Insert into database
-            kb_chunks_collection = get_kb_chunks_collection()
-            if kb_chunks_collection is None:
-                raise Exception("Database not initialized")
+            chunk_docs = [
+                self._build_chunk_doc(
+                    name, metadata, document_id, tenant_id, chunks_count + offset, chunk_text, embedding, chunk_hash
+                )
+                for offset, (chunk_text, embedding, chunk_hash) in enumerate(zip(batch, embeddings, hashes))
+            ]
+            result = await kb_chunks_collection.insert_many(chunk_docs, ordered=False)
+            chunk_ids = result.inserted_ids
+            chunks_count += len(chunk_ids)
+            token_count += sum(self.count_tokens(chunk_text) for chunk_text in batch)
             
-            await kb_chunks_collection.insert_one(kb_chunk.model_dump())
+            # Make the new chunks searchable without a full index reload
+            await vector_index.add_chunks(tenant_id, document_id, chunk_ids, embeddings)
+            lexical_index.add_chunks(tenant_id, document_id, chunk_ids, batch)
+            
+            if on_progress:
+                await on_progress(chunks_count)
+        
+        try:
+            batch = []
+            async for chunk in self.aiter_chunks(blocks):
+                batch.append(chunk)
+                if len(batch) >= batch_size:
+                    await store_batch(batch)
+                    batch = []
+            if batch:
+                await store_batch(batch)
+        except IngestionSuperseded:
+            raise
+        except Exception:
+            if chunks_count:
+                await self.delete_document(document_id, tenant_id)
+            else:
+                await kb_documents.remove_document(tenant_id, document_id)
+            raise
+        
+        await kb_documents.complete_document(tenant_id, document_id, chunks_count, token_count)
+        kb_version = await bump_kb_version(tenant_id)
+        vector_index.record_version(tenant_id, kb_version)
+        lexical_index.record_version(tenant_id, kb_version)
+        
+        return document_id, chunks_count
+    
+    async def update_document(
+        self,
+        document_id: str,
+        document: DocumentUpload,
+        tenant_id: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Replace a document's content, re-embedding only chunks that changed
+        
+        The new content is re-chunked and matched against the stored chunks by
+        content hash. Unchanged chunks are kept (renumbered if they moved), new
+        ones are embedded and inserted, vanished ones are deleted, all in a
+        single bulk write.
+        
+        Args:
+            document_id: Document to update
+            document: New name, content and metadata
+            tenant_id: Tenant ID
+        
+        Returns:
+            Counts of chunks kept/added/removed, the token count and the document's
+            original created_at, or None if the document does not exist
+        
+        Raises:
+            DocumentProcessing: If the document's ingestion has not finished
+        """
+        kb_chunks_collection = get_kb_chunks_collection()
+        if kb_chunks_collection is None:
+            raise Exception("Database not initialized")
+        
+        # An ingestion still writing chunks would mix with the diff below
+        if await kb_documents.get_status(tenant_id, document_id) == "processing":
+            raise DocumentProcessing()
+        
+        # Existing chunk ids per content hash (legacy chunks are hashed on the fly)
+        existing = defaultdict(list)
+        existing_index = {}
+        cursor = kb_chunks_collection.find(
+            {"document_id": document_id, "tenant_id": tenant_id},
+            {"content_hash": 1, "text": 1, "chunk_index": 1, "created_at": 1}
+        ).sort("chunk_index", 1)
+        first_created = None
+        async for doc in cursor:
+            existing[doc.get("content_hash") or content_hash(doc.get("text", ""))].append(doc["_id"])
+            existing_index[doc["_id"]] = doc.get("chunk_index")
+            if doc.get("created_at") and (first_created is None or doc["created_at"] < first_created):
+                first_created = doc["created_at"]
+        if not existing_index:
+            return None
+        
+        chunks = self.chunk_text(document.content)
+        hashes = [content_hash(chunk_text) for chunk_text in chunks]
         
-        return document_id
+        kept = []
+        added = []
+        for idx, chunk_hash in enumerate(hashes):
+            if existing[chunk_hash]:
+                kept.append((existing[chunk_hash].pop(0), idx))
+            else:
+                added.append(idx)
+        removed = [chunk_id for chunk_ids in existing.values() for chunk_id in chunk_ids]
+        
+        embeddings = await self.generate_embeddings(
+            [chunks[idx] for idx in added],
+            [hashes[idx] for idx in added]
+        )
+        
+        operations = []
+        added_docs = []
+        for idx, embedding in zip(added, embeddings):
+            chunk_doc = self._build_chunk_doc(
+                document.name, document.metadata, document_id, tenant_id, idx, chunks[idx], embedding, hashes[idx]
+            )
+            chunk_doc["_id"] = ObjectId()
+            added_docs.append(chunk_doc)
+            operations.append(InsertOne(chunk_doc))
+        if removed:
+            operations.append(DeleteMany({"_id": {"$in": removed}, "tenant_id": tenant_id}))
+        if kept:
+            operations.append(UpdateMany(
+                {"_id": {"$in": [chunk_id for chunk_id, _ in kept]}, "tenant_id": tenant_id},
+                {"$set": {"document_name": document.name, "metadata": document.metadata or {}}}
+            ))
+        for chunk_id, idx in kept:
+            if existing_index[chunk_id] != idx:
+                operations.append(UpdateOne({"_id": chunk_id}, {"$set": {"chunk_index": idx}}))
+        
+        if operations:
+            await kb_chunks_collection.bulk_write(operations, ordered=False)
+        
+        # Update the in-memory indexes incrementally
+        if removed:
+            await vector_index.remove_chunks(tenant_id, document_id, removed)
+            lexical_index.remove_chunks(tenant_id, document_id, removed)
+        if added_docs:
+            added_ids = [chunk_doc["_id"] for chunk_doc in added_docs]
+            await vector_index.add_chunks(tenant_id, document_id, added_ids, embeddings)
+            lexical_index.add_chunks(tenant_id, document_id, added_ids, [chunk_doc["text"] for chunk_doc in added_docs])
+        token_count = sum(self.count_tokens(chunk_text) for chunk_text in chunks)
+        created_at = await kb_documents.update_document(
+            tenant_id, document_id, document.name, len(chunks), token_count, created_at=first_created
+        )
+        kb_version = await bump_kb_version(tenant_id)
+        vector_index.record_version(tenant_id, kb_version)
+        lexical_index.record_version(tenant_id, kb_version)
+        
+        return {
+            "chunks_count": len(chunks),
+            "token_count": token_count,
+            "created_at": created_at or datetime.utcnow(),
+            "unchanged": len(kept),
+            "added": len(added),
+            "removed": len(removed)
+        }
+    
+    def _build_chunk_doc(
+        self,
+        name: str,
+        metadata: Optional[Dict[str, Any]],
+        document_id: str,
+        tenant_id: str,
+        chunk_index: int,
+        chunk_text: str,
+        embedding: List[float],
+        chunk_hash: Optional[str] = None
+    ) -> dict:
+        """KB chunk document ready for insertion"""
+        kb_chunk = KBChunk(
+            tenant_id=tenant_id,
+            document_id=document_id,
+            document_name=name,
+            text=chunk_text,
+            chunk_index=chunk_index,
+            embedding=embedding,
+            content_hash=chunk_hash,
+            metadata=metadata or {},
+            created_at=datetime.utcnow()
+        )
+        
+        # Store the vector packed rather than as a BSON array of doubles
+        chunk_doc = kb_chunk.model_dump(exclude={"embedding"})
+        chunk_doc["embedding"] = encode_embedding(embedding) if embedding else None
+        return chunk_doc
     
     async def delete_document(self, document_id: str, tenant_id: str):
-        """Delete all chunks for a document"""
+        """Delete a document and all of its chunks"""
         kb_chunks_collection = get_kb_chunks_collection()
         if kb_chunks_collection is None:
             raise Exception("Database not initialized")
@@ -121,3 +454,10 @@ class KBProcessor:
             "document_id": document_id,
             "tenant_id": tenant_id
         })
+        
+        await kb_documents.remove_document(tenant_id, document_id)
+        await vector_index.remove_document(tenant_id, document_id)
+        lexical_index.remove_document(tenant_id, document_id)
+        kb_version = await bump_kb_version(tenant_id)
+        vector_index.record_version(tenant_id, kb_version)
+        lexical_index.record_version(tenant_id, kb_version)
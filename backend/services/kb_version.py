@@ -0,0 +1,36 @@
+from typing import Optional
+from pymongo import ReturnDocument
+from backend.database import get_tenants_collection
+
+
+async def get_kb_version(tenant_id: str) -> Optional[int]:
+    """Current knowledge-base version of a tenant, None if unknown"""
+    tenants_collection = get_tenants_collection()
+    if tenants_collection is None:
+        return None
+    tenant_doc = await tenants_collection.find_one({"tenant_id": tenant_id}, {"kb_version": 1})
+    if not tenant_doc:
+        return None
+    return tenant_doc.get("kb_version", 0)
+
+
+async def bump_kb_version(tenant_id: str) -> Optional[int]:
+    """
+    Record a change to a tenant's knowledge base
+    
+    Anything cached against the previous version (retrieval results, loaded
+    indexes in other workers) is treated as stale from here on.
+    
+    Returns:
+        The new version, None if the tenant does not exist
+    """
+    tenants_collection = get_tenants_collection()
+    if tenants_collection is None:
+        return None
+    tenant_doc = await tenants_collection.find_one_and_update(
+        {"tenant_id": tenant_id},
+        {"$inc": {"kb_version": 1}},
+        projection={"kb_version": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    return tenant_doc["kb_version"] if tenant_doc else None
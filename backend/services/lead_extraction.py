@@ -1,7 +1,11 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from collections import Counter, defaultdict
 from openai import AsyncOpenAI
 from backend.config import settings
+from backend.models.conversation import Conversation
 from backend.models.lead import LeadFields
+from backend.services.lead_heuristics import pre_extract
+from backend.services.message_tokens import newest_within_budget
 import json
 
 client = AsyncOpenAI(api_key=settings.openai_api_key)
@@ -11,6 +15,11 @@ class LeadExtractionService:
     """Service for extracting lead information using OpenAI function calling"""
     
     def __init__(self):
+        # Per tenant: LLM extraction calls made vs. avoided by the local pre-extractor
+        # (llm_calls_executed, llm_calls_combined, llm_calls_skipped, heuristic_fields_filled);
+        # llm_calls_combined counts extractions carried by the reply completion
+        self.counters: Dict[str, Counter] = defaultdict(Counter)
+        
         self.extraction_tools = [
             {
                 "type": "function",
@@ -61,62 +70,161 @@ class LeadExtractionService:
     async def extract_from_conversation(
         self,
         messages: List[Dict[str, str]],
-        current_fields: LeadFields
+        current_fields: LeadFields,
+        tenant_id: str,
+        use_heuristics: bool = True
     ) -> Optional[LeadFields]:
         """
         Extract lead information from conversation using OpenAI function calling
         
         Args:
-            messages: Conversation history
-            current_fields: Current lead fields
+            messages: Messages since the last extraction, as built by extraction_history
+            current_fields: Current lead fields, sent along as the known state
+            tenant_id: Tenant the calls are counted for in stats()
+            use_heuristics: Run the local pre-extractor first (see pre_extract)
         
         Returns:
             Updated LeadFields if new information extracted, None otherwise
+        
+        Raises:
+            Exception: If the extraction call fails, so the caller can retry these messages
+        """
+        local_fields = None
+        if use_heuristics:
+            local_fields, needs_llm = self.pre_extract(messages, current_fields, tenant_id)
+            if not needs_llm:
+                return local_fields
+            current_fields = local_fields or current_fields
+        
+        self.counters[tenant_id]["llm_calls_executed"] += 1
+        return await self._extract_with_llm(messages, current_fields) or local_fields
+    
+    def extraction_history(self, conversation: Conversation) -> List[Dict[str, str]]:
+        """
+        Messages not yet mined for lead fields
+        
+        Everything before conversation.extracted_until was covered by an earlier
+        successful extraction, whose result travels as the current LeadFields;
+        normally that leaves the previous assistant message and the new user
+        message. Capped by settings.extraction_history_token_budget.
+        """
+        new_messages = conversation.messages[conversation.extracted_until:]
+        recent = newest_within_budget(new_messages, settings.extraction_history_token_budget)
+        return [{"role": m.role, "content": m.content} for m in recent]
+    
+    def pre_extract(
+        self,
+        messages: List[Dict[str, str]],
+        current_fields: LeadFields,
+        tenant_id: str
+    ) -> Tuple[Optional[LeadFields], bool]:
+        """
+        Local pass over the latest user message
+        
+        Fills obvious fields and decides whether the conversation needs an LLM
+        extraction call at all; a skipped call is counted here.
+        
+        Returns:
+            Tuple of (updated fields or None if nothing new, whether the LLM is needed)
         """
-        try:
-            # Create system message for extraction
-            system_message = """You are a lead information extraction assistant. 
+        if not settings.lead_heuristics_enabled or not messages or messages[-1]["role"] != "user":
+            return None, True
+        
+        previous = messages[-2]["content"] if len(messages) > 1 and messages[-2]["role"] == "assistant" else None
+        pre = pre_extract(messages[-1]["content"], previous)
+        
+        local_fields = None
+        found = {field: value for field, value in pre.fields.items() if getattr(current_fields, field) != value}
+        counters = self.counters[tenant_id]
+        if found:
+            local_fields = current_fields.model_copy(update=found)
+            counters["heuristic_fields_filled"] += len(found)
+        
+        if not pre.needs_llm:
+            counters["llm_calls_skipped"] += 1
+        return local_fields, pre.needs_llm
+    
+    def stats(self, tenant_id: str) -> Dict[str, Any]:
+        """A tenant's counters of extraction calls executed, combined with the reply, and skipped by the local pass"""
+        counters = self.counters.get(tenant_id, Counter())
+        total = counters["llm_calls_executed"] + counters["llm_calls_combined"] + counters["llm_calls_skipped"]
+        return {
+            "llm_calls_executed": counters["llm_calls_executed"],
+            "llm_calls_combined": counters["llm_calls_combined"],
+            "llm_calls_skipped": counters["llm_calls_skipped"],
+            "skip_rate": round(counters["llm_calls_skipped"] / total, 4) if total else 0.0,
+            "heuristic_fields_filled": counters["heuristic_fields_filled"]
+        }
+    
+    def extraction_messages(
+        self,
+        messages: List[Dict[str, str]],
+        current_fields: LeadFields
+    ) -> List[Dict[str, str]]:
+        """Prompt for the extraction call: instructions, known fields as compact JSON, new messages"""
+        # Create system message for extraction
+        system_message = """You are a lead information extraction assistant. 
 Your job is to extract contact and qualification information from conversations.
 Only extract information that is explicitly mentioned by the user.
 Call the update_lead_information function whenever you find new information."""
-            
-            # Prepare messages for OpenAI
-            openai_messages = [
-                {"role": "system", "content": system_message}
-            ]
-            openai_messages.extend(messages[-10:])  # Last 10 messages for context
-            
-            # Call OpenAI with function calling
-            response = await client.chat.completions.create(
-                model=settings.openai_model,
-                messages=openai_messages,
-                tools=self.extraction_tools,
-                tool_choice="auto",
-                temperature=0.3  # Lower temperature for more consistent extraction
-            )
-            
-            # Check if function was called
-            message = response.choices[0].message
-            if message.tool_calls:
-                for tool_call in message.tool_calls:
-                    if tool_call.function.name == "update_lead_information":
-                        # Parse extracted data
-                        extracted_data = json.loads(tool_call.function.arguments)
-                        
-                        # Merge with current fields (only update if new value provided)
-                        updated_fields = current_fields.model_copy()
-                        
-                        for field, value in extracted_data.items():
-                            if value and value.strip():  # Only update if non-empty
-                                setattr(updated_fields, field, value)
-                        
-                        return updated_fields
-            
-            return None
-            
-        except Exception as e:
-            print(f"Error extracting lead information: {e}")
-            return None
+        
+        # Prepare messages for OpenAI
+        openai_messages = [
+            {"role": "system", "content": system_message}
+        ]
+        
+        # Earlier turns are represented by what was already extracted from them
+        known = current_fields.model_dump_json(exclude_none=True)
+        if known != "{}":
+            openai_messages.append({
+                "role": "system",
+                "content": f"Lead information already known: {known}\nOnly report new or changed values."
+            })
+        
+        openai_messages.extend(messages)
+        return openai_messages
+    
+    async def _extract_with_llm(
+        self,
+        messages: List[Dict[str, str]],
+        current_fields: LeadFields
+    ) -> Optional[LeadFields]:
+        """Extraction with OpenAI function calling"""
+        # Call OpenAI with function calling
+        response = await client.chat.completions.create(
+            model=settings.openai_model,
+            messages=self.extraction_messages(messages, current_fields),
+            tools=self.extraction_tools,
+            tool_choice="auto",
+            temperature=0.3  # Lower temperature for more consistent extraction
+        )
+        
+        return self.parse_tool_calls(response.choices[0].message, current_fields)
+    
+    def parse_tool_calls(self, message: Any, current_fields: LeadFields) -> Optional[LeadFields]:
+        """
+        Merge an update_lead_information call from a chat completion message
+        
+        Returns:
+            Updated LeadFields, or None if the message did not call the tool
+        """
+        # Check if function was called
+        if message.tool_calls:
+            for tool_call in message.tool_calls:
+                if tool_call.function.name == "update_lead_information":
+                    # Parse extracted data
+                    extracted_data = json.loads(tool_call.function.arguments)
+                    
+                    # Merge with current fields (only update if new value provided)
+                    updated_fields = current_fields.model_copy()
+                    
+                    for field, value in extracted_data.items():
+                        if value and value.strip():  # Only update if non-empty
+                            setattr(updated_fields, field, value)
+                    
+                    return updated_fields
+        
+        return None
     
     def get_missing_fields(self, fields: LeadFields) -> List[str]:
         """Get list of missing important fields"""
@@ -0,0 +1,144 @@
+from typing import Dict, List, Optional, Tuple
+import re
+
+# Contact details
+EMAIL_PATTERN = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
+PHONE_PATTERN = re.compile(r"(?<![\w$€£])(?:\+\d{1,3}[\s.-]?)?(?:\(\d{2,4}\)|\d{2,4})[\s.-]?\d{3,4}[\s.-]?\d{3,4}(?![\w%])")
+
+# "$5k", "10,000 USD", "$5k-$10k", "between 5000 and 8000 euros"
+MONEY = r"(?:[$€£]\s?\d[\d,]*(?:\.\d+)?\s?(?:[kKmM]\b)?|\b\d[\d,]*(?:\.\d+)?\s?[kK]?\s?(?:usd|dollars|eur|euros?|gbp|pounds|bucks)\b|\b\d+(?:\.\d+)?\s?[kK]\b)"
+BUDGET_PATTERN = re.compile(rf"{MONEY}(?:\s*(?:-|–|to|and)\s*{MONEY})?", re.IGNORECASE)
+BUDGET_CUE = re.compile(r"\b(?:budget|spend|afford|invest|price range|up to|max(?:imum)?|no more than|around|about)\b", re.IGNORECASE)
+
+NUMBER_WORD = r"(?:a|an|one|two|three|four|five|six|a few|few|couple of|\d+)"
+MONTH = r"(?:january|february|march|april|may|june|july|august|september|october|november|december|q[1-4])"
+TIMELINE_PATTERN = re.compile(
+    r"\b(?:asap|as soon as possible|urgent(?:ly)?|immediately|right away|today|tomorrow"
+    r"|this (?:week|month|quarter|year)|next (?:week|month|quarter|year)"
+    rf"|(?:within|in) (?:the next )?{NUMBER_WORD} (?:days?|weeks?|months?)"
+    rf"|by (?:the )?(?:end of )?{MONTH})\b",
+    re.IGNORECASE
+)
+TIMELINE_CUE = re.compile(r"\b(?:start|begin|launch|need (?:it|this|them)|looking to|ready|timeline|deadline|go live|by)\b", re.IGNORECASE)
+
+NAME_PATTERN = re.compile(r"\b(?:[Mm]y name is|[Cc]all me)\s+([A-Z][a-z'-]+(?:\s+[A-Z][a-z'-]+)?)")
+
+# Anything left over that may carry a field only the LLM can read
+# (service interest, company, location, an unlabelled name...)
+OPEN_CUE = re.compile(
+    r"\b(?:interested|looking for|need|want|would like|company|business|work (?:at|for)|based|located|"
+    r"live|from|i am|i'm|im|we are|we're|service|help with)\b",
+    re.IGNORECASE
+)
+
+# Words about a field the local pass did not fill ("budget is flexible")
+FIELD_WORDS = {
+    "budget": re.compile(r"\b(?:budget|spend|afford|price|cost|quote)\b", re.IGNORECASE),
+    "timeline": re.compile(r"\b(?:timeline|deadline|start|begin|launch|when|soon)\b", re.IGNORECASE),
+    "name": re.compile(r"\bname\b", re.IGNORECASE)
+}
+PROPER_NOUN = re.compile(r"(?<![.!?]\s)(?<!^)\b[A-Z][a-z]+")
+DIGIT = re.compile(r"\d")
+
+# The assistant just asked for a field, so even a bare "Acme" or "yes" may answer it
+FIELD_QUESTION = re.compile(
+    r"\b(?:name|email|e-mail|phone|number|reach you|company|business|budget|spend|timeline|"
+    r"when|start|where|located|location|city|service|interested in|looking for)\b[^?]*\?",
+    re.IGNORECASE
+)
+
+
+class PreExtraction:
+    """Outcome of the local pass over one user message"""
+
+    def __init__(self, fields: Dict[str, str], needs_llm: bool, reason: str):
+        self.fields = fields  # high-confidence values, safe to apply directly
+        self.needs_llm = needs_llm
+        self.reason = reason
+
+
+def pre_extract(user_message: str, previous_assistant_message: Optional[str] = None) -> PreExtraction:
+    """
+    Cheap regex/keyword pass deciding whether a message needs LLM extraction
+
+    Email and phone numbers, budgets stated next to a budget word, timelines
+    stated next to a timeline word (or given as a short answer) and "my name
+    is ..." names are taken directly. The LLM is still needed when anything
+    else in the message might carry lead information, or when the assistant
+    had just asked for a field.
+
+    Args:
+        user_message: Latest user message
+        previous_assistant_message: The assistant message it answers, if any
+
+    Returns:
+        PreExtraction with the fields found and whether to call the LLM
+    """
+    fields: Dict[str, str] = {}
+    spans: List[Tuple[int, int]] = []
+    uncertain = False
+    short_answer = len(user_message.split()) <= 4 and "?" not in user_message
+
+    email = EMAIL_PATTERN.search(user_message)
+    if email:
+        fields["email"] = email.group(0)
+        spans.append(email.span())
+
+    for phone in PHONE_PATTERN.finditer(user_message):
+        if _overlaps(phone.span(), spans):
+            continue
+        digits = len(re.sub(r"\D", "", phone.group(0)))
+        if 7 <= digits <= 15:
+            fields["phone"] = phone.group(0).strip()
+            spans.append(phone.span())
+            break
+
+    budget = BUDGET_PATTERN.search(user_message)
+    if budget and not _overlaps(budget.span(), spans):
+        spans.append(budget.span())
+        if BUDGET_CUE.search(user_message):
+            fields["budget"] = budget.group(0).strip()
+            spans.extend(cue.span() for cue in BUDGET_CUE.finditer(user_message))
+        else:
+            uncertain = True  # a price mentioned, maybe a question about ours
+
+    timeline = TIMELINE_PATTERN.search(user_message)
+    if timeline:
+        spans.append(timeline.span())
+        if TIMELINE_CUE.search(user_message) or short_answer:
+            fields["timeline"] = timeline.group(0)
+            spans.extend(cue.span() for cue in TIMELINE_CUE.finditer(user_message))
+        else:
+            uncertain = True  # "are you open today?"
+
+    name = NAME_PATTERN.search(user_message)
+    if name:
+        fields["name"] = name.group(1)
+        spans.append(name.span())
+
+    if uncertain:
+        return PreExtraction(fields, True, "ambiguous budget or timeline")
+
+    if previous_assistant_message and FIELD_QUESTION.search(previous_assistant_message):
+        # Unless the matched fields are the whole answer
+        if re.search(r"\w", _remainder(user_message, spans)):
+            return PreExtraction(fields, True, "answer to a qualifying question")
+
+    remainder = _remainder(user_message, spans)
+    if OPEN_CUE.search(remainder) or PROPER_NOUN.search(remainder.strip()) or DIGIT.search(remainder):
+        return PreExtraction(fields, True, "possible unstructured lead details")
+    if any(pattern.search(remainder) for field, pattern in FIELD_WORDS.items() if field not in fields):
+        return PreExtraction(fields, True, "field mentioned without a clear value")
+
+    return PreExtraction(fields, False, "fields found locally" if fields else "no lead details")
+
+
+def _overlaps(span: Tuple[int, int], spans: List[Tuple[int, int]]) -> bool:
+    return any(span[0] < end and start < span[1] for start, end in spans)
+
+
+def _remainder(text: str, spans: List[Tuple[int, int]]) -> str:
+    """Text with the matched spans blanked out"""
+    for start, end in sorted(spans, reverse=True):
+        text = text[:start] + " " * (end - start) + text[end:]
+    return text
@@ -0,0 +1,254 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+from collections import Counter, defaultdict
+from backend.database import get_kb_chunks_collection
+from backend.services.kb_version import get_kb_version
+from backend.utils.logger import get_logger
+import asyncio
+import heapq
+import math
+import re
+
+logger = get_logger(__name__)
+
+# Prices and quantities ("$5,000", "4.5") or words/SKUs ("wp-200", "v2.1")
+TOKEN_PATTERN = re.compile(r"\$?\d[\d,]*(?:\.\d+)?|[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by do for from has have how i if in is it its me my of on or our "
+    "so that the their them there they this to us was we what when where which who will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase terms with numbers normalised ("$5,000" -> "5000")"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token[0] == "$" or token[0].isdigit():
+            token = token.lstrip("$").replace(",", "")
+        if token and token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """Inverted index with Okapi BM25 scoring, updated incrementally"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[object, int]] = defaultdict(dict)
+        self.doc_lengths: Dict[object, int] = {}
+        self.chunk_terms: Dict[object, Dict[str, int]] = {}
+        self.document_chunks: Dict[str, List] = defaultdict(list)
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, chunk_ids: Sequence, document_ids: Sequence[str], texts: Sequence[str]):
+        """Index chunk texts"""
+        for chunk_id, document_id, text in zip(chunk_ids, document_ids, texts):
+            if chunk_id in self.doc_lengths:
+                continue
+            terms = Counter(tokenize(text))
+            for term, tf in terms.items():
+                self.postings[term][chunk_id] = tf
+            length = sum(terms.values())
+            self.doc_lengths[chunk_id] = length
+            self.chunk_terms[chunk_id] = terms
+            self.document_chunks[document_id].append(chunk_id)
+            self.total_length += length
+
+    def remove_document(self, document_id: str) -> int:
+        """Drop every chunk of a document, returns number of chunks removed"""
+        chunk_ids = self.document_chunks.pop(document_id, [])
+        for chunk_id in chunk_ids:
+            self._drop(chunk_id)
+        return len(chunk_ids)
+
+    def remove_chunks(self, document_id: str, chunk_ids: Sequence) -> int:
+        """Drop individual chunks of a document, returns number of chunks removed"""
+        targets = set(chunk_ids)
+        remaining = [chunk_id for chunk_id in self.document_chunks.get(document_id, []) if chunk_id not in targets]
+        removed = [chunk_id for chunk_id in targets if chunk_id in self.doc_lengths]
+        for chunk_id in removed:
+            self._drop(chunk_id)
+        if remaining:
+            self.document_chunks[document_id] = remaining
+        else:
+            self.document_chunks.pop(document_id, None)
+        return len(removed)
+
+    def _drop(self, chunk_id):
+        for term in self.chunk_terms.pop(chunk_id, {}):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(chunk_id, 0)
+
+    def search(self, query: str, k: int) -> List[Tuple[object, float]]:
+        """Top-k (chunk_id, BM25 score) pairs"""
+        n = len(self)
+        if n == 0 or k <= 0:
+            return []
+
+        avg_length = self.total_length / n or 1.0
+        scores: Dict[object, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for chunk_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[chunk_id] / avg_length)
+                scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+class LexicalIndexManager:
+    """
+    Per-tenant BM25 indexes over KBChunk.text, loaded lazily from kb_chunks
+
+    Each index remembers the tenant kb_version it reflects; a search with a
+    newer version (a change made by another worker) starts a rebuild in the
+    background and keeps being answered from the current index until the
+    new one replaces it.
+    """
+
+    def __init__(self):
+        self._indexes: Dict[str, BM25Index] = {}
+        self._versions: Dict[str, Optional[int]] = {}
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._generations: Dict[str, int] = defaultdict(int)
+        self._refreshes: Dict[str, asyncio.Task] = {}
+
+    async def get_index(self, tenant_id: str, kb_version: Optional[int] = None) -> Optional[BM25Index]:
+        """Get the tenant's index, loading it from MongoDB on first use (rebuilt in the background when stale)"""
+        if kb_version is not None and self._is_stale(tenant_id, kb_version):
+            self._schedule_refresh(tenant_id)
+
+        index = self._indexes.get(tenant_id)
+        if index is not None:
+            return index
+
+        async with self._locks[tenant_id]:
+            index = self._indexes.get(tenant_id)
+            if index is not None:
+                return index
+
+            index, version = await self._build(tenant_id)
+            if index is not None:
+                self._indexes[tenant_id] = index
+                self._versions[tenant_id] = version
+            return index
+
+    async def _build(self, tenant_id: str) -> Tuple[Optional[BM25Index], Optional[int]]:
+        # Reload if the KB changed underneath us while we were reading it
+        while True:
+            generation = self._generations[tenant_id]
+            version = await get_kb_version(tenant_id)
+            index = await self._load(tenant_id)
+            if index is None or self._generations[tenant_id] == generation:
+                return index, version
+
+    def _schedule_refresh(self, tenant_id: str):
+        task = self._refreshes.get(tenant_id)
+        if task is None or task.done():
+            self._refreshes[tenant_id] = asyncio.create_task(self._refresh(tenant_id))
+
+    async def _refresh(self, tenant_id: str):
+        """Rebuild a stale index off the request path and swap it in once complete"""
+        try:
+            async with self._locks[tenant_id]:
+                index, version = await self._build(tenant_id)
+            # Swapped without awaiting, so no add/remove can slip in between
+            # the generation check in _build and the replacement
+            if index is not None and tenant_id in self._indexes:
+                self._indexes[tenant_id] = index
+                self._versions[tenant_id] = version
+        except Exception as e:
+            logger.error(f"Failed to rebuild lexical index for tenant {tenant_id}: {e}")
+
+    def _is_stale(self, tenant_id: str, kb_version: int) -> bool:
+        if tenant_id not in self._indexes:
+            return False
+        version = self._versions.get(tenant_id)
+        return version is None or version < kb_version
+
+    async def _load(self, tenant_id: str) -> Optional[BM25Index]:
+        kb_chunks_collection = get_kb_chunks_collection()
+        if kb_chunks_collection is None:
+            return None
+
+        index = BM25Index()
+        cursor = kb_chunks_collection.find(
+            {"tenant_id": tenant_id},
+            {"text": 1, "document_id": 1}
+        )
+        async for doc in cursor:
+            index.add([doc["_id"]], [doc["document_id"]], [doc.get("text", "")])
+        return index
+
+    async def search(
+        self,
+        tenant_id: str,
+        query: str,
+        k: int,
+        kb_version: Optional[int] = None
+    ) -> List[Tuple[object, float]]:
+        """Top-k (chunk_id, BM25 score) pairs for a tenant"""
+        index = await self.get_index(tenant_id, kb_version)
+        if index is None:
+            return []
+        return index.search(query, k)
+
+    def add_chunks(self, tenant_id: str, document_id: str, chunk_ids: Sequence, texts: Sequence[str]):
+        """Index freshly inserted chunks if the tenant index is loaded"""
+        self._generations[tenant_id] += 1
+        index = self._indexes.get(tenant_id)
+        if index is not None:
+            index.add(chunk_ids, [document_id] * len(chunk_ids), texts)
+
+    def remove_document(self, tenant_id: str, document_id: str):
+        """Drop a document from the tenant index if it is loaded"""
+        self._generations[tenant_id] += 1
+        index = self._indexes.get(tenant_id)
+        if index is not None:
+            index.remove_document(document_id)
+
+    def remove_chunks(self, tenant_id: str, document_id: str, chunk_ids: Sequence):
+        """Drop individual chunks from the tenant index if it is loaded"""
+        self._generations[tenant_id] += 1
+        index = self._indexes.get(tenant_id)
+        if index is not None:
+            index.remove_chunks(document_id, chunk_ids)
+
+    def record_version(self, tenant_id: str, kb_version: Optional[int]):
+        """
+        Note that this process's own change produced kb_version
+
+        The loaded index stays current only if it had seen every earlier
+        version; otherwise it missed another worker's change and is rebuilt
+        in the background.
+        """
+        if kb_version is None or tenant_id not in self._indexes:
+            return
+        version = self._versions.get(tenant_id)
+        if version is None or version < kb_version - 1:
+            self._schedule_refresh(tenant_id)
+        else:
+            self._versions[tenant_id] = max(version, kb_version)
+
+    def invalidate(self, tenant_id: str):
+        """Forget a tenant index so the next search reloads it"""
+        self._generations[tenant_id] += 1
+        self._indexes.pop(tenant_id, None)
+        self._versions.pop(tenant_id, None)
+
+
+# Global lexical index instance
+lexical_index = LexicalIndexManager()
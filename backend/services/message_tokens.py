@@ -0,0 +1,42 @@
+from typing import List
+from backend.config import settings
+from backend.models.conversation import Message
+from backend.services.chunking import count_tokens, get_encoding
+
+# Per-message overhead of the chat format (role and separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def message_tokens(message: Message) -> int:
+    """
+    Token count of a message's content, cached in its metadata
+
+    Computed once with the local tokenizer (settings.chunk_tokenizer) and
+    stored under metadata["tokens"], so it is persisted with the conversation
+    and later turns never re-tokenize old messages. Recomputed only if the
+    tokenizer setting changes.
+    """
+    metadata = message.metadata or {}
+    if metadata.get("tokenizer") == settings.chunk_tokenizer and "tokens" in metadata:
+        return metadata["tokens"]
+
+    tokens = count_tokens(message.content, get_encoding(settings.chunk_tokenizer))
+    message.metadata = {**metadata, "tokens": tokens, "tokenizer": settings.chunk_tokenizer}
+    return tokens
+
+
+def newest_within_budget(messages: List[Message], token_budget: int) -> List[Message]:
+    """
+    The most recent messages whose tokens fit the budget, oldest first
+
+    Filled newest-first and stopped at the first message that does not fit,
+    so the history stays contiguous. The newest message is always included.
+    """
+    used = 0
+    start = len(messages)
+    for message in reversed(messages):
+        used += message_tokens(message) + MESSAGE_OVERHEAD_TOKENS
+        if used > token_budget and start < len(messages):
+            break
+        start -= 1
+    return messages[start:]
@@ -0,0 +1,219 @@
+from typing import List, Optional, Sequence, Tuple
+from backend.services.vector_index import FlatVectorIndex, normalize_rows
+import numpy as np
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric scalar quantization with one scale per vector
+
+    Returns:
+        (codes, scales) such that vectors ~= codes * scales[:, None]
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=-1, keepdims=True) / 127.0
+    scales = np.where(scales == 0, 1.0, scales).astype(np.float32)
+    codes = np.rint(vectors / scales).astype(np.int8)
+    return codes, scales[..., 0]
+
+
+class ProductQuantizer:
+    """Product quantizer: m sub-spaces, 256 centroids each, one byte per sub-vector"""
+
+    def __init__(self, dim: int, m: int = 48, ksub: int = 256):
+        if dim % m:
+            raise ValueError(f"Dimension {dim} is not divisible by {m} sub-vectors")
+        self.dim = dim
+        self.m = m
+        self.ksub = ksub
+        self.dsub = dim // m
+        self.codebook: Optional[np.ndarray] = None  # (m, ksub, dsub)
+
+    def train(self, vectors: np.ndarray, iterations: int = 10, sample_size: int = 10000, seed: int = 0):
+        """Euclidean k-means per sub-space on a sample of rows"""
+        rng = np.random.default_rng(seed)
+        if len(vectors) > sample_size:
+            vectors = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+        vectors = np.asarray(vectors, dtype=np.float32)
+        ksub = min(self.ksub, len(vectors))
+
+        codebook = np.zeros((self.m, self.ksub, self.dsub), dtype=np.float32)
+        for sub in range(self.m):
+            x = np.ascontiguousarray(vectors[:, sub * self.dsub:(sub + 1) * self.dsub])
+            centroids = x[rng.choice(len(x), ksub, replace=False)].copy()
+            for _ in range(iterations):
+                assignments = self._nearest(x, centroids)
+                counts = np.bincount(assignments, minlength=ksub)
+                nonempty = counts > 0
+
+                # Per-centroid sums with one sort + reduceat
+                order = np.argsort(assignments, kind="stable")
+                starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+                sums = np.add.reduceat(x[order], starts[nonempty], axis=0)
+                centroids[nonempty] = sums / counts[nonempty, None]
+            codebook[sub, :ksub] = centroids
+        self.codebook = codebook
+
+    @staticmethod
+    def _nearest(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # argmin ||x - c||^2 == argmax (x.c - ||c||^2 / 2)
+        return np.argmax(x @ centroids.T - 0.5 * (centroids ** 2).sum(axis=1), axis=1)
+
+    def encode(self, vectors: np.ndarray, batch_size: int = 16384) -> np.ndarray:
+        """(n, m) uint8 codes"""
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for start in range(0, len(vectors), batch_size):
+            batch = np.asarray(vectors[start:start + batch_size], dtype=np.float32)
+            for sub in range(self.m):
+                x = np.ascontiguousarray(batch[:, sub * self.dsub:(sub + 1) * self.dsub])
+                codes[start:start + len(batch), sub] = self._nearest(x, self.codebook[sub])
+        return codes
+
+    def inner_product_tables(self, query: np.ndarray) -> np.ndarray:
+        """(m, ksub) partial inner products of the query with every centroid"""
+        sub_queries = query.reshape(self.m, 1, self.dsub)
+        return (self.codebook * sub_queries).sum(axis=2)
+
+    def scores(self, codes: np.ndarray, tables: np.ndarray) -> np.ndarray:
+        """Asymmetric inner-product estimates for coded rows"""
+        return tables[np.arange(self.m), codes].sum(axis=1)
+
+
+class QuantizedIndex(FlatVectorIndex):
+    """
+    Compressed-domain search with exact re-ranking
+
+    The scan runs over int8 (4x smaller) or PQ codes (32x smaller at m=48) with
+    the float query (asymmetric distance); only a shortlist of
+    k * rerank_factor rows is re-scored against the float32 vectors. The index
+    manager only uses it attached to the memory-mapped embedding store (see
+    VectorIndexManager._create_index): the float vectors then stay in the page
+    cache and only the shortlisted rows are touched, so resident memory is the
+    codes. add() keeps its rows in RAM like FlatVectorIndex.
+    """
+
+    def __init__(
+        self,
+        method: str = "int8",
+        rerank_factor: int = 4,
+        pq_subvectors: int = 48,
+        min_train_size: int = 1000,
+        scan_batch_size: int = 8192,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        if method not in ("int8", "pq"):
+            raise ValueError(f"Unknown quantization method: {method}")
+        self.method = method
+        self.rerank_factor = rerank_factor
+        self.pq_subvectors = pq_subvectors
+        self.min_train_size = min_train_size
+        self.scan_batch_size = scan_batch_size
+
+        self.pq: Optional[ProductQuantizer] = None
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+
+    @property
+    def trained(self) -> bool:
+        return self.method == "int8" or self.pq is not None
+
+    @property
+    def code_bytes(self) -> int:
+        """Resident size of the compressed representation"""
+        if self._codes is None:
+            return 0
+        size = self._codes[:len(self)].nbytes
+        if self._scales is not None:
+            size += self._scales[:len(self)].nbytes
+        return size
+
+    def _encode_rows(self, start: int):
+        """Encode rows [start, len) and append them to the code arrays"""
+        if not self.trained or len(self) <= start:
+            return
+
+        vectors = self._matrix[start:len(self)]
+        if self.method == "int8":
+            # Batched so a large load never materialises a second float matrix
+            codes = np.empty(vectors.shape, dtype=np.int8)
+            scales = np.empty(len(vectors), dtype=np.float32)
+            for offset in range(0, len(vectors), self.scan_batch_size):
+                end = offset + self.scan_batch_size
+                codes[offset:end], scales[offset:end] = quantize_int8(vectors[offset:end])
+            if self._scales is not None:
+                scales = np.concatenate((self._scales[:start], scales))
+            self._scales = scales
+        else:
+            codes = self.pq.encode(vectors)
+
+        if self._codes is not None:
+            codes = np.concatenate((self._codes[:start], codes))
+        self._codes = codes
+
+    def add(self, chunk_ids: Sequence, document_ids: Sequence[str], vectors: np.ndarray):
+        start = len(self)
+        super().add(chunk_ids, document_ids, vectors)
+        self._encode_rows(start)
+
+    def attach(self, matrix: np.ndarray, chunk_ids: Sequence, document_ids: Sequence[str], deleted: np.ndarray) -> int:
+        start = super().attach(matrix, chunk_ids, document_ids, deleted)
+        self._encode_rows(start)
+        return start
+
+    def needs_rebuild(self) -> bool:
+        if super().needs_rebuild():
+            return True
+        return not self.rebuilding and not self.trained and self.live_count >= self.min_train_size
+
+    def compact(self):
+        keep = np.flatnonzero(~self._deleted[:len(self)])
+        super().compact()
+        if self._codes is not None:
+            self._codes = self._codes[keep]
+        if self._scales is not None:
+            self._scales = self._scales[keep]
+
+    def train(self, vectors: np.ndarray):
+        """Train the PQ codebook and encode the snapshot (int8 needs no training)"""
+        if self.method != "pq" or len(vectors) < self.min_train_size:
+            return None, None
+        pq = ProductQuantizer(vectors.shape[1], m=self.pq_subvectors)
+        pq.train(vectors)
+        return pq, pq.encode(vectors)
+
+    def apply_training(self, pq, codes, size: int):
+        if pq is None:
+            return
+        self.pq = pq
+        self._codes = codes
+        self._encode_rows(size)
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[object, float]]:
+        if len(self) == 0 or k <= 0:
+            return []
+
+        query = normalize_rows(np.asarray(query, dtype=np.float32))
+        if not self.trained or self._codes is None:
+            return self._top_k(None, query, k)
+
+        # Approximate scores in bounded-size batches to avoid a float copy of all codes
+        size = len(self)
+        approx = np.empty(size, dtype=np.float32)
+        tables = self.pq.inner_product_tables(query) if self.method == "pq" else None
+        for start in range(0, size, self.scan_batch_size):
+            end = min(start + self.scan_batch_size, size)
+            if self.method == "int8":
+                approx[start:end] = (self._codes[start:end] @ query) * self._scales[start:end]
+            else:
+                approx[start:end] = self.pq.scores(self._codes[start:end], tables)
+        approx[self._deleted[:size]] = -np.inf
+
+        live = size - int(np.count_nonzero(self._deleted[:size]))
+        shortlist_size = min(k * self.rerank_factor, live)
+        if shortlist_size <= 0:
+            return []
+        shortlist = np.argpartition(-approx, shortlist_size - 1)[:shortlist_size]
+
+        # Exact re-rank of the shortlist against the float vectors
+        return self._top_k(np.sort(shortlist), query, k)
@@ -1,10 +1,21 @@
-from typing import List, Optional
-from openai import AsyncOpenAI
+from typing import List, Optional, Tuple
+from collections import defaultdict
 from backend.config import settings
 from backend.database import get_kb_chunks_collection
 from backend.models.kb_chunk import KBChunk
+from backend.services.vector_index import vector_index
+from backend.services.lexical_index import lexical_index
+from backend.services.embedding_cache import query_embedding_cache, normalize_query
+from backend.services.kb_version import get_kb_version
+from backend.utils.cache import TTLCache
 
-client = AsyncOpenAI(api_key=settings.openai_api_key)
+# Top-k chunks per (tenant_id, kb_version, normalized query); a KB change bumps
+# the version, so stale entries are never hit and simply age out
+retrieval_cache = TTLCache(
+    maxsize=settings.retrieval_cache_size,
+    ttl_seconds=settings.retrieval_cache_ttl_seconds,
+    group_of=lambda key: key[0]
+)
 
 
 class RAGService:
@@ -16,40 +27,59 @@ class RAGService:
     async def retrieve_relevant_chunks(
         self,
         query: str,
-        tenant_id: str
+        tenant_id: str,
+        kb_version: Optional[int] = None
     ) -> List[KBChunk]:
         """
-        Retrieve relevant KB chunks for a query using vector similarity
+        Retrieve relevant KB chunks for a query using hybrid vector + BM25 search
         
         Args:
             query: User query
             tenant_id: Tenant ID for isolation
+            kb_version: Tenant's current KB version (looked up when not given)
         
         Returns:
             List of relevant KB chunks
         """
         try:
-            # Generate query embedding
-            response = await client.embeddings.create(
-                model="text-embedding-3-small",
-                input=query
-            )
-            query_embedding = response.data[0].embedding
+            if kb_version is None:
+                kb_version = await get_kb_version(tenant_id)
             
-            # For now, we'll do a simple retrieval without vector search
-            # In production, you'd use MongoDB Atlas Vector Search
-            # This is a fallback that gets recent chunks
-            kb_chunks_collection = get_kb_chunks_collection()
-            if kb_chunks_collection is None:
-                return []
+            # Repeated questions against an unchanged KB skip embedding and search
+            cache_key = (tenant_id, kb_version, normalize_query(query))
+            if kb_version is not None:
+                cached = retrieval_cache.get(cache_key)
+                if cached is not None:
+                    return list(cached)
             
-            cursor = kb_chunks_collection.find(
-                {"tenant_id": tenant_id}
-            ).sort("created_at", -1).limit(self.top_k)
+            candidates = settings.hybrid_candidates if settings.hybrid_search_enabled else self.top_k
+            
+            # Lexical hits are in-process and survive an embeddings API failure
+            vector_hits = []
+            vector_failed = False
+            try:
+                # Generate query embedding (cached for repeated queries)
+                query_embedding = await query_embedding_cache.get_embedding(query, tenant_id=tenant_id)
+                
+                # Cosine top-k against the tenant's in-process vector index
+                vector_hits = await vector_index.search(tenant_id, query_embedding, candidates, kb_version)
+            except Exception as e:
+                print(f"Error in vector retrieval: {e}")
+                vector_failed = True
+            
+            if settings.hybrid_search_enabled:
+                lexical_hits = await lexical_index.search(tenant_id, query, candidates, kb_version)
+                chunk_ids = self.reciprocal_rank_fusion([vector_hits, lexical_hits])[:self.top_k]
+            else:
+                chunk_ids = [chunk_id for chunk_id, _ in vector_hits[:self.top_k]]
             
             chunks = []
-            async for doc in cursor:
-                chunks.append(KBChunk(**doc))
+            if chunk_ids:
+                chunks = await self._fetch_chunks(chunk_ids, tenant_id)
+            
+            # Never cache a degraded (lexical-only) answer
+            if kb_version is not None and not vector_failed:
+                retrieval_cache.set(cache_key, tuple(chunks))
             
             return chunks
             
@@ -57,6 +87,46 @@ class RAGService:
             print(f"Error retrieving chunks: {e}")
             return []
     
+    async def _fetch_chunks(self, chunk_ids: List[object], tenant_id: str) -> List[KBChunk]:
+        """Load chunks by id, without embeddings, in the given order"""
+        kb_chunks_collection = get_kb_chunks_collection()
+        if kb_chunks_collection is None:
+            return []
+        
+        cursor = kb_chunks_collection.find(
+            {"_id": {"$in": chunk_ids}, "tenant_id": tenant_id},
+            {"embedding": 0}
+        )
+        docs_by_id = {}
+        async for doc in cursor:
+            docs_by_id[doc["_id"]] = doc
+        
+        # Preserve ranking order
+        chunks = []
+        for chunk_id in chunk_ids:
+            doc = docs_by_id.get(chunk_id)
+            if doc:
+                chunks.append(KBChunk(**doc))
+        
+        return chunks
+    
+    def reciprocal_rank_fusion(self, rankings: List[List[Tuple[object, float]]]) -> List[object]:
+        """
+        Fuse ranked hit lists with reciprocal rank fusion
+        
+        Args:
+            rankings: Lists of (chunk_id, score), each sorted best first
+        
+        Returns:
+            Chunk ids sorted by fused score
+        """
+        fused = defaultdict(float)
+        for ranking in rankings:
+            for rank, (chunk_id, _) in enumerate(ranking, 1):
+                fused[chunk_id] += 1.0 / (settings.rrf_k + rank)
+        
+        return sorted(fused, key=fused.get, reverse=True)
+    
     def build_context(self, chunks: List[KBChunk]) -> str:
         """
         Build context string from retrieved chunks
@@ -0,0 +1,105 @@
+from typing import List
+from html.parser import HTMLParser
+from pathlib import PurePosixPath
+import io
+import re
+import unicodedata
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # PDF files are reported as unsupported
+    PdfReader = None
+
+TEXT_EXTENSIONS = {".txt", ".text", ".md", ".markdown", ".csv", ".rst"}
+HTML_EXTENSIONS = {".html", ".htm"}
+PDF_EXTENSIONS = {".pdf"}
+SUPPORTED_EXTENSIONS = TEXT_EXTENSIONS | HTML_EXTENSIONS | PDF_EXTENSIONS
+
+CONTROL_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]")
+HORIZONTAL_SPACE = re.compile(r"[ \t]+")
+EXTRA_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+class UnsupportedDocument(Exception):
+    """Raised for files whose type cannot be extracted"""
+
+
+class _HTMLTextExtractor(HTMLParser):
+    """Visible text of an HTML page, with headings kept as markdown headings"""
+
+    BLOCK_TAGS = {"p", "div", "section", "article", "br", "li", "tr", "table", "ul", "ol", "blockquote", "pre", "hr"}
+    SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "head"}
+    HEADING_TAGS = {"h1": "# ", "h2": "## ", "h3": "### ", "h4": "#### ", "h5": "##### ", "h6": "###### "}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.HEADING_TAGS:
+            self.parts.append("\n\n" + self.HEADING_TAGS[tag])
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n\n" if tag == "p" else "\n")
+        elif tag == "td" or tag == "th":
+            self.parts.append(" | ")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.HEADING_TAGS:
+            self.parts.append("\n\n")
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def decode_text(data: bytes) -> str:
+    """UTF-8 (with or without BOM), falling back to Latin-1"""
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return data.decode("latin-1")
+
+
+def normalize_text(text: str) -> str:
+    """Unicode NFKC, no control characters, collapsed spaces and blank lines"""
+    text = unicodedata.normalize("NFKC", text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = CONTROL_CHARS.sub("", text)
+    lines = [HORIZONTAL_SPACE.sub(" ", line).strip() for line in text.split("\n")]
+    return EXTRA_BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+def extract_text(filename: str, data: bytes) -> str:
+    """
+    Plain text of a PDF, HTML, Markdown or text file, normalised for chunking
+
+    Pure and CPU-bound so it can run in a worker process.
+
+    Raises:
+        UnsupportedDocument: If the file type is not supported
+    """
+    extension = PurePosixPath(filename).suffix.lower()
+
+    if extension in TEXT_EXTENSIONS:
+        text = decode_text(data)
+    elif extension in HTML_EXTENSIONS:
+        parser = _HTMLTextExtractor()
+        parser.feed(decode_text(data))
+        parser.close()
+        text = "".join(parser.parts)
+    elif extension in PDF_EXTENSIONS:
+        if PdfReader is None:
+            raise UnsupportedDocument("PDF support requires the pypdf package")
+        reader = PdfReader(io.BytesIO(data))
+        text = "\n\n".join(page.extract_text() or "" for page in reader.pages)
+    else:
+        raise UnsupportedDocument(f"Unsupported file type: {extension or filename}")
+
+    return normalize_text(text)
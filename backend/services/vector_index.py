@@ -0,0 +1,564 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+from collections import defaultdict
+from backend.config import settings
+from backend.database import get_kb_chunks_collection, get_tenants_collection
+from backend.services.embedding_store import EmbeddingStore
+from backend.services.kb_version import get_kb_version
+from backend.utils.vector_codec import decode_embedding
+import numpy as np
+import asyncio
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalise each row so that a dot product equals cosine similarity"""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class FlatVectorIndex:
+    """
+    Exact cosine-similarity index over a contiguous float32 matrix
+
+    Deletes only tombstone rows; the dead rows are dropped by compact() once
+    needs_rebuild() says they are worth reclaiming.
+    """
+
+    def __init__(
+        self,
+        dim: Optional[int] = None,
+        initial_capacity: int = 1024,
+        rebuild_deleted_ratio: float = 0.2
+    ):
+        self.dim = dim
+        self.chunk_ids: List = []
+        self.document_ids: List[str] = []
+        self.rebuild_deleted_ratio = rebuild_deleted_ratio
+        self.rebuilding = False
+        self._initial_capacity = initial_capacity
+        self._matrix: Optional[np.ndarray] = None
+        self._deleted = np.zeros(0, dtype=bool)
+        self._id_set = set()
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    @property
+    def deleted_count(self) -> int:
+        return int(np.count_nonzero(self._deleted[:len(self)]))
+
+    @property
+    def live_count(self) -> int:
+        return len(self) - self.deleted_count
+
+    def _ensure_capacity(self, extra: int):
+        """Grow the backing matrix geometrically so appends stay amortised O(1)"""
+        needed = len(self) + extra
+        if self._matrix is None or self._matrix.shape[0] < needed:
+            capacity = max(needed, self._initial_capacity)
+            if self._matrix is not None:
+                capacity = max(capacity, self._matrix.shape[0] * 2)
+
+            matrix = np.empty((capacity, self.dim), dtype=np.float32)
+            if self._matrix is not None and len(self):
+                matrix[:len(self)] = self._matrix[:len(self)]
+            self._matrix = matrix
+
+        if self._deleted.shape[0] < self._matrix.shape[0]:
+            deleted = np.zeros(self._matrix.shape[0], dtype=bool)
+            deleted[:len(self)] = self._deleted[:len(self)]
+            self._deleted = deleted
+
+    def add(self, chunk_ids: Sequence, document_ids: Sequence[str], vectors: np.ndarray):
+        """
+        Append vectors to the index
+
+        Args:
+            chunk_ids: Chunk ids, row-aligned with vectors
+            document_ids: Owning document id for each row
+            vectors: (n, dim) array of embeddings
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] == 0:
+            return
+
+        # Skip rows we already hold (e.g. a load raced with an insert)
+        keep = [i for i, chunk_id in enumerate(chunk_ids) if chunk_id not in self._id_set]
+        if not keep:
+            return
+        if len(keep) != len(chunk_ids):
+            vectors = vectors[keep]
+            chunk_ids = [chunk_ids[i] for i in keep]
+            document_ids = [document_ids[i] for i in keep]
+
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {self.dim}")
+
+        self._ensure_capacity(len(chunk_ids))
+        start = len(self)
+        self._matrix[start:start + len(chunk_ids)] = normalize_rows(vectors)
+        self._deleted[start:start + len(chunk_ids)] = False
+        self.chunk_ids.extend(chunk_ids)
+        self.document_ids.extend(document_ids)
+        self._id_set.update(chunk_ids)
+
+    def attach(self, matrix: np.ndarray, chunk_ids: Sequence, document_ids: Sequence[str], deleted: np.ndarray) -> int:
+        """
+        Adopt an externally owned, already normalised matrix (e.g. a memory map)
+
+        The first len(self) rows of matrix must be the rows already indexed;
+        chunk_ids and document_ids describe only the rows after them.
+
+        Returns:
+            Index of the first newly attached row
+        """
+        start = len(self)
+        self._matrix = matrix
+        self.dim = matrix.shape[1]
+        self._deleted = np.asarray(deleted, dtype=bool)
+        self.chunk_ids.extend(chunk_ids)
+        self.document_ids.extend(document_ids)
+        self._id_set.update(chunk_ids)
+        return start
+
+    def remove_document(self, document_id: str) -> int:
+        """Tombstone every row belonging to a document, returns number of rows removed"""
+        return self._tombstone([
+            i for i, doc_id in enumerate(self.document_ids)
+            if doc_id == document_id and not self._deleted[i]
+        ])
+
+    def remove_chunks(self, chunk_ids: Sequence) -> int:
+        """Tombstone the rows of individual chunks, returns number of rows removed"""
+        targets = self._id_set.intersection(chunk_ids)
+        if not targets:
+            return 0
+        return self._tombstone([
+            i for i, chunk_id in enumerate(self.chunk_ids)
+            if chunk_id in targets and not self._deleted[i]
+        ])
+
+    def _tombstone(self, rows: List[int]) -> int:
+        if not rows:
+            return 0
+        self._deleted[rows] = True
+        self._id_set.difference_update(self.chunk_ids[i] for i in rows)
+        return len(rows)
+
+    def needs_rebuild(self) -> bool:
+        """True when enough rows are tombstoned to be worth compacting"""
+        if self.rebuilding:
+            return False
+        return self.deleted_count > self.rebuild_deleted_ratio * max(len(self), 1)
+
+    def compact(self):
+        """Drop tombstoned rows into a fresh in-memory matrix"""
+        keep = np.flatnonzero(~self._deleted[:len(self)])
+        self._matrix = np.ascontiguousarray(self._matrix[keep]) if len(keep) else None
+        self._deleted = np.zeros(len(keep), dtype=bool)
+        self.chunk_ids = [self.chunk_ids[i] for i in keep]
+        self.document_ids = [self.document_ids[i] for i in keep]
+
+    def train(self, vectors: np.ndarray):
+        """Hook for indexes with trained structure; exact search needs none"""
+        return None, None
+
+    def apply_training(self, centroids, assignments, size: int):
+        pass
+
+    def rebuild(self):
+        """Compact and retrain synchronously"""
+        self.compact()
+        size = len(self)
+        if size:
+            centroids, assignments = self.train(self._matrix[:size])
+            self.apply_training(centroids, assignments, size)
+
+    def _top_k(self, candidates: Optional[np.ndarray], query: np.ndarray, k: int) -> List[Tuple[object, float]]:
+        """Score candidate rows (all rows if None) and return the best k live ones"""
+        if candidates is None:
+            size = len(self)
+            scores = self._matrix[:size] @ query
+            dead = self._deleted[:size]
+            rows = None
+        else:
+            scores = self._matrix[candidates] @ query
+            dead = self._deleted[candidates]
+            rows = candidates
+
+        if dead.any():
+            scores[dead] = -np.inf
+        k = min(k, len(scores) - int(np.count_nonzero(dead)))
+        if k <= 0:
+            return []
+
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+
+        if rows is not None:
+            return [(self.chunk_ids[rows[i]], float(scores[i])) for i in top]
+        return [(self.chunk_ids[i], float(scores[i])) for i in top]
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[object, float]]:
+        """
+        Return the top-k (chunk_id, cosine similarity) pairs for a query vector
+
+        Args:
+            query: Query embedding
+            k: Number of results
+
+        Returns:
+            Pairs sorted by descending similarity
+        """
+        if len(self) == 0 or k <= 0:
+            return []
+
+        query = normalize_rows(np.asarray(query, dtype=np.float32))
+        return self._top_k(None, query, k)
+
+
+class VectorIndexManager:
+    """
+    Per-tenant in-process vector indexes
+
+    When the embedding store is enabled an index is backed by the tenant's
+    memory-mapped store file (shared by all workers through the page cache)
+    and only falls back to scanning kb_chunks when the file is missing or
+    disagrees with MongoDB.
+
+    An index built from kb_chunks alone cannot see other workers' changes, so
+    like the lexical index it remembers the tenant kb_version it reflects and
+    is reloaded when a search brings a newer one.
+    """
+
+    def __init__(self):
+        self._indexes: Dict[str, FlatVectorIndex] = {}
+        self._versions: Dict[str, Optional[int]] = {}
+        self._stores: Dict[str, EmbeddingStore] = {}
+        self._store_generations: Dict[str, int] = {}
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._generations: Dict[str, int] = defaultdict(int)
+        self._rebuild_tasks: Dict[str, asyncio.Task] = {}
+
+    async def get_index(self, tenant_id: str, kb_version: Optional[int] = None) -> Optional[FlatVectorIndex]:
+        """Get the tenant's index, loading it on first use or when stale"""
+        if kb_version is not None and self._is_stale(tenant_id, kb_version):
+            self.invalidate(tenant_id)
+
+        index = self._indexes.get(tenant_id)
+        if index is not None:
+            return index
+
+        async with self._locks[tenant_id]:
+            index = self._indexes.get(tenant_id)
+            if index is not None:
+                return index
+
+            # Reload if the KB changed underneath us while we were reading it
+            while True:
+                generation = self._generations[tenant_id]
+                version = await get_kb_version(tenant_id)
+                index = await self._load(tenant_id)
+                if index is None or self._generations[tenant_id] == generation:
+                    break
+
+            if index is not None:
+                self._indexes[tenant_id] = index
+                self._versions[tenant_id] = version
+            return index
+
+    def _is_stale(self, tenant_id: str, kb_version: int) -> bool:
+        # Store-backed indexes follow other workers through the mapped file
+        if tenant_id not in self._indexes or self._store_generations.get(tenant_id) is not None:
+            return False
+        version = self._versions.get(tenant_id)
+        return version is None or version < kb_version
+
+    async def _create_index(self, tenant_id: str, initial_capacity: int, mapped: bool = True) -> FlatVectorIndex:
+        """
+        Instantiate the index type selected in the tenant's settings
+
+        int8/pq indexes only keep their codes resident and re-rank against the
+        memory-mapped store, so without one (mapped=False) they fall back to flat.
+        """
+        tenant_settings = {}
+        tenants_collection = get_tenants_collection()
+        if tenants_collection is not None:
+            tenant_doc = await tenants_collection.find_one(
+                {"tenant_id": tenant_id},
+                {"settings": 1}
+            )
+            if tenant_doc:
+                tenant_settings = tenant_doc.get("settings") or {}
+
+        index_type = tenant_settings.get("vector_index") or settings.vector_index_type
+        if index_type == "ivf":
+            from backend.services.ivf_index import IVFFlatIndex
+            return IVFFlatIndex(
+                nlist=tenant_settings.get("ivf_nlist") or settings.ivf_nlist,
+                nprobe=tenant_settings.get("ivf_nprobe") or settings.ivf_nprobe,
+                min_train_size=settings.ivf_min_train_size,
+                kmeans_iterations=settings.ivf_kmeans_iterations,
+                rebuild_deleted_ratio=settings.vector_index_compact_ratio,
+                initial_capacity=initial_capacity
+            )
+        if index_type in ("int8", "pq") and not mapped:
+            print(f"Vector index type {index_type} needs the embedding store; using flat for tenant {tenant_id}")
+        elif index_type in ("int8", "pq"):
+            from backend.services.quantization import QuantizedIndex
+            return QuantizedIndex(
+                method=index_type,
+                rerank_factor=settings.quantization_rerank_factor,
+                pq_subvectors=settings.pq_subvectors,
+                rebuild_deleted_ratio=settings.vector_index_compact_ratio,
+                initial_capacity=initial_capacity
+            )
+        return FlatVectorIndex(
+            initial_capacity=initial_capacity,
+            rebuild_deleted_ratio=settings.vector_index_compact_ratio
+        )
+
+    async def _get_store(self, tenant_id: str) -> Optional[EmbeddingStore]:
+        """The tenant's opened store, or None if disabled or not written yet"""
+        if not settings.embedding_store_enabled:
+            return None
+        store = self._stores.get(tenant_id)
+        if store is None:
+            store = EmbeddingStore.for_tenant(tenant_id)
+            if not await asyncio.to_thread(store.open):
+                return None
+            self._stores[tenant_id] = store
+        return store
+
+    def _attach_store(self, tenant_id: str, index: FlatVectorIndex, store: EmbeddingStore):
+        """Point the index at the store's mapped rows it does not hold yet"""
+        start = len(index)
+        index.attach(
+            store.vectors,
+            store.chunk_ids[start:],
+            store.document_ids[start:],
+            store.deleted_mask()
+        )
+        self._store_generations[tenant_id] = store.generation
+
+    async def _load(self, tenant_id: str) -> Optional[FlatVectorIndex]:
+        """Build a tenant index from its store file, or from kb_chunks on a cold start"""
+        kb_chunks_collection = get_kb_chunks_collection()
+        if kb_chunks_collection is None:
+            return None
+
+        # Warm start: trust the mapped file if it accounts for every chunk
+        store = await self._get_store(tenant_id)
+        if store is not None:
+            chunk_count = await kb_chunks_collection.count_documents({"tenant_id": tenant_id})
+            if chunk_count == store.chunk_count():
+                index = await self._create_index(tenant_id, 1)
+                self._attach_store(tenant_id, index, store)
+                return index
+
+        chunk_ids = []
+        document_ids = []
+        vectors = []
+        cursor = kb_chunks_collection.find(
+            {"tenant_id": tenant_id},
+            {"embedding": 1, "document_id": 1}
+        )
+        async for doc in cursor:
+            chunk_ids.append(doc["_id"])
+            document_ids.append(doc["document_id"])
+            vectors.append(decode_embedding(doc.get("embedding")))
+
+        dim = next((len(vector) for vector in vectors if vector is not None), None)
+        if dim is None:
+            return await self._create_index(tenant_id, 1, mapped=settings.embedding_store_enabled)
+
+        # Persist what we just scanned so other workers and restarts can map it
+        if settings.embedding_store_enabled:
+            store = self._stores.get(tenant_id) or EmbeddingStore.for_tenant(tenant_id)
+            try:
+                await asyncio.to_thread(store.write, dim, chunk_ids, document_ids, vectors)
+                self._stores[tenant_id] = store
+                index = await self._create_index(tenant_id, 1)
+                self._attach_store(tenant_id, index, store)
+                return index
+            except (OSError, ValueError) as e:
+                print(f"Error writing embedding store for tenant {tenant_id}: {e}")
+                self._stores.pop(tenant_id, None)
+
+        rows = [i for i, vector in enumerate(vectors) if vector is not None]
+        index = await self._create_index(tenant_id, len(rows), mapped=False)
+        index.add(
+            [chunk_ids[i] for i in rows],
+            [document_ids[i] for i in rows],
+            np.asarray([vectors[i] for i in rows], dtype=np.float32)
+        )
+        return index
+
+    async def _sync_store(self, tenant_id: str, index: FlatVectorIndex) -> FlatVectorIndex:
+        """Pick up rows and tombstones other workers wrote to the tenant's store"""
+        store = self._stores.get(tenant_id)
+        if store is None or self._store_generations.get(tenant_id) is None:
+            return index
+
+        change = store.changed()
+        if change == "replaced" or store.generation != self._store_generations[tenant_id]:
+            # Rows were renumbered (compaction); remap from scratch
+            self.invalidate(tenant_id)
+            self._stores.pop(tenant_id, None)
+            return await self.get_index(tenant_id)
+
+        if change == "modified" and not store.refresh():
+            return index
+        # Our own appends remap the store directly, so also compare row counts
+        if change == "modified" or len(store) > len(index):
+            self._attach_store(tenant_id, index, store)
+        return index
+
+    async def _rebuild(self, tenant_id: str, index: FlatVectorIndex):
+        """Compact and retrain an index off the event loop"""
+        index.rebuilding = True
+        try:
+            if index.deleted_count > index.rebuild_deleted_ratio * max(len(index), 1):
+                store = self._stores.get(tenant_id)
+                if store is not None and self._store_generations.get(tenant_id) is not None:
+                    # Compact the shared file; every worker remaps it on its next search
+                    await asyncio.to_thread(store.compact)
+                    self.invalidate(tenant_id)
+                    return
+                index.compact()
+
+            size = len(index)
+            if size:
+                centroids, assignments = await asyncio.to_thread(index.train, index._matrix[:size])
+                if self._indexes.get(tenant_id) is index:
+                    index.apply_training(centroids, assignments, size)
+        except Exception as e:
+            print(f"Error rebuilding vector index for tenant {tenant_id}: {e}")
+        finally:
+            index.rebuilding = False
+            self._rebuild_tasks.pop(tenant_id, None)
+
+    async def search(
+        self,
+        tenant_id: str,
+        query_embedding: Sequence[float],
+        k: int,
+        kb_version: Optional[int] = None
+    ) -> List[Tuple[object, float]]:
+        """Top-k (chunk_id, similarity) pairs for a tenant"""
+        index = await self.get_index(tenant_id, kb_version)
+        if index is None:
+            return []
+        index = await self._sync_store(tenant_id, index)
+
+        # Compaction / (re)training happens lazily in the background
+        if tenant_id not in self._rebuild_tasks and index.needs_rebuild():
+            self._rebuild_tasks[tenant_id] = asyncio.create_task(self._rebuild(tenant_id, index))
+
+        return index.search(np.asarray(query_embedding, dtype=np.float32), k)
+
+    async def add_chunks(
+        self,
+        tenant_id: str,
+        document_id: str,
+        chunk_ids: Sequence,
+        embeddings: Sequence[Sequence[float]]
+    ):
+        """Record freshly inserted chunks in the store and the loaded index"""
+        self._generations[tenant_id] += 1
+        document_ids = [document_id] * len(chunk_ids)
+
+        store = await self._get_store(tenant_id)
+        if store is not None:
+            try:
+                await asyncio.to_thread(store.append, chunk_ids, document_ids, embeddings)
+            except (OSError, ValueError) as e:
+                # e.g. embedding model changed dimension; the next load rewrites the file
+                print(f"Error appending to embedding store for tenant {tenant_id}: {e}")
+                self.invalidate(tenant_id)
+                self._stores.pop(tenant_id, None)
+                return
+
+        index = self._indexes.get(tenant_id)
+        if index is None:
+            return
+
+        if store is not None and self._store_generations.get(tenant_id) is not None:
+            await self._sync_store(tenant_id, index)
+            return
+        if settings.embedding_store_enabled and len(index) == 0:
+            # Loaded while the KB was empty: the next load writes the store and maps it
+            self.invalidate(tenant_id)
+            return
+
+        rows = [(chunk_id, embedding) for chunk_id, embedding in zip(chunk_ids, embeddings) if embedding is not None and len(embedding)]
+        if not rows:
+            return
+        index.add(
+            [chunk_id for chunk_id, _ in rows],
+            [document_id] * len(rows),
+            np.asarray([embedding for _, embedding in rows], dtype=np.float32)
+        )
+
+    async def remove_document(self, tenant_id: str, document_id: str):
+        """Tombstone a document's rows in the store and the loaded index"""
+        self._generations[tenant_id] += 1
+
+        store = await self._get_store(tenant_id)
+        if store is not None:
+            try:
+                await asyncio.to_thread(store.mark_deleted, document_id)
+            except OSError as e:
+                print(f"Error updating embedding store for tenant {tenant_id}: {e}")
+
+        index = self._indexes.get(tenant_id)
+        if index is not None:
+            index.remove_document(document_id)
+
+    async def remove_chunks(self, tenant_id: str, document_id: str, chunk_ids: Sequence):
+        """Tombstone individual chunks of a document in the store and the loaded index"""
+        if not chunk_ids:
+            return
+        self._generations[tenant_id] += 1
+
+        store = await self._get_store(tenant_id)
+        if store is not None:
+            try:
+                await asyncio.to_thread(store.mark_deleted, document_id, chunk_ids)
+            except OSError as e:
+                print(f"Error updating embedding store for tenant {tenant_id}: {e}")
+
+        index = self._indexes.get(tenant_id)
+        if index is not None:
+            index.remove_chunks(chunk_ids)
+
+    def record_version(self, tenant_id: str, kb_version: Optional[int]):
+        """
+        Note that this process's own change produced kb_version
+
+        The loaded index stays current only if it had seen every earlier
+        version; otherwise it missed another worker's change and is dropped.
+        """
+        if kb_version is None or tenant_id not in self._indexes:
+            return
+        version = self._versions.get(tenant_id)
+        if self._is_stale(tenant_id, kb_version - 1):
+            self.invalidate(tenant_id)
+        elif version is not None:
+            self._versions[tenant_id] = max(version, kb_version)
+
+    def invalidate(self, tenant_id: str):
+        """Forget a tenant index so the next search reloads it"""
+        self._generations[tenant_id] += 1
+        self._indexes.pop(tenant_id, None)
+        self._versions.pop(tenant_id, None)
+        self._store_generations.pop(tenant_id, None)
+
+
+# Global vector index instance
+vector_index = VectorIndexManager()
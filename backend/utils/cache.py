@@ -0,0 +1,79 @@
+from typing import Any, Callable, Dict, Hashable, Optional
+from collections import Counter, OrderedDict
+import time
+
+
+class TTLCache:
+    """
+    Bounded in-memory LRU cache whose entries also expire after a TTL
+    
+    With group_of (e.g. the tenant id part of a key), hits and misses are
+    also counted per group so stats() can report a single group's share.
+    """
+    
+    def __init__(self, maxsize: int = 1024, ttl_seconds: float = 3600, group_of: Optional[Callable[[Hashable], Hashable]] = None):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.group_of = group_of
+        self.entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.group_hits: Counter = Counter()
+        self.group_misses: Counter = Counter()
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Cached value, or None if missing or expired"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                if self.group_of:
+                    self.group_hits[self.group_of(key)] += 1
+                return value
+            del self.entries[key]
+        
+        self.misses += 1
+        if self.group_of:
+            self.group_misses[self.group_of(key)] += 1
+        return None
+    
+    def set(self, key: Hashable, value: Any):
+        """Insert or refresh a value, evicting the least recently used entry if full"""
+        if self.maxsize <= 0:
+            return
+        self.entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+    
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """Remove a key, returning its value if present"""
+        entry = self.entries.pop(key, None)
+        return entry[1] if entry else None
+    
+    def clear(self):
+        self.entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Size and hit/miss counters"""
+        return self._stats(len(self.entries), self.hits, self.misses)
+    
+    def group_stats(self, group: Hashable) -> Dict[str, Any]:
+        """Size and hit/miss counters of one group's keys (needs group_of)"""
+        size = sum(1 for key in self.entries if self.group_of(key) == group)
+        return self._stats(size, self.group_hits[group], self.group_misses[group])
+    
+    def _stats(self, size: int, hits: int, misses: int) -> Dict[str, Any]:
+        lookups = hits + misses
+        return {
+            "size": size,
+            "maxsize": self.maxsize,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+        }
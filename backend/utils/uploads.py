@@ -0,0 +1,81 @@
+from typing import AsyncIterator
+from fastapi import UploadFile
+from pathlib import Path
+import asyncio
+import codecs
+import os
+import uuid
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured size limit"""
+
+
+async def spool_upload(file: UploadFile, directory: str, block_size: int, max_bytes: int) -> Path:
+    """
+    Copy an uploaded file to disk block by block
+    
+    Returns:
+        Path of the spooled copy
+    
+    Raises:
+        UploadTooLarge: If the file is bigger than max_bytes (the partial copy is removed)
+    """
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    path = Path(directory) / f"{uuid.uuid4()}.upload"
+    size = 0
+    try:
+        with open(path, "wb") as out:
+            while True:
+                block = await file.read(block_size)
+                if not block:
+                    break
+                size += len(block)
+                if size > max_bytes:
+                    raise UploadTooLarge()
+                await asyncio.to_thread(out.write, block)
+    except BaseException:
+        remove_spooled(path)
+        raise
+    return path
+
+
+async def spool_text(text: str, directory: str) -> Path:
+    """
+    Write inline text to disk as UTF-8
+    
+    Returns:
+        Path of the spooled copy
+    """
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    path = Path(directory) / f"{uuid.uuid4()}.upload"
+    try:
+        await asyncio.to_thread(path.write_text, text, "utf-8")
+    except BaseException:
+        remove_spooled(path)
+        raise
+    return path
+
+
+async def read_text_blocks(path: Path, block_size: int) -> AsyncIterator[str]:
+    """Decode a UTF-8 file incrementally, never holding more than one block"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    with open(path, "rb") as f:
+        while True:
+            block = await asyncio.to_thread(f.read, block_size)
+            if not block:
+                break
+            text = decoder.decode(block)
+            if text:
+                yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def remove_spooled(path: Path):
+    """Delete a spooled upload, ignoring files that are already gone"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
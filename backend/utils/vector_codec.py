@@ -0,0 +1,54 @@
+from typing import Optional, Sequence, Union
+from bson.binary import Binary, BinaryVectorDtype, VECTOR_SUBTYPE, USER_DEFINED_SUBTYPE
+from backend.config import settings
+import numpy as np
+
+# float32 uses the standard BSON vector subtype (dtype byte + padding byte),
+# which Atlas Vector Search also understands. float16 has no vector dtype, so
+# it is stored raw under the user-defined subtype.
+FLOAT32_HEADER = BinaryVectorDtype.FLOAT32.value + b"\x00"
+
+
+def encode_embedding(values: Union[Sequence[float], np.ndarray], dtype: Optional[str] = None) -> Binary:
+    """
+    Pack an embedding into a compact BSON Binary
+
+    Args:
+        values: Embedding vector
+        dtype: "float32" or "float16" (defaults to settings.embedding_storage_dtype)
+
+    Returns:
+        BSON Binary payload
+    """
+    dtype = dtype or settings.embedding_storage_dtype
+    if dtype == "float16":
+        return Binary(np.asarray(values, dtype="<f2").tobytes(), USER_DEFINED_SUBTYPE)
+    if dtype == "float32":
+        return Binary(FLOAT32_HEADER + np.asarray(values, dtype="<f4").tobytes(), VECTOR_SUBTYPE)
+    raise ValueError(f"Unsupported embedding storage dtype: {dtype}")
+
+
+def decode_embedding(value) -> Optional[np.ndarray]:
+    """
+    Decode a stored embedding without copying the payload
+
+    Accepts packed Binary values as well as legacy arrays of doubles.
+    Returns None for missing or empty embeddings.
+    """
+    if value is None:
+        return None
+
+    if isinstance(value, Binary):
+        if value.subtype == VECTOR_SUBTYPE and value[:2] == FLOAT32_HEADER:
+            vector = np.frombuffer(value, dtype="<f4", offset=2)
+        elif value.subtype == USER_DEFINED_SUBTYPE:
+            vector = np.frombuffer(value, dtype="<f2")
+        else:
+            raise ValueError(f"Unsupported embedding encoding (subtype {value.subtype})")
+    elif isinstance(value, bytes):
+        # Binary subtype 0 payloads come back from pymongo as plain bytes
+        raise ValueError("Unsupported embedding encoding (untyped bytes)")
+    else:
+        vector = np.asarray(value, dtype=np.float32)
+
+    return vector if len(vector) else None
@@ -87,6 +87,12 @@
         messagesContainer.appendChild(messageDiv);
 
         // Scroll to bottom
+        scrollToBottom();
+        return contentDiv;
+    }
+
+    function scrollToBottom() {
+        const messagesContainer = document.getElementById('leadpilot-messages');
         messagesContainer.scrollTop = messagesContainer.scrollHeight;
     }
 
@@ -133,7 +139,8 @@
         showTyping();
 
         try {
-            const response = await fetch(`${config.apiUrl}/v1/chat/message`, {
+            // Replies are streamed as server-sent events: token events, then a final done event
+            const response = await fetch(`${config.apiUrl}/v1/chat/stream`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -146,20 +153,50 @@
                 })
             });
 
-            hideTyping();
+            if (!response.ok) {
+                hideTyping();
+                addMessage('assistant', 'Sorry, I encountered an error. Please try again.');
+                return;
+            }
 
-            if (response.ok) {
-                const data = await response.json();
-                addMessage('assistant', data.message);
+            let contentDiv = null;
+            let reply = '';
+            let buffer = '';
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
+                for (const raw of events) {
+                    const event = parseEvent(raw);
+                    if (!event) continue;
 
-                // Update session ID if new
-                if (data.session_id && data.session_id !== sessionId) {
-                    sessionId = data.session_id;
-                    localStorage.setItem('leadpilot_session_id', sessionId);
+                    if (event.type === 'token') {
+                        if (!contentDiv) {
+                            hideTyping();
+                            contentDiv = addMessage('assistant', '');
+                        }
+                        reply += event.data.text;
+                        contentDiv.textContent = reply;
+                        scrollToBottom();
+                    } else if (event.type === 'done') {
+                        // Update session ID if new
+                        if (event.data.session_id && event.data.session_id !== sessionId) {
+                            sessionId = event.data.session_id;
+                            localStorage.setItem('leadpilot_session_id', sessionId);
+                        }
+                    } else if (event.type === 'error' && !contentDiv) {
+                        hideTyping();
+                        addMessage('assistant', 'Sorry, I encountered an error. Please try again.');
+                    }
                 }
-            } else {
-                addMessage('assistant', 'Sorry, I encountered an error. Please try again.');
             }
+            hideTyping();
         } catch (error) {
             hideTyping();
             console.error('LeadPilot: Failed to send message', error);
@@ -167,6 +204,25 @@
         }
     }
 
+    // Parse one server-sent event block into { type, data }
+    function parseEvent(raw) {
+        let type = 'message';
+        let data = '';
+        for (const line of raw.split('\n')) {
+            if (line.startsWith('event:')) {
+                type = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                data += line.slice(5).trim();
+            }
+        }
+        if (!data) return null;
+        try {
+            return { type, data: JSON.parse(data) };
+        } catch (error) {
+            return null;
+        }
+    }
+
     // Toggle chat window
     function toggleChat() {
         isOpen = !isOpen;
@@ -4,6 +4,7 @@ import api from '../utils/api';
 
 function KnowledgeBase() {
     const [documents, setDocuments] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [stats, setStats] = useState({ total_documents: 0, total_chunks: 0 });
     const [loading, setLoading] = useState(true);
     const [uploading, setUploading] = useState(false);
@@ -14,10 +15,11 @@ function KnowledgeBase() {
         fetchStats();
     }, []);
 
-    const fetchDocuments = async () => {
+    const fetchDocuments = async (cursor = null) => {
         try {
-            const response = await api.get('/knowledge-base/documents');
-            setDocuments(response.data);
+            const response = await api.get('/knowledge-base/documents', { params: cursor ? { cursor } : {} });
+            setDocuments((previous) => (cursor ? [...previous, ...response.data.documents] : response.data.documents));
+            setNextCursor(response.data.next_cursor);
         } catch (error) {
             console.error('Error fetching documents:', error);
         } finally {
@@ -34,16 +36,32 @@ function KnowledgeBase() {
         }
     };
 
+    const waitForJob = async (jobId) => {
+        // Documents are ingested in the background; poll until the job settles
+        while (true) {
+            const response = await api.get(`/knowledge-base/jobs/${jobId}`);
+            if (response.data.status === 'completed' || response.data.status === 'failed') {
+                return response.data;
+            }
+            await new Promise((resolve) => setTimeout(resolve, 1000));
+        }
+    };
+
     const handleUpload = async (e) => {
         e.preventDefault();
         setUploading(true);
 
         try {
-            await api.post('/knowledge-base/upload', formData);
+            const response = await api.post('/knowledge-base/upload', formData);
             setFormData({ name: '', content: '' });
+            const job = await waitForJob(response.data.job_id);
             await fetchDocuments();
             await fetchStats();
-            alert('Document uploaded successfully!');
+            if (job.status === 'failed') {
+                alert(`Failed to process document: ${job.error}`);
+            } else {
+                alert('Document uploaded successfully!');
+            }
         } catch (error) {
             console.error('Error uploading document:', error);
             alert('Failed to upload document');
@@ -58,6 +76,7 @@ function KnowledgeBase() {
         try {
             await api.delete(`/knowledge-base/documents/${documentId}`);
             await fetchDocuments();
+            await fetchStats();
         } catch (error) {
             console.error('Error deleting document:', error);
             alert('Failed to delete document');
@@ -204,6 +223,14 @@ function KnowledgeBase() {
                                         </button>
                                     </div>
                                 ))}
+                                {nextCursor && (
+                                    <button
+                                        className="btn btn-secondary"
+                                        onClick={() => fetchDocuments(nextCursor)}
+                                    >
+                                        Load more
+                                    </button>
+                                )}
                             </div>
                         )}
                     </div>
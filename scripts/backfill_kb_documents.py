@@ -0,0 +1,105 @@
+"""
+Build kb_documents and the tenant knowledge-base totals from existing kb_chunks
+
+Needed once for knowledge bases created before kb_documents existed; safe to
+re-run, since documents and totals are recomputed from the chunks.
+"""
+import argparse
+import asyncio
+import sys
+import os
+from datetime import datetime
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import UpdateOne
+from backend.database import (
+    connect_to_mongo, close_mongo_connection,
+    get_kb_chunks_collection, get_kb_documents_collection, get_tenants_collection
+)
+from backend.services.kb_processor import KBProcessor
+
+
+async def backfill_documents(tenant_id: str = None):
+    """Recompute every document's counts, then each tenant's totals"""
+    await connect_to_mongo()
+
+    try:
+        kb_chunks_collection = get_kb_chunks_collection()
+        kb_documents_collection = get_kb_documents_collection()
+        tenants_collection = get_tenants_collection()
+
+        if kb_chunks_collection is None or kb_documents_collection is None:
+            print("✗ Error: Database not initialized properly")
+            return
+
+        query = {"tenant_id": tenant_id} if tenant_id else {}
+        kb_processor = KBProcessor()
+        documents = {}
+        cursor = kb_chunks_collection.find(
+            query,
+            {"tenant_id": 1, "document_id": 1, "document_name": 1, "text": 1, "metadata": 1, "created_at": 1}
+        )
+        async for chunk in cursor:
+            key = (chunk["tenant_id"], chunk["document_id"])
+            document = documents.setdefault(key, {
+                "name": chunk.get("document_name", "Untitled"),
+                "metadata": chunk.get("metadata", {}),
+                "created_at": chunk.get("created_at") or datetime.utcnow(),
+                "chunk_count": 0,
+                "token_count": 0
+            })
+            document["chunk_count"] += 1
+            document["token_count"] += kb_processor.count_tokens(chunk.get("text", ""))
+            if chunk.get("created_at") and chunk["created_at"] < document["created_at"]:
+                document["created_at"] = chunk["created_at"]
+
+        print(f"Found {len(documents)} documents")
+
+        operations = []
+        totals = {}
+        for (doc_tenant_id, document_id), document in documents.items():
+            operations.append(UpdateOne(
+                {"tenant_id": doc_tenant_id, "document_id": document_id},
+                {"$set": {
+                    **document,
+                    "status": "ready",
+                    "updated_at": datetime.utcnow()
+                }},
+                upsert=True
+            ))
+            tenant_totals = totals.setdefault(doc_tenant_id, [0, 0, 0])
+            tenant_totals[0] += 1
+            tenant_totals[1] += document["chunk_count"]
+            tenant_totals[2] += document["token_count"]
+
+        if operations:
+            await kb_documents_collection.bulk_write(operations, ordered=False)
+
+        for doc_tenant_id, (document_count, chunk_count, token_count) in totals.items():
+            await tenants_collection.update_one(
+                {"tenant_id": doc_tenant_id},
+                {"$set": {
+                    "kb_document_count": document_count,
+                    "kb_chunk_count": chunk_count,
+                    "kb_token_count": token_count
+                }}
+            )
+            print(f"  {doc_tenant_id}: {document_count} documents, {chunk_count} chunks, {token_count} tokens")
+
+        print(f"✓ Backfilled {len(operations)} documents")
+
+    except Exception as e:
+        print(f"✗ Error backfilling documents: {e}")
+
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tenant-id", help="Only this tenant (default: all)")
+    args = parser.parse_args()
+
+    asyncio.run(backfill_documents(args.tenant_id))
@@ -0,0 +1,126 @@
+"""
+Compare the fixed 1000-character chunker with the structured token chunker
+
+Documents come from a tenant's knowledge base (reassembled from kb_chunks)
+or from text/markdown files given with --path. Reports chunks per document,
+embedding tokens and chunking time for both strategies.
+"""
+import argparse
+import asyncio
+import time
+import sys
+import os
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.database import connect_to_mongo, close_mongo_connection, get_kb_chunks_collection
+from backend.services.chunking import FixedSizeChunker, StructuredChunker
+from backend.config import settings
+
+# text-embedding-3-small list price, USD per 1M tokens
+EMBEDDING_PRICE_PER_MILLION = 0.02
+
+
+async def load_kb_documents(tenant_id: str):
+    """Reassemble each stored document from its chunks"""
+    kb_chunks_collection = get_kb_chunks_collection()
+    documents = {}
+    cursor = kb_chunks_collection.find(
+        {"tenant_id": tenant_id},
+        {"document_id": 1, "document_name": 1, "text": 1, "chunk_index": 1}
+    ).sort([("document_id", 1), ("chunk_index", 1)])
+    async for doc in cursor:
+        name, texts = documents.setdefault(doc["document_id"], (doc["document_name"], []))
+        texts.append(doc["text"])
+
+    reassembled = []
+    for name, texts in documents.values():
+        if all(len(text) == 1000 for text in texts[:-1]):
+            # Fixed chunks: drop the 200-character overlap each one repeats
+            content = texts[0] + "".join(text[200:] for text in texts[1:])
+        else:
+            content = "\n\n".join(texts)
+        reassembled.append((name, content))
+    return reassembled
+
+
+def load_files(paths):
+    """Read text files, expanding directories"""
+    documents = []
+    for path in map(Path, paths):
+        files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+        for file in files:
+            documents.append((str(file), file.read_text(encoding="utf-8", errors="replace")))
+    return documents
+
+
+def run_chunker(chunker, content: str):
+    start = time.perf_counter()
+    chunks = chunker.feed(content) + chunker.finish()
+    return chunks, time.perf_counter() - start
+
+
+def benchmark(documents, target_tokens: int, overlap_tokens: int):
+    """Print a per-document and total comparison table"""
+    counter = StructuredChunker(encoding=settings.chunk_tokenizer)
+    if counter.encoding is None:
+        print("tiktoken is not installed: token counts are word-based estimates\n")
+
+    print(f"{'document':<40}{'fixed chunks':>14}{'fixed tokens':>14}{'new chunks':>12}{'new tokens':>12}")
+    totals = [0, 0, 0, 0, 0.0, 0.0]
+    for name, content in documents:
+        fixed, fixed_seconds = run_chunker(FixedSizeChunker(), content)
+        structured, structured_seconds = run_chunker(
+            StructuredChunker(target_tokens, overlap_tokens, settings.chunk_tokenizer),
+            content
+        )
+        fixed_tokens = sum(counter.count_tokens(chunk) for chunk in fixed)
+        structured_tokens = sum(counter.count_tokens(chunk) for chunk in structured)
+
+        print(f"{name[:39]:<40}{len(fixed):>14}{fixed_tokens:>14}{len(structured):>12}{structured_tokens:>12}")
+        for i, value in enumerate((len(fixed), fixed_tokens, len(structured), structured_tokens, fixed_seconds, structured_seconds)):
+            totals[i] += value
+
+    fixed_chunks, fixed_tokens, structured_chunks, structured_tokens, fixed_seconds, structured_seconds = totals
+    count = max(len(documents), 1)
+    print(f"\n{len(documents)} documents")
+    print(f"{'':<22}{'fixed':>14}{'structured':>14}")
+    print(f"{'chunks per document':<22}{fixed_chunks / count:>14.1f}{structured_chunks / count:>14.1f}")
+    print(f"{'embedding tokens':<22}{fixed_tokens:>14}{structured_tokens:>14}")
+    print(f"{'embedding cost USD':<22}{fixed_tokens * EMBEDDING_PRICE_PER_MILLION / 1e6:>14.4f}"
+          f"{structured_tokens * EMBEDDING_PRICE_PER_MILLION / 1e6:>14.4f}")
+    print(f"{'chunking ms':<22}{fixed_seconds * 1000:>14.1f}{structured_seconds * 1000:>14.1f}")
+    if fixed_tokens:
+        print(f"\nEmbedding tokens change: {(structured_tokens - fixed_tokens) / fixed_tokens:+.1%}")
+
+
+async def main(args):
+    if args.path:
+        documents = load_files(args.path)
+    else:
+        await connect_to_mongo()
+        try:
+            if get_kb_chunks_collection() is None:
+                print("✗ Error: Database not initialized properly")
+                return
+            documents = await load_kb_documents(args.tenant_id)
+        finally:
+            await close_mongo_connection()
+
+    if not documents:
+        print("✗ No documents found")
+        return
+    benchmark(documents, args.target_tokens, args.overlap_tokens)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenant-id", default=settings.default_tenant_id)
+    parser.add_argument("--path", nargs="+", help="Text/markdown files or directories instead of the KB")
+    parser.add_argument("--target-tokens", type=int, default=settings.chunk_target_tokens)
+    parser.add_argument("--overlap-tokens", type=int, default=settings.chunk_overlap_tokens)
+    args = parser.parse_args()
+
+    asyncio.run(main(args))
@@ -0,0 +1,177 @@
+"""
+Prompt tokens per chat turn with and without the rolling conversation summary
+
+Plays synthetic long conversations turn by turn and counts the tokens of the
+reply prompt and the extraction prompt each turn would send. "Before" is the
+original last-10-messages history. "After" is, for the reply, the summary
+plus recent messages within the history token budget and, for extraction,
+only the messages since the last extraction plus the known lead fields
+(settings.summary_* and *_token_budget, overridable through the usual
+environment variables). The background summarizer's own calls are counted
+separately. Offline, each summary is assumed to use its full word budget;
+--live calls the summarizer for real (needs OPENAI_API_KEY).
+"""
+import argparse
+import asyncio
+import random
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.config import settings
+from backend.models.conversation import Conversation, Message
+from backend.models.lead import LeadFields
+from backend.services.chunking import count_tokens, get_encoding
+from backend.services.conversation_summary import conversation_summarizer, SUMMARY_SYSTEM_MESSAGE
+from backend.services.message_tokens import MESSAGE_OVERHEAD_TOKENS
+from backend.services.lead_extraction import LeadExtractionService
+from backend.services.rag_service import RAGService
+
+# Incremental extraction sends the known fields along; assume a fully qualified lead
+KNOWN_FIELDS = LeadFields(
+    name="Ann Baker", email="contact@example.com", phone="+1 512 555 0100", service_interest="web design",
+    budget="$10k", timeline="within 4 weeks", location="Austin", company="Baker & Co"
+)
+
+OPENERS = [
+    "Hi, I'm looking into options for my company.",
+    "Hello! Can you tell me a bit about what you offer?",
+    "Hey there, a colleague recommended you."
+]
+CUSTOMER_LINES = [
+    "We are a team of {n} people based in {city} and we need help with {service}.",
+    "Our budget is around ${n}k, is that realistic for {service}?",
+    "Ideally we'd start within {n} weeks, before our busy season.",
+    "How does onboarding work, and who would be our main contact?",
+    "Can you share a bit more about pricing for a team our size?",
+    "My name is {name}, you can reach me at {email}.",
+    "We tried another vendor last year for {service} and it did not go well, mostly because of slow support.",
+    "Do you integrate with the tools we already use, like our CRM and our billing system?",
+    "That makes sense. What would the first month look like?",
+    "Thanks, that's helpful."
+]
+ASSISTANT_LINES = [
+    "Thanks for sharing that! For teams like yours we usually start with a short discovery call to understand your current setup.",
+    "Great question. Our {service} packages are tailored to the size of the team and the scope of the project.",
+    "Onboarding typically takes one to two weeks, and you get a dedicated account manager from day one.",
+    "We integrate with most common CRMs and billing systems, and our team handles the setup for you.",
+    "Based on what you've described, a budget in that range works well for a first phase.",
+    "Could you tell me a bit more about your timeline and who else will be involved in the decision?",
+    "Happy to help with that. Would you like me to have someone from our team reach out with a tailored proposal?"
+]
+SERVICES = ["web design", "SEO", "bookkeeping", "IT support", "marketing automation"]
+CITIES = ["Austin", "Leeds", "Toronto", "Lyon", "Denver"]
+NAMES = ["Ann Baker", "Raj Patel", "Maria Lopez", "Tom Chen", "Eva Novak"]
+
+
+def synthetic_conversation(rng: random.Random, turns: int):
+    """(user, assistant) message pairs"""
+    fill = {
+        "service": rng.choice(SERVICES),
+        "city": rng.choice(CITIES),
+        "name": rng.choice(NAMES),
+        "email": "contact@example.com"
+    }
+    pairs = []
+    for turn in range(turns):
+        fill["n"] = rng.randint(2, 40)
+        user = rng.choice(OPENERS) if turn == 0 else rng.choice(CUSTOMER_LINES)
+        assistant = " ".join(rng.sample(ASSISTANT_LINES, rng.randint(1, 3)))
+        pairs.append((user.format(**fill), assistant.format(**fill)))
+    return pairs
+
+
+def prompt_tokens(messages, encoding) -> int:
+    return sum(count_tokens(m["content"], encoding) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+async def fold_summary(conversation: Conversation, live: bool, encoding) -> int:
+    """Bring the summary up to date, as the background summarizer would; returns the call's tokens"""
+    start = conversation.summarized_until
+    end = len(conversation.messages) - settings.summary_recent_messages
+    if live:
+        summary = await conversation_summarizer.summarize(conversation.summary, conversation.messages[start:end])
+        if not summary:
+            return 0
+    else:
+        summary = " ".join(["word"] * settings.summary_max_words)
+
+    # Approximate summarizer prompt: instructions, old summary, new messages; plus its output
+    tokens = prompt_tokens(
+        [{"role": "system", "content": SUMMARY_SYSTEM_MESSAGE}, {"role": "user", "content": conversation.summary or ""}]
+        + [{"role": m.role, "content": m.content} for m in conversation.messages[start:end]],
+        encoding
+    ) + count_tokens(summary, encoding)
+    conversation.summary = summary
+    conversation.summarized_until = end
+    return tokens
+
+
+async def benchmark(conversations: int, turns: int, seed: int, live: bool):
+    encoding = get_encoding(settings.chunk_tokenizer)
+    if encoding is None:
+        print("tiktoken is not installed: token counts are word-based estimates\n")
+    system_message = RAGService().create_rag_system_message("", settings.default_tenant_name)
+    lead_extractor = LeadExtractionService()
+    rng = random.Random(seed)
+
+    # Per turn: [reply before, reply after, extraction before, extraction after]
+    per_turn = [[0, 0, 0, 0] for _ in range(turns)]
+    summary_tokens = 0
+    for _ in range(conversations):
+        conversation = Conversation(session_id="benchmark", tenant_id="benchmark")
+        for turn, (user, assistant) in enumerate(synthetic_conversation(rng, turns)):
+            conversation.messages.append(Message(role="user", content=user))
+
+            before = [{"role": m.role, "content": m.content} for m in conversation.messages[-10:]]
+            reply_after = conversation_summarizer.context_messages(conversation, settings.history_token_budget)
+            system = [{"role": "system", "content": system_message}]
+
+            counts = per_turn[turn]
+            counts[0] += prompt_tokens(system + before, encoding)
+            counts[1] += prompt_tokens(system + reply_after, encoding)
+            counts[2] += prompt_tokens(lead_extractor.extraction_messages(before, LeadFields()), encoding)
+            counts[3] += prompt_tokens(
+                lead_extractor.extraction_messages(lead_extractor.extraction_history(conversation), KNOWN_FIELDS),
+                encoding
+            )
+
+            # Every extraction succeeds
+            conversation.extracted_until = len(conversation.messages)
+            conversation.messages.append(Message(role="assistant", content=assistant))
+            if conversation_summarizer.needs_summary(conversation):
+                summary_tokens += await fold_summary(conversation, live, encoding)
+
+    print(f"{'turn':>6}{'reply before':>15}{'reply after':>14}{'extract before':>17}{'extract after':>16}")
+    for turn, counts in enumerate(per_turn, 1):
+        if turn == 1 or turn % 5 == 0:
+            print(f"{turn:>6}" + "".join(f"{value / conversations:>{width}.0f}" for value, width in zip(counts, (15, 14, 17, 16))))
+
+    totals = [sum(counts[i] for counts in per_turn) / conversations for i in range(4)]
+    peaks = [max(counts[i] for counts in per_turn) / conversations for i in range(4)]
+    print(f"\n{conversations} conversations x {turns} turns "
+          f"(recent={settings.summary_recent_messages}, interval={settings.summary_interval_messages}, "
+          f"summary<={settings.summary_max_words} words{', live' if live else ''})")
+    print(f"{'':<28}{'before':>10}{'after':>10}{'change':>10}")
+    for label, i in (("reply tokens / turn", 0), ("extraction tokens / turn", 2)):
+        mean_before, mean_after = totals[i] / turns, totals[i + 1] / turns
+        print(f"{label:<28}{mean_before:>10.0f}{mean_after:>10.0f}{(mean_after - mean_before) / mean_before:>+10.1%}")
+    for label, i in (("reply tokens, peak turn", 0), ("extraction, peak turn", 2)):
+        print(f"{label:<28}{peaks[i]:>10.0f}{peaks[i + 1]:>10.0f}{(peaks[i + 1] - peaks[i]) / peaks[i]:>+10.1%}")
+    print(f"{'prompt tokens / conversation':<28}{totals[0] + totals[2]:>10.0f}{totals[1] + totals[3]:>10.0f}"
+          f"{(totals[1] + totals[3] - totals[0] - totals[2]) / (totals[0] + totals[2]):>+10.1%}")
+    print(f"{'summarizer tokens / conv.':<28}{0:>10}{summary_tokens / conversations:>10.0f}"
+          f"  (background, summary_model)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--live", action="store_true", help="Summarize with the OpenAI API instead of assuming full-size summaries")
+    args = parser.parse_args()
+
+    asyncio.run(benchmark(args.conversations, args.turns, args.seed, args.live))
@@ -0,0 +1,108 @@
+"""
+Compare exact search against int8 and PQ quantized search on one tenant's KB
+
+Reports recall@k against exact cosine top-k, per-query latency and the
+size of each searched representation. The benchmark holds every float32 row
+in memory; in the service a quantized index is attached to the memory-mapped
+embedding store, so only its codes are resident.
+"""
+import argparse
+import asyncio
+import time
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from backend.database import connect_to_mongo, close_mongo_connection, get_kb_chunks_collection
+from backend.services.vector_index import FlatVectorIndex
+from backend.services.quantization import QuantizedIndex
+from backend.utils.vector_codec import decode_embedding
+from backend.config import settings
+
+
+async def load_vectors(tenant_id: str):
+    """Read every embedded chunk of a tenant"""
+    kb_chunks_collection = get_kb_chunks_collection()
+    chunk_ids = []
+    document_ids = []
+    vectors = []
+    async for doc in kb_chunks_collection.find({"tenant_id": tenant_id}, {"embedding": 1, "document_id": 1}):
+        vector = decode_embedding(doc.get("embedding"))
+        if vector is not None:
+            chunk_ids.append(doc["_id"])
+            document_ids.append(doc["document_id"])
+            vectors.append(vector)
+    return chunk_ids, document_ids, np.asarray(vectors, dtype=np.float32)
+
+
+def measure(index, queries, k, truth=None):
+    """Run all queries; returns (results, p50 ms, p95 ms, recall@k)"""
+    results = []
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append([chunk_id for chunk_id, _ in index.search(query, k)])
+        timings.append((time.perf_counter() - start) * 1000)
+
+    recall = 1.0
+    if truth is not None:
+        recall = float(np.mean([len(set(r) & set(t)) / max(len(t), 1) for r, t in zip(results, truth)]))
+    return results, float(np.percentile(timings, 50)), float(np.percentile(timings, 95)), recall
+
+
+async def benchmark(tenant_id: str, queries: int, k: int, rerank_factor: int):
+    """Print an accuracy/latency/memory table for the tenant"""
+    await connect_to_mongo()
+    
+    try:
+        if get_kb_chunks_collection() is None:
+            print("✗ Error: Database not initialized properly")
+            return
+        
+        chunk_ids, document_ids, vectors = await load_vectors(tenant_id)
+        if len(vectors) == 0:
+            print(f"✗ No embedded chunks for tenant {tenant_id}")
+            return
+        print(f"Tenant {tenant_id}: {len(vectors)} chunks x {vectors.shape[1]} dims\n")
+        
+        # Queries: chunk embeddings with a little noise, so the exact answer is non-trivial
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(len(vectors), min(queries, len(vectors)), replace=False)]
+        sample = sample + rng.normal(scale=0.01, size=sample.shape).astype(np.float32)
+        
+        exact = FlatVectorIndex()
+        exact.add(chunk_ids, document_ids, vectors)
+        truth, p50, p95, _ = measure(exact, sample, k)
+        rows = [("exact float32", exact._matrix[:len(exact)].nbytes, 0.0, p50, p95, 1.0)]
+        
+        for method in ("int8", "pq"):
+            index = QuantizedIndex(method=method, rerank_factor=rerank_factor, pq_subvectors=settings.pq_subvectors, min_train_size=1)
+            index.add(chunk_ids, document_ids, vectors)
+            start = time.perf_counter()
+            index.rebuild()
+            build_seconds = time.perf_counter() - start
+            _, p50, p95, recall = measure(index, sample, k, truth)
+            rows.append((method, index.code_bytes, build_seconds, p50, p95, recall))
+        
+        print(f"{'index':<15}{'scanned MB':>12}{'train s':>10}{'p50 ms':>10}{'p95 ms':>10}{f'recall@{k}':>12}")
+        for name, size, build_seconds, p50, p95, recall in rows:
+            print(f"{name:<15}{size / 1e6:>12.2f}{build_seconds:>10.2f}{p50:>10.2f}{p95:>10.2f}{recall:>12.3f}")
+        print(f"\nQuantized indexes re-rank the top {k * rerank_factor} candidates exactly against "
+              "float32 rows; in the service those are read from the memory-mapped embedding store.")
+    
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenant-id", default=settings.default_tenant_id)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--rerank-factor", type=int, default=settings.quantization_rerank_factor)
+    args = parser.parse_args()
+    
+    asyncio.run(benchmark(args.tenant_id, args.queries, args.k, args.rerank_factor))
@@ -0,0 +1,82 @@
+"""
+Bulk-ingest an archive (.zip/.tar/.tar.gz) or a directory of PDF, HTML,
+Markdown and text files into a tenant's knowledge base
+
+Text extraction runs in a process pool; every supported file becomes its
+own document. Prints a per-file report with chunk counts and timings.
+Re-running with the same --import-id replaces the documents of an earlier
+(possibly interrupted) run instead of duplicating them.
+"""
+import argparse
+import asyncio
+import time
+import sys
+import os
+import uuid
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.database import connect_to_mongo, close_mongo_connection, get_kb_chunks_collection
+from backend.services.bulk_ingestion import BulkIngestor, summarize_report, shutdown_process_pool
+from backend.config import settings
+
+
+def print_report(report, seconds: float):
+    print(f"\n{'file':<48}{'status':>10}{'chunks':>8}{'extract ms':>12}{'ingest ms':>12}")
+    for entry in report:
+        extract_ms = "-" if entry["extract_ms"] is None else f"{entry['extract_ms']:.1f}"
+        ingest_ms = "-" if entry["ingest_ms"] is None else f"{entry['ingest_ms']:.1f}"
+        print(f"{entry['file'][-47:]:<48}{entry['status']:>10}{entry['chunks']:>8}{extract_ms:>12}{ingest_ms:>12}")
+        if entry["error"] and entry["status"] != "skipped":
+            print(f"  ✗ {entry['error']}")
+
+    summary = summarize_report(report)
+    print(f"\n{summary['files']} files: {summary['ingested']} ingested, "
+          f"{summary['skipped']} skipped, {summary['failed']} failed")
+    print(f"{summary['chunks']} chunks in {seconds:.1f}s"
+          f" ({summary['chunks'] / seconds if seconds else 0:.1f} chunks/s)")
+
+
+async def main(args):
+    path = Path(args.path)
+    if not path.exists():
+        print(f"✗ Not found: {path}")
+        return
+
+    await connect_to_mongo()
+    try:
+        if get_kb_chunks_collection() is None:
+            print("✗ Error: Database not initialized properly")
+            return
+
+        import_id = args.import_id or str(uuid.uuid4())
+        print(f"Importing {path} into tenant {args.tenant_id} (import id {import_id})")
+
+        async def on_file_done(entry):
+            print(f"  {entry['status']:<9} {entry['file']}")
+
+        start = time.perf_counter()
+        report = await BulkIngestor().ingest_archive(
+            path,
+            args.tenant_id,
+            batch_id=import_id,
+            metadata={"uploaded_by": "bulk_ingest", "archive": path.name},
+            replace_existing=args.import_id is not None,
+            on_file_done=on_file_done
+        )
+        print_report(report, time.perf_counter() - start)
+    finally:
+        shutdown_process_pool()
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="Archive or directory to ingest")
+    parser.add_argument("--tenant-id", default=settings.default_tenant_id)
+    parser.add_argument("--import-id", help="Id of a previous run to resume/replace")
+    args = parser.parse_args()
+
+    asyncio.run(main(args))
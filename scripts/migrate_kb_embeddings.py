@@ -0,0 +1,70 @@
+"""
+Convert kb_chunks embeddings stored as BSON arrays of doubles to packed Binary
+"""
+import argparse
+import asyncio
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import UpdateOne
+from backend.database import connect_to_mongo, close_mongo_connection, get_kb_chunks_collection
+from backend.utils.vector_codec import encode_embedding
+from backend.config import settings
+
+
+async def migrate_embeddings(dtype: str, batch_size: int):
+    """Re-encode every array-typed embedding in place"""
+    await connect_to_mongo()
+    
+    try:
+        kb_chunks_collection = get_kb_chunks_collection()
+        
+        if kb_chunks_collection is None:
+            print("✗ Error: Database not initialized properly")
+            return
+        
+        # Only legacy documents: non-empty arrays of numbers
+        query = {"embedding.0": {"$exists": True}}
+        total = await kb_chunks_collection.count_documents(query)
+        print(f"Found {total} chunks to convert to packed {dtype}")
+        
+        converted = 0
+        operations = []
+        cursor = kb_chunks_collection.find(query, {"embedding": 1}, batch_size=batch_size)
+        async for doc in cursor:
+            operations.append(UpdateOne(
+                {"_id": doc["_id"]},
+                {"$set": {"embedding": encode_embedding(doc["embedding"], dtype)}}
+            ))
+            
+            if len(operations) >= batch_size:
+                await kb_chunks_collection.bulk_write(operations, ordered=False)
+                converted += len(operations)
+                operations = []
+                print(f"  {converted}/{total}")
+        
+        if operations:
+            await kb_chunks_collection.bulk_write(operations, ordered=False)
+            converted += len(operations)
+        
+        print(f"✓ Converted {converted} chunks")
+        if converted:
+            print("  Run 'compact' on kb_chunks to return the freed space to the OS")
+    
+    except Exception as e:
+        print(f"✗ Error migrating embeddings: {e}")
+    
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dtype", choices=["float32", "float16"], default=settings.embedding_storage_dtype)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    
+    asyncio.run(migrate_embeddings(args.dtype, args.batch_size))